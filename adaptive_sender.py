@@ -0,0 +1,152 @@
+# adaptive_sender.py
+# 小车上传视频的拥塞自适应：根据发送耗时 / socket 发送队列 / 服务器回执 调整 画质、分辨率、帧率
+import collections
+import struct
+import time
+
+import cv2
+
+# 分辨率档位，从低到高
+RESOLUTIONS = [(160, 120), (240, 180), (320, 240)]
+
+
+def socket_backlog(sock):
+    """内核发送队列里还没发出去的字节数（Linux TIOCOUTQ），拿不到（含 Windows）返回 None"""
+    try:
+        import fcntl
+        import termios
+        buf = fcntl.ioctl(sock.fileno(), termios.TIOCOUTQ, struct.pack("I", 0))
+        return struct.unpack("I", buf)[0]
+    except (ImportError, AttributeError, OSError, ValueError):
+        return None
+
+
+class CongestionController:
+    """
+    AIMD 控制：拥塞时先降画质，再降分辨率，最后降帧率；
+    连续 recover_frames 帧通畅后按相反顺序逐级恢复。
+    """
+
+    def __init__(self, quality=50, min_quality=20, max_quality=70,
+                 fps=10, min_fps=3, max_fps=20,
+                 resolutions=RESOLUTIONS, resolution=None,
+                 target_send_ratio=0.5, backlog_limit=32 * 1024, target_rtt=0.3,
+                 recover_frames=20, degrade_holdoff=0.5):
+        self.quality = quality
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.fps = fps
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.resolutions = list(resolutions)
+        self.res_index = (self.resolutions.index(resolution) if resolution
+                          else len(self.resolutions) - 1)
+        self.target_send_ratio = target_send_ratio  # 发送耗时超过帧间隔的这个比例算拥塞
+        self.backlog_limit = backlog_limit
+        self.target_rtt = target_rtt
+        self.recover_frames = recover_frames
+        self.degrade_holdoff = degrade_holdoff  # 两次降级的最小间隔，给发送队列排空的时间
+
+        self.send_ms = 0.0   # 发送耗时 EWMA
+        self.backlog = 0
+        self.rtt_ms = None
+        self.frame_bytes = 0
+        self._clear = 0
+        self._rtt_congested = False
+        self._last_degrade = 0.0
+        self.decisions = collections.deque(maxlen=50)  # (时间, 动作, 原因)
+
+    @property
+    def resolution(self):
+        return self.resolutions[self.res_index]
+
+    @property
+    def frame_interval(self):
+        return 1.0 / self.fps
+
+    def encode(self, frame):
+        """按当前档位缩放并编码，返回 JPEG bytes"""
+        w, h = self.resolution
+        if frame.shape[1] > w or frame.shape[0] > h:
+            frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+        _, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+        return buffer.tobytes()
+
+    def on_ack(self, rtt):
+        """服务器回执（帧往返时间，秒），有的话作为额外的拥塞信号"""
+        self.rtt_ms = rtt * 1000
+        self._rtt_congested = rtt > self.target_rtt
+
+    def observe(self, send_time, frame_bytes, sock=None):
+        """每次 sendall 之后调用，返回是否判定为拥塞"""
+        send_ms = send_time * 1000
+        self.send_ms = send_ms if not self.send_ms else 0.8 * self.send_ms + 0.2 * send_ms
+        self.frame_bytes = frame_bytes
+        backlog = socket_backlog(sock) if sock is not None else None
+        self.backlog = backlog or 0
+
+        reason = None
+        if send_ms > self.frame_interval * 1000 * self.target_send_ratio:
+            reason = f"发送耗时 {send_ms:.0f} ms"
+        elif self.backlog > self.backlog_limit:
+            reason = f"发送队列 {self.backlog} B"
+        elif self._rtt_congested:
+            reason = f"回执 RTT {self.rtt_ms:.0f} ms"
+
+        if reason:
+            self._clear = 0
+            self._rtt_congested = False
+            self._degrade(reason)
+            return True
+
+        self._clear += 1
+        if self._clear >= self.recover_frames:
+            self._clear = 0
+            self._recover()
+        return False
+
+    def _degrade(self, reason):
+        now = time.monotonic()
+        if now - self._last_degrade < self.degrade_holdoff:
+            return
+        self._last_degrade = now
+        if self.quality > self.min_quality:
+            self.quality = max(self.min_quality, int(self.quality * 0.7))
+            self._record(f"画质 -> {self.quality}", reason)
+        elif self.res_index > 0:
+            self.res_index -= 1
+            self._record(f"分辨率 -> {self.resolution[0]}x{self.resolution[1]}", reason)
+        elif self.fps > self.min_fps:
+            self.fps = max(self.min_fps, self.fps // 2)
+            self._record(f"帧率 -> {self.fps}", reason)
+
+    def _recover(self):
+        if self.fps < self.max_fps:
+            self.fps = min(self.max_fps, self.fps + 1)
+            self._record(f"帧率 -> {self.fps}", "链路通畅")
+        elif self.res_index < len(self.resolutions) - 1:
+            self.res_index += 1
+            self._record(f"分辨率 -> {self.resolution[0]}x{self.resolution[1]}", "链路通畅")
+        elif self.quality < self.max_quality:
+            self.quality = min(self.max_quality, self.quality + 5)
+            self._record(f"画质 -> {self.quality}", "链路通畅")
+
+    def _record(self, action, reason):
+        self.decisions.append((time.time(), action, reason))
+        print(f"[自适应] {action}（{reason}）")
+
+    def telemetry(self):
+        w, h = self.resolution
+        return {
+            "quality": self.quality,
+            "width": w,
+            "height": h,
+            "fps": self.fps,
+            "send_ms": round(self.send_ms, 1),
+            "backlog": self.backlog,
+            "rtt_ms": self.rtt_ms,
+            "frame_bytes": self.frame_bytes,
+            "decisions": [
+                {"time": t, "action": a, "reason": r} for t, a, r in self.decisions
+            ],
+        }
@@ -0,0 +1,68 @@
+# avoidance.py
+# 非阻塞避障状态机：approach（直行看距离） -> turning（原地左转） -> resume（恢复直行，等测距稳定）
+# 控制循环每个周期调用一次 step()，不 sleep，随时可以被 cancel() 打断
+import time
+
+from rate_logger import RateLimitedLogger
+
+APPROACH = "approach"
+TURNING = "turning"
+RESUME = "resume"
+
+
+class ObstacleAvoider:
+    """
+    取代原来 sleep 阻塞的 tripod.turn_left_90（已删除），按时间推进：
+    碰撞时间 <= trigger_ttc 或距离 <= trigger_distance（兜底）时开始左转 turn_time 秒，
+    然后恢复 cruise_speed 直行；
+    resume_time 内不看距离（超声波还在报转弯前的读数），之后回到 approach。
+    step() 在控制线程里、持锁调用，日志走限频后台队列（默认和电机共用一个），不直接 print。
+    """
+
+    def __init__(self, motor, trigger_distance=0.2, trigger_ttc=None, turn_time=0.5,
+                 turn_speed=0.3, cruise_speed=0.3, resume_time=0.2, logger=None):
+        self.motor = motor
+        self.logger = logger or getattr(motor, "logger", None) or RateLimitedLogger()
+        self.trigger_distance = trigger_distance
+        self.trigger_ttc = trigger_ttc
+        self.turn_time = turn_time
+        self.turn_speed = turn_speed
+        self.cruise_speed = cruise_speed
+        self.resume_time = resume_time
+        self.state = APPROACH
+        self.until = 0.0
+        self.turns = 0
+
+    @property
+    def active(self):
+        return self.state != APPROACH
+
+    def step(self, dist, now=None, ttc=None):
+        """推进一步，返回当前状态；dist 为 None 表示这一拍没有可用测距"""
+        if now is None:
+            now = time.monotonic()
+        if self.state == APPROACH:
+            if dist is not None and (dist <= self.trigger_distance or
+                                     (self.trigger_ttc is not None and ttc is not None
+                                      and ttc <= self.trigger_ttc)):
+                self.logger.log("avoid", "前方障碍 {:.2f} m（TTC {:.2f} s），左转避让",
+                                dist, ttc if ttc is not None else float("inf"))
+                self.motor.set_speed(-self.turn_speed, self.turn_speed)
+                self.state = TURNING
+                self.until = now + self.turn_time
+                self.turns += 1
+        elif self.state == TURNING:
+            if now >= self.until:
+                self.motor.stop()
+                self.motor.set_speed(self.cruise_speed, self.cruise_speed)
+                self.state = RESUME
+                self.until = now + self.resume_time
+        elif self.state == RESUME:
+            if now >= self.until:
+                self.state = APPROACH
+        return self.state
+
+    def cancel(self):
+        """放弃当前避让（握拳 / 切手动），电机由调用方处理"""
+        self.state = APPROACH
+        self.until = 0.0
@@ -0,0 +1,140 @@
+# bench_control_jitter.py
+# 控制循环抖动对比：小车网络部分用 三个线程 vs 一个 asyncio 事件循环（CAR_NET_MODE）
+# 网络部分跑的就是 main.py 的 start_network()（CAR_HARDWARE=sim，摄像头 / 电机都是模拟的），
+# 手机端和 ECS 端在子进程里模拟；主线程按 main() 同样的 PeriodicScheduler 节拍跑控制循环，
+# 统计实际周期相对 1/CONTROL_HZ 的偏差。main.py 的全局状态和线程没法收回，每种模式单独起一个进程。
+# 用法: python bench_control_jitter.py [每种模式秒数]
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+JOYSTICK_HZ = 50  # 手机摇杆上报频率
+
+
+# ===== 子进程：模拟手机和 ECS =====
+def fake_peers(ecs_port, phone_port, stop):
+    from frame_receiver import FrameReceiver
+    from protocol import encode_message, frame_header, parse_hello, MsgType
+
+    def ecs():
+        srv = socket.create_server(("127.0.0.1", ecs_port))
+        while not stop.is_set():
+            c, _ = srv.accept()
+            rx = FrameReceiver()
+            try:
+                while (hello := parse_hello(rx)) is None:
+                    rx.fill(c)
+                rx.header = frame_header(hello[1])
+                while True:
+                    ts, frame_id, frame = rx.recv_frame(c)
+                    c.sendall(encode_message(MsgType.ACK, frame_id, frame_id))
+            except OSError:
+                c.close()
+
+    threading.Thread(target=ecs, daemon=True).start()
+    while not stop.is_set():
+        try:
+            p = socket.create_connection(("127.0.0.1", phone_port))
+        except OSError:
+            time.sleep(0.05)
+            continue
+        # 保持自动模式（切手动后 main.py 会暂停上传），angle 行照样逐行解析
+        i = 0
+        try:
+            while not stop.is_set():
+                i += 1
+                p.sendall(f"angle:{i % 360},strength:{i % 100}\n".encode())
+                time.sleep(1 / JOYSTICK_HZ)
+        except OSError:
+            pass
+        p.close()
+
+
+# ===== 单个模式：在本进程里跑 main.py 的网络部分 =====
+def run_mode(mode, seconds, port_base):
+    import config
+    config.NET_MODE = mode
+    config.SERVER_PORT = port_base + 1
+    config.UDP_CONTROL_PORT = 0
+    import main
+    from joystick import joystick_to_speed
+    from scheduler import PeriodicScheduler
+
+    main.ECS_IP, main.ECS_PORT = "127.0.0.1", port_base
+    counters = {"acks": 0, "lines": 0}
+    handle_line, handle_message = main.handle_phone_line, main.handle_ecs_message
+
+    def count_line(msg):
+        counters["lines"] += 1
+        return handle_line(msg)
+
+    def count_message(*args):
+        counters["acks"] += 1
+        return handle_message(*args)
+
+    # 网络线程 / 协程按全局名字调用，替换模块属性即可计数
+    main.handle_phone_line, main.handle_ecs_message = count_line, count_message
+
+    stop = multiprocessing.Event()
+    peers = multiprocessing.Process(target=fake_peers, args=(port_base, port_base + 1, stop), daemon=True)
+    peers.start()
+    time.sleep(0.5)
+    main.start_network()
+    deadline = time.time() + 5
+    while (main.client_socket is None or main.conn is None) and time.time() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.5)
+    for k in counters:
+        counters[k] = 0
+    sent = main.capture.stats()["sent"] if main.capture else 0
+
+    # 与 main() 相同的节拍：截止时间调度，锁内取状态、算速度、写电机
+    schedule = PeriodicScheduler(1 / config.CONTROL_HZ)
+    periods = []
+    cpu = time.process_time()
+    last = time.perf_counter()
+    end = last + seconds
+    while last < end:
+        schedule.wait()
+        with main.lock:
+            a, s = main.angle, main.strength
+            left, right = joystick_to_speed(a, s, config.MAX_POWER)
+            main.motor.set_speed(left, right)
+        now = time.perf_counter()
+        periods.append(now - last)
+        last = now
+    cpu = time.process_time() - cpu
+    frames = main.capture.stats()["sent"] - sent if main.capture else 0
+    nthreads = threading.active_count()
+
+    periods = np.array(periods[1:]) * 1000
+    target = 1000 / config.CONTROL_HZ
+    jitter = np.abs(periods - target)
+    p50, p95, p99 = np.percentile(jitter, [50, 95, 99])
+    print(f"{mode:<8} 周期均值 {periods.mean():6.2f} ms | 抖动 p50 {p50:5.2f} p95 {p95:5.2f} "
+          f"p99 {p99:5.2f} max {jitter.max():6.2f} ms | 实际 {1000 / periods.mean():5.1f} Hz | "
+          f"CPU {cpu:.2f} s | 帧 {frames} 回执 {counters['acks']} 摇杆 {counters['lines']} | "
+          f"线程数 {nthreads}", flush=True)
+    main.running = False
+    stop.set()
+    peers.terminate()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--mode":
+        run_mode(sys.argv[2], float(sys.argv[3]), int(sys.argv[4]))
+        os._exit(0)  # main.py 的网络线程不会自己退出
+
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    env = dict(os.environ, CAR_HARDWARE="sim")
+    import config
+    print(f"控制频率 {config.CONTROL_HZ} Hz | 上传 main.py 自适应帧率 {config.VIDEO_WIDTH}x{config.VIDEO_HEIGHT} | "
+          f"摇杆 {JOYSTICK_HZ} Hz | 每种模式 {seconds:.0f} s")
+    for mode, port in (("threads", 23400), ("asyncio", 23410)):
+        subprocess.run([sys.executable, __file__, "--mode", mode, str(seconds), str(port)], env=env)
@@ -0,0 +1,101 @@
+# bench_decode.py
+# 解码阶段对比：原来的 imdecode -> resize -> cvtColor 每帧新分配 vs decode.py 的缩小解码 + 复用缓冲区
+# 每帧 CPU 时间单独跑（不开 tracemalloc），分配量用 tracemalloc 统计每帧峰值
+# 用法: python bench_decode.py [--count 500] [--recording 录制文件]
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from decode import FrameDecoder
+from recording import RecordingReader
+
+
+def make_jpeg(width, height, quality=70):
+    """固定随机种子的合成画面，加一点噪声让 JPEG 大小接近实拍"""
+    rng = np.random.default_rng(0)
+    img = np.empty((height, width, 3), np.uint8)
+    img[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)[None, :]
+    img[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+    img[..., 2] = 96
+    cv2.circle(img, (width // 2, height // 2), height // 5, (200, 170, 150), -1)
+    img += rng.integers(0, 8, img.shape, dtype=np.uint8)
+    return cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def old_path(size):
+    # 原 pc_med / ser_frp_med / ser_tcp_med 的写法
+    def run(jpeg):
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        if size is not None and frame.shape[1::-1] != size:
+            frame = cv2.resize(frame, size)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return run
+
+
+def new_path(size):
+    decoder = FrameDecoder(*size) if size else FrameDecoder()
+    return decoder.decode
+
+
+def measure(make, jpegs, count):
+    fn = make()
+    for jpeg in jpegs[:10]:
+        fn(jpeg)  # 预热，复用缓冲区在这里分配好
+    cpu = time.process_time()
+    start = time.perf_counter()
+    for i in range(count):
+        out = fn(jpegs[i % len(jpegs)])
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+
+    fn = make()
+    fn(jpegs[0])
+    out = None
+    tracemalloc.start()
+    peaks = []
+    for i in range(min(count, 200)):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        out = fn(jpegs[i % len(jpegs)])
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return {
+        "cpu_ms": cpu / count * 1000,
+        "wall_ms": wall / count * 1000,
+        "alloc_kb": float(np.mean(peaks)) / 1024,
+        "shape": out.shape[:2],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="解码阶段 CPU / 分配对比")
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--recording", help="recording.py 录制文件（替代 320x240 合成帧）")
+    args = parser.parse_args()
+
+    if args.recording:
+        reader = RecordingReader(args.recording)
+        small = [bytes(f) for _, _, f in reader]
+        reader.close()
+    else:
+        small = [make_jpeg(320, 240)]
+    large = [make_jpeg(640, 480)]
+
+    cases = [
+        ("320x240 -> 640x480 (pc_med 原来放大)", small, (640, 480), old_path((640, 480)), new_path((640, 480))),
+        ("320x240 -> 320x240 (ECS)", small, (320, 240), old_path(None), new_path((320, 240))),
+        ("640x480 -> 320x240 (缩小解码)", large, (320, 240), old_path((320, 240)), new_path((320, 240))),
+    ]
+    print(f"{'场景':<36}{'方式':<6}{'CPU ms/帧':>10}{'墙钟 ms/帧':>11}{'分配 KB/帧':>12}  输出")
+    for name, jpegs, size, old, new in cases:
+        results = {}
+        for label, make in (("原来", lambda: old), ("新", lambda: new)):
+            r = results[label] = measure(make, jpegs, args.count)
+            print(f"{name:<36}{label:<6}{r['cpu_ms']:>10.3f}{r['wall_ms']:>11.3f}{r['alloc_kb']:>12.1f}  "
+                  f"{r['shape'][1]}x{r['shape'][0]}")
+        o, n = results["原来"], results["新"]
+        print(f"{'':<36}{'节省':<6}{(1 - n['cpu_ms'] / o['cpu_ms']) * 100:>9.0f}%{'':>11}"
+              f"{(1 - n['alloc_kb'] / o['alloc_kb']) * 100 if o['alloc_kb'] else 0:>11.0f}%")
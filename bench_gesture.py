@@ -0,0 +1,124 @@
+# bench_gesture.py
+# 手势分类单手耗时：原先的逐点属性访问版本 vs gesture.py 向量化版本 vs 线上入口 classify_landmarks（逐只手纯 Python）；
+# 以及带抖动的手势序列上，逐帧回传 vs GestureDebouncer 滤波后回传的指令数和确认延迟
+# 用法: python bench_gesture.py [重复次数]
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from gesture import classify_hands, classify_landmarks, landmarks_to_array, GestureDebouncer
+
+
+def legacy_detect_gesture(hand):
+    # 改造前 pc_med / ser_frp_med 里的实现
+    wrist = hand[0]
+    mcp = hand[9]
+
+    def dist(a, b):
+        return ((a.x - b.x)**2 + (a.y - b.y)**2) ** 0.5
+
+    palm = dist(wrist, mcp)
+    straight = 0
+    ratios = []
+    for tid in [8, 12, 16, 20]:
+        r = dist(hand[tid], wrist) / palm
+        ratios.append(r)
+        if r > 1.55:
+            straight += 1
+    avg_ratio = sum(ratios) / len(ratios)
+    if straight == 0 and avg_ratio < 1.25:
+        return "FIST"
+    elif straight >= 3 and avg_ratio > 1.55:
+        return "OPEN"
+    else:
+        return "UNKNOWN"
+
+
+def random_hand(rng):
+    # 手腕在中心附近，指尖随机伸缩，覆盖三种手势
+    wx, wy = 0.5, 0.7
+    hand = [SimpleNamespace(x=wx + rng.uniform(-0.2, 0.2), y=wy + rng.uniform(-0.3, 0.1),
+                            z=rng.uniform(-0.1, 0.1)) for _ in range(21)]
+    hand[0] = SimpleNamespace(x=wx, y=wy, z=0.0)
+    hand[9] = SimpleNamespace(x=wx, y=wy - 0.1, z=0.0)
+    return hand
+
+
+def ratio_hand(ratio):
+    """4 根手指 指尖-手腕 / 掌长 都等于 ratio 的手，(1, 21, 3)"""
+    arr = np.zeros((1, 21, 3))
+    arr[0, 9, 1] = -1.0
+    arr[0, [8, 12, 16, 20], 1] = -ratio
+    return arr
+
+
+def chatter(rng, fps=10, seconds=60, hold=4.0, jitter=0.08, miss=0.05):
+    """
+    每 hold 秒换一个手势（OPEN / FIST / 没手），比值在阈值附近加高斯抖动，偶尔漏检；
+    统计像 ser_tcp_med 那样“手势变了且不是 NO_HAND 就发”时两种做法各发多少条，以及确认延迟
+    """
+    script = [("OPEN", 1.62), ("NO_HAND", None), ("FIST", 1.2), ("OPEN", 1.62), ("FIST", 1.2)]
+    debouncer = GestureDebouncer()
+    sent = {"逐帧": 0, "滤波": 0}
+    last = {"逐帧": "NO_HAND", "滤波": "NO_HAND"}
+    delays = []
+    target_since = None
+    for i in range(int(seconds * fps)):
+        ts = i / fps
+        target, ratio = script[int(ts // hold) % len(script)]
+        if ts % hold == 0:
+            target_since = ts
+        if ratio is None or rng.random() < miss:
+            arr = None
+        else:
+            arr = ratio_hand(ratio + rng.gauss(0, jitter))
+        raw = "NO_HAND" if arr is None else classify_hands(arr)[0]
+        stable, _ = debouncer.update(arr, ts)
+        for name, g in (("逐帧", raw), ("滤波", stable)):
+            if g != "NO_HAND" and g != last[name]:
+                sent[name] += 1
+                last[name] = g
+        if target_since is not None and stable == target:
+            delays.append(ts - target_since)
+            target_since = None
+    return sent, float(np.mean(delays)) if delays else None
+
+
+def per_hand_us(fn, batches, repeat):
+    n = sum(len(b) for b in batches) * repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for b in batches:
+            fn(b)
+    return (time.perf_counter() - start) * 1e6 / n
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(0)
+    hands = [random_hand(rng) for _ in range(512)]
+
+    # 结果必须与旧实现一致
+    expected = [legacy_detect_gesture(h) for h in hands]
+    assert classify_hands(landmarks_to_array(hands)) == expected
+    assert [classify_landmarks([h])[0] for h in hands] == expected
+    print("手势分布:", {g: expected.count(g) for g in set(expected)})
+
+    for batch in (1, 2, 8, 64):
+        batches = [hands[i:i + batch] for i in range(0, len(hands), batch)]
+        legacy = per_hand_us(lambda b: [legacy_detect_gesture(h) for h in b], batches, repeat)
+        convert = per_hand_us(landmarks_to_array, batches, repeat)
+        arrays = [landmarks_to_array(b) for b in batches]
+        classify = per_hand_us(classify_hands, arrays, repeat)
+        entry = per_hand_us(classify_landmarks, batches, repeat)  # 线上入口：逐只手纯 Python，不转数组
+        print(f"batch={batch:<3} 旧实现 {legacy:6.2f} us/手 | 转数组 {convert:6.2f} us/手 | "
+              f"向量化分类 {classify:6.2f} us/手 | 合计 {convert + classify:6.2f} us/手 | "
+              f"classify_landmarks {entry:6.2f} us/手")
+
+    for fps in (10, 5):
+        sent, delay = chatter(random.Random(1), fps=fps)
+        print(f"{fps} fps 抖动序列: 逐帧回传 {sent['逐帧']} 条 | 滤波后 {sent['滤波']} 条 | "
+              f"平均确认延迟 {delay * 1000:.0f} ms")
@@ -0,0 +1,97 @@
+# bench_inference_pool.py
+# 进程池推理的吞吐随进程数的变化：--streams 路车同时尽快送帧，分别用 1..N 个进程跑，对比单线程推理
+# 有模型时用真的 HandLandmarker（video 模式），没有时用 --busy-ms 的假检测器（纯 Python 按 CPU 时间忙等，持有 GIL，和原来的瓶颈一样）
+# 用法: python bench_inference_pool.py [--streams 4] [--seconds 5] [--model hand_landmarker.task] [--busy-ms 8]
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+from inference_pool import InferencePool
+
+
+class BusyDetector:
+    def __init__(self, ms):
+        self.seconds = ms / 1000
+
+    def detect(self, image, ts=None, context=None):
+        # 按本线程 CPU 时间忙等：几个进程挤在同一个核上时不会把等待算成干活
+        end = time.thread_time() + self.seconds
+        checksum = int(image[::16, ::16].sum())  # 确认共享内存里的像素读得到
+        while time.thread_time() < end:
+            pass
+        return checksum
+
+    def close(self):
+        pass
+
+
+def detector_factory(args):
+    if args.model and os.path.exists(args.model):
+        from hand_detector import HandDetector
+        return lambda on_result=None: HandDetector(args.model, "video", num_hands=1), "HandLandmarker"
+    return lambda on_result=None: BusyDetector(args.busy_ms), f"忙等 {args.busy_ms} ms"
+
+
+def make_frames(streams, height=240, width=320):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (height, width, 3), np.uint8) for _ in range(streams)]
+
+
+def run_inline(make, frames, seconds):
+    """原来的做法：一个线程轮流给每路车推理"""
+    detectors = [make() for _ in frames]
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for i, frame in enumerate(frames):
+            detectors[i].detect(frame, time.monotonic())
+            done += 1
+    return done / (time.perf_counter() - start)
+
+
+def run_pool(make, frames, seconds, workers):
+    cond = threading.Condition()
+    done = [0]
+
+    def on_free(key):
+        with cond:
+            cond.notify()
+
+    def on_result(result, context):
+        done[0] += 1
+
+    pool = InferencePool(workers, make, on_result, on_free, max_shape=frames[0].shape)
+    for i, frame in enumerate(frames):
+        pool.submit(i, frame, time.monotonic())  # 预热：每个进程建好检测器和共享内存映射
+    time.sleep(1.0)
+    done[0] = 0
+    start = time.perf_counter()
+    with cond:
+        while time.perf_counter() - start < seconds:
+            for i, frame in enumerate(frames):
+                pool.submit(i, frame, time.monotonic())  # 这路上一帧还没回来时直接返回 False
+            cond.wait(0.05)
+    fps = done[0] / (time.perf_counter() - start)
+    pool.close()
+    return fps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="推理进程池吞吐")
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--model", default="hand_landmarker.task")
+    parser.add_argument("--busy-ms", type=float, default=8)
+    args = parser.parse_args()
+
+    make, name = detector_factory(args)
+    frames = make_frames(args.streams)
+    print(f"检测器: {name} | {args.streams} 路 | CPU 核数 {os.cpu_count()}")
+    base = run_inline(make, frames, args.seconds)
+    print(f"{'单线程':<8}{base:8.1f} fps")
+    for workers in range(1, args.streams + 1):
+        fps = run_pool(make, frames, args.seconds, workers)
+        print(f"{workers} 进程   {fps:8.1f} fps  x{fps / base:.2f}")
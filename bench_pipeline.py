@@ -0,0 +1,204 @@
+# bench_pipeline.py
+# 可复现的全流程基准：固定一组帧，小车端 imencode + 发送走本机回环，
+# ECS 端按 ser_tcp_med.py 的顺序跑 分帧接收 -> 解码到 RGB（decode.py）-> HandLandmarker -> 手势分类，
+# 输出每个阶段的 FPS、CPU 时间、延迟分位数（JSON），方便逐个提交对比有没有退化。
+# 用法: python bench_pipeline.py [--frames 目录 | --recording 录制文件] [--count 300] [--model hand_landmarker.task] [--out result.json]
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import config
+from decode import FrameDecoder
+from frame_receiver import FrameReceiver
+from gesture import classify_hands, landmarks_to_array
+from protocol import FRAME_HEADER_V2
+from recording import RecordingReader
+
+STAGES = ["encode", "send", "recv", "decode", "infer", "classify"]
+
+
+class StageTimer:
+    """每个阶段记录 墙钟耗时 和 本线程 CPU 耗时"""
+
+    def __init__(self):
+        self.wall = {s: [] for s in STAGES}
+        self.cpu = {s: 0.0 for s in STAGES}
+
+    def run(self, stage, fn, *args):
+        cpu = time.thread_time()
+        start = time.perf_counter()
+        result = fn(*args)
+        self.wall[stage].append(time.perf_counter() - start)
+        self.cpu[stage] += time.thread_time() - cpu
+        return result
+
+    def report(self):
+        out = {}
+        for s in STAGES:
+            w = np.array(self.wall[s]) * 1000
+            if not len(w):
+                continue
+            p50, p95, p99 = np.percentile(w, [50, 95, 99])
+            out[s] = {
+                "count": len(w),
+                "fps": round(len(w) / (w.sum() / 1000), 1) if w.sum() else None,
+                "cpu_s": round(self.cpu[s], 4),
+                "mean_ms": round(float(w.mean()), 3),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(w.max()), 3),
+            }
+        return out
+
+
+def load_recording(path, count, width, height):
+    """录制文件里的 JPEG 解码后循环取（小车端还要重新编码，所以这里要原始像素）"""
+    reader = RecordingReader(path)
+    images = []
+    for i in range(min(count, len(reader))):
+        ts, frame_id, jpeg = reader.frame(i)
+        img = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        del jpeg
+        if img is not None:
+            images.append(cv2.resize(img, (width, height)))
+    reader.close()
+    if not images:
+        raise SystemExit(f"{path} 里没有可解码的帧")
+    return [images[i % len(images)] for i in range(count)]
+
+
+def load_frames(path, count, width, height):
+    """目录里的图片按文件名排序循环取；不给目录时生成固定随机种子的合成画面"""
+    if path:
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+        if not names:
+            raise SystemExit(f"{path} 里没有图片")
+        images = [cv2.resize(cv2.imread(os.path.join(path, n)), (width, height)) for n in names]
+        return [images[i % len(images)] for i in range(count)]
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.uint8)
+    base = np.empty((height, width, 3), np.uint8)
+    base[..., 0] = x[None, :]
+    base[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+    base[..., 2] = 96
+    frames = []
+    for i in range(count):
+        frame = base.copy()
+        cx, cy = int(width * (0.2 + 0.6 * (i % 50) / 50)), height // 2
+        cv2.circle(frame, (cx, cy), height // 6, (200, 170, 150), -1)
+        frame += rng.integers(0, 8, frame.shape, dtype=np.uint8)  # 一点传感器噪声，JPEG 大小更接近实拍
+        frames.append(frame)
+    return frames
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(frames, quality, model_path):
+    timer = StageTimer()
+    car_timer = StageTimer()
+    srv = socket.create_server(("127.0.0.1", 0))
+    port = srv.getsockname()[1]
+    frame_bytes = []
+
+    def car():
+        sock = socket.create_connection(("127.0.0.1", port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        for i, frame in enumerate(frames):
+            ok, buf = car_timer.run("encode", cv2.imencode, ".jpg", frame, params)
+            data = buf.tobytes()
+            frame_bytes.append(len(data))
+            car_timer.run("send", sock.sendall, FRAME_HEADER_V2.pack(time.time(), i, len(data)) + data)
+        sock.close()
+
+    detector = None
+    if model_path and os.path.exists(model_path):
+        from hand_detector import HandDetector
+        detector = HandDetector(model_path, "image", num_hands=1)
+
+    t = threading.Thread(target=car, daemon=True)
+    conn_cpu = time.process_time()
+    start = time.perf_counter()
+    t.start()
+    conn, _ = srv.accept()
+    rx = FrameReceiver(header=FRAME_HEADER_V2)
+    decoder = FrameDecoder(config.VIDEO_WIDTH, config.VIDEO_HEIGHT)
+    hands = 0
+    for _ in frames:
+        ts, frame_id, view = timer.run("recv", rx.recv_frame, conn)
+        rgb = timer.run("decode", decoder.decode, view)
+        if detector is not None:
+            result = timer.run("infer", detector.detect, rgb)
+            if result.hand_landmarks:
+                hands += 1
+                timer.run("classify", lambda r: classify_hands(landmarks_to_array(r.hand_landmarks)), result)
+    elapsed = time.perf_counter() - start
+    total_cpu = time.process_time() - conn_cpu
+    t.join()
+    conn.close()
+    srv.close()
+    if detector is not None:
+        detector.close()
+
+    stages = car_timer.report()
+    stages.update(timer.report())
+    return {
+        "frames": len(frames),
+        "pipeline_fps": round(len(frames) / elapsed, 1),
+        "process_cpu_s": round(total_cpu, 3),
+        "jpeg_bytes_mean": int(np.mean(frame_bytes)),
+        "hands_detected": hands,
+        "infer": "ok" if detector is not None else f"skipped: 模型 {model_path} 不存在",
+        "stages": stages,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ser_tcp_med.py 流程基准，输出 JSON")
+    parser.add_argument("--frames", help="图片目录（缺省用合成画面）")
+    parser.add_argument("--recording", help="recording.py 录制文件")
+    parser.add_argument("--count", type=int, default=300)
+    parser.add_argument("--width", type=int, default=config.VIDEO_WIDTH)
+    parser.add_argument("--height", type=int, default=config.VIDEO_HEIGHT)
+    parser.add_argument("--quality", type=int, default=config.VIDEO_QUALITY)
+    parser.add_argument("--model", default="hand_landmarker.task")
+    parser.add_argument("--out", help="结果写到文件（缺省打印）")
+    args = parser.parse_args()
+
+    if args.recording:
+        frames = load_recording(args.recording, args.count, args.width, args.height)
+    else:
+        frames = load_frames(args.frames, args.count, args.width, args.height)
+    result = {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "source": args.recording or args.frames or "synthetic",
+        "resolution": [args.width, args.height],
+        "quality": args.quality,
+    }
+    result.update(run(frames, args.quality, args.model))
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"结果已写入 {args.out}")
+    else:
+        print(text)
@@ -0,0 +1,77 @@
+# bench_receiver.py
+# 本地 socketpair 微基准：旧的 data += packet 循环 vs FrameReceiver
+# 用法: python bench_receiver.py [帧数] [帧大小字节]
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+from frame_receiver import FrameReceiver, FRAME_HEADER
+
+
+def legacy_loop(conn, count):
+    # 与改造前 ser_tcp_med.handle_client 相同的拼接/切片逻辑
+    payload_size = struct.calcsize("dI")
+    data = b""
+    total = 0
+    for _ in range(count):
+        while len(data) < payload_size:
+            packet = conn.recv(4096)
+            if not packet:
+                raise ConnectionResetError
+            data += packet
+        header = data[:payload_size]
+        data = data[payload_size:]
+        ts, length = struct.unpack("dI", header)
+        while len(data) < length:
+            packet = conn.recv(4096)
+            if not packet:
+                raise ConnectionResetError
+            data += packet
+        frame_bytes = data[:length]
+        data = data[length:]
+        total += len(frame_bytes)
+    return total
+
+
+def receiver_loop(conn, count):
+    rx = FrameReceiver()
+    total = 0
+    for _ in range(count):
+        ts, frame_id, frame = rx.recv_frame(conn)
+        total += len(frame)
+    return total
+
+
+def run(recv_fn, count, size):
+    a, b = socket.socketpair()
+    payload = os.urandom(size)
+    blob = FRAME_HEADER.pack(time.time(), size) + payload
+
+    def sender():
+        for _ in range(count):
+            a.sendall(blob)
+
+    t = threading.Thread(target=sender, daemon=True)
+    start = time.perf_counter()
+    cpu = time.process_time()
+    t.start()
+    total = recv_fn(b, count)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    t.join()
+    a.close()
+    b.close()
+    assert total == count * size
+    return elapsed, cpu
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 15000
+    print(f"帧数 {count} | 帧大小 {size} B")
+    for name, fn in (("legacy", legacy_loop), ("FrameReceiver", receiver_loop)):
+        elapsed, cpu = run(fn, count, size)
+        print(f"{name:<14} {count / elapsed:8.0f} fps | {elapsed * 1e6 / count:7.1f} us/帧 | CPU {cpu:.3f} s")
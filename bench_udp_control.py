@@ -0,0 +1,138 @@
+# bench_udp_control.py
+# 摇杆指令从发出到被应用的延迟：TCP 文本行（现状） vs UDP 定长包
+# 本机回环不会丢包，这里在发送端模拟丢包：
+#   TCP: 丢一个段要等重传（rto），期间后面所有指令都被堵住，重传到了一起送达
+#   UDP: 丢的那个包晚 rto 到达（或者干脆没了），后面的包照常送达；晚到的旧包被接收端丢掉
+# 用法: python bench_udp_control.py [指令数] [丢包率] [rto 秒]
+import heapq
+import random
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+from udp_control import ControlChannel, encode_control
+
+HZ = 50
+
+
+def schedule(count, loss, rto, hol):
+    """返回 [(发送时刻偏移, 序号)]，hol=True 按 TCP 队头阻塞处理"""
+    plan = []
+    blocked_until = 0.0
+    for i in range(count):
+        t = i / HZ
+        if random.random() < loss:
+            late = t + rto
+            if hol:
+                blocked_until = max(blocked_until, late)
+            else:
+                plan.append((late, i))
+                continue
+        plan.append((max(t, blocked_until), i))
+    heapq.heapify(plan)
+    return plan
+
+
+def send_plan(plan, send_one, start):
+    while plan:
+        at, i = heapq.heappop(plan)
+        delay = start + at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        send_one(i)
+
+
+def encode_index(i):
+    # 把序号编进 (angle, strength)，TCP 文本协议里没有序号
+    return i % 360, (i // 360) % 101
+
+
+def decode_index(angle, strength):
+    return strength * 360 + angle
+
+
+def run_tcp(count, loss, rto):
+    sent_at = [0.0] * count
+    applied = []
+    srv = socket.create_server(("127.0.0.1", 0))
+    port = srv.getsockname()[1]
+
+    def receiver():
+        conn, _ = srv.accept()
+        f = conn.makefile("r")
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            msg = line.strip()
+            # 与 socket_worker 相同的解析
+            parts = msg.split(',')
+            angle = int(parts[0].split(':')[1])
+            strength = int(parts[1].split(':')[1])
+            i = decode_index(angle, strength)
+            applied.append(time.perf_counter() - sent_at[i])
+
+    t = threading.Thread(target=receiver, daemon=True)
+    t.start()
+    c = socket.create_connection(("127.0.0.1", port))
+    c.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def send_one(i):
+        angle, strength = encode_index(i)
+        # 延迟从原本该发出的时刻算起（被堵住的指令也是那时就产生了）
+        sent_at[i] = start + i / HZ
+        c.sendall(f"angle:{angle},strength:{strength}\n".encode())
+
+    start = time.perf_counter()
+    send_plan(schedule(count, loss, rto, hol=True), send_one, start)
+    c.close()
+    t.join()
+    srv.close()
+    return np.array(applied) * 1000
+
+
+def run_udp(count, loss, rto):
+    applied = []
+
+    def on_command(angle, strength, mode):
+        i = decode_index(angle, strength)
+        applied.append(time.perf_counter() - (start + i / HZ))
+
+    channel = ControlChannel(on_command, max_age=rto / 2).bind(0, "127.0.0.1")
+    port = channel._sock.getsockname()[1]
+    channel.start()
+    c = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send_one(i):
+        angle, strength = encode_index(i)
+        # 发送时刻用 perf_counter，和接收端 time.time() 不同源，正好模拟两边时钟不同步
+        c.sendto(encode_control(i, angle, strength, "manual", start + i / HZ), ("127.0.0.1", port))
+
+    start = time.perf_counter()
+    send_plan(schedule(count, loss, rto, hol=False), send_one, start)
+    time.sleep(0.2)
+    channel.stop()
+    c.close()
+    return np.array(applied) * 1000, channel.stats()
+
+
+def report(name, lat, extra):
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+    print(f"{name:<4} 应用 {len(lat):5d} 条 | 延迟 p50 {p50:6.2f} p95 {p95:6.2f} p99 {p99:7.2f} "
+          f"max {lat.max():7.2f} ms | {extra}")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    loss = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    rto = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    print(f"{count} 条指令 @ {HZ} Hz | 模拟丢包 {loss:.1%} | 重传/晚到 {rto * 1000:.0f} ms")
+    random.seed(1)
+    lat = run_tcp(count, loss, rto)
+    report("TCP", lat, "队头阻塞：丢包后面的指令一起晚到")
+    random.seed(1)
+    lat, stats = run_udp(count, loss, rto)
+    report("UDP", lat, f"乱序丢弃 {stats['out_of_order']} | 过期丢弃 {stats['stale']}")
@@ -0,0 +1,63 @@
+# capture.py
+# 独立采集线程：持续从摄像头取帧放进单槽，编码/发送只拿最新的一帧
+import threading
+import time
+
+from frame_slot import LatestFrameSlot
+
+
+class CaptureThread:
+    """
+    单槽缓冲 + 采集时间戳。发送端来不及取的帧直接被新帧覆盖（计入 dropped），
+    摄像头驱动里的缓冲不会因为网络卡顿而积压旧帧。
+    paused 为 True 时只 grab 不解码，保持驱动缓冲是新的，又省 CPU。
+    """
+
+    def __init__(self, cap):
+        self.cap = cap
+        self.slot = LatestFrameSlot()
+        self.paused = False
+        self.captured = 0
+        self.failed = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self.slot.close()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _run(self):
+        while self._running:
+            if self.paused:
+                if not self.cap.grab():
+                    time.sleep(0.05)
+                continue
+            ret, frame = self.cap.read()
+            ts = time.time()
+            if not ret or frame is None:
+                self.failed += 1
+                time.sleep(0.01)
+                continue
+            self.captured += 1
+            self.slot.publish(frame, ts)
+
+    def read(self, timeout=None):
+        """取最新一帧，返回 (frame, 采集时间戳)；超时返回 (None, 0)"""
+        return self.slot.take(timeout)
+
+    def stats(self):
+        s = self.slot.stats()
+        return {
+            "captured": self.captured,
+            "sent": s["consumed"],
+            "dropped": s["dropped"],
+            "failed": self.failed,
+        }
@@ -1,25 +1,60 @@
+import threading
+import time
+
 import cv2
-from flask import Flask, Response
+from flask import Flask, Response, jsonify, request
+
+from hardware import open_camera
+from mjpeg import JpegBroadcaster
 
 app = Flask(__name__)
 
-cap = cv2.VideoCapture(0)  # USB摄像头=0 / CSI一般也是0
+cap = open_camera(0)  # USB摄像头=0 / CSI一般也是0
+
+MAX_FPS = 15        # 每个客户端默认帧率上限，/video?fps=5 可以单独调低
+JPEG_QUALITY = 95   # 和原来 cv2.imencode 不带参数时的默认画质一致
+
+# 只有一个线程读摄像头、编码；所有客户端共享同一份 JPEG
+broadcaster = JpegBroadcaster()
 
-def gen_frames():
+def produce_frames():
+    params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
     while True:
+        if broadcaster.clients == 0:
+            # 没人看就不编码，只 grab 保持摄像头缓冲是新的
+            cap.grab()
+            time.sleep(0.05)
+            continue
         success, frame = cap.read()
         if not success:
-            break
-        else:
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+            time.sleep(0.1)
+            continue
+        ret, buffer = cv2.imencode('.jpg', frame, params)
+        if not ret:
+            continue
+        broadcaster.publish(buffer.tobytes())
+
+# 第一个请求时启动采集线程：不管是直接运行还是被 WSGI 服务器导入都能出画面
+_producer = None
+_producer_lock = threading.Lock()
+
+def ensure_producer():
+    global _producer
+    with _producer_lock:
+        if _producer is None:
+            _producer = threading.Thread(target=produce_frames, daemon=True)
+            _producer.start()
 
 @app.route('/video')
 def video():
-    return Response(gen_frames(),
+    ensure_producer()
+    fps = request.args.get('fps', MAX_FPS, type=float)
+    return Response(broadcaster.stream(max_fps=min(fps, MAX_FPS)),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/stats')
+def stats():
+    return jsonify(broadcaster.stats())
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    app.run(host='0.0.0.0', port=5000, threaded=True)
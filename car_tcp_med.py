@@ -1,47 +1,72 @@
-import cv2
 import socket
-import struct
 import time
 
-ECS_IP = "47.105.118.110"
-ECS_PORT = 8088
+import config
+from protocol import encode_hello, FRAME_HEADER_V2
+from adaptive_sender import CongestionController
+from capture import CaptureThread
+from scheduler import PeriodicScheduler
+from hardware import open_camera
+
+ECS_IP = config.ECS_IP
+ECS_PORT = config.ECS_PORT
 
 # TCP 连接
 client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, config.VIDEO_SNDBUF)
 client_socket.connect((ECS_IP, ECS_PORT))
+# 这个脚本只发不收，按 v2 握手：ECS 只在手势变化时回传，不会每帧回 ACK 堆在接收缓冲区里
+client_socket.sendall(encode_hello(config.CAR_ID, 2))
 
 # 摄像头
-cap = cv2.VideoCapture(0)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
+cap = open_camera(0, config.VIDEO_WIDTH, config.VIDEO_HEIGHT)
 
 FPS = 20
-frame_interval = 1.0 / FPS
+TELEMETRY_INTERVAL = 5  # 秒
+
+# 上传画质/分辨率/帧率随链路状况自动调整
+encoder = CongestionController(
+    quality=config.VIDEO_QUALITY,
+    min_quality=config.VIDEO_MIN_QUALITY,
+    max_quality=config.VIDEO_MAX_QUALITY,
+    fps=FPS, min_fps=config.VIDEO_MIN_FPS, max_fps=FPS,
+)
+last_telemetry = time.time()
+frame_id = 0
+
+# 独立采集线程持续取帧，发送端按截止时间取最新一帧
+capture = CaptureThread(cap).start()
+schedule = PeriodicScheduler(encoder.frame_interval)
 
 try:
     while True:
-        start_time = time.time()
-        ret, frame = cap.read()
-        if not ret:
+        schedule.interval = encoder.frame_interval
+        schedule.wait()
+        frame, timestamp = capture.read(timeout=schedule.interval)
+        if frame is None:
             continue
 
-        # JPEG 压缩
-        _, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 50])
-        frame_bytes = buffer.tobytes()
+        # JPEG 压缩（按当前档位缩放）
+        frame_bytes = encoder.encode(frame)
 
-        # 消息结构: timestamp + frame length + frame bytes
-        timestamp = time.time()
-        header = struct.pack("dI", timestamp, len(frame_bytes))
+        # 消息结构(v2): 采集时间戳 + frame_id + frame length + frame bytes
+        frame_id = (frame_id + 1) & 0xFFFFFFFF
+        header = FRAME_HEADER_V2.pack(timestamp, frame_id, len(frame_bytes))
+        send_start = time.perf_counter()
         client_socket.sendall(header + frame_bytes)
+        encoder.observe(time.perf_counter() - send_start, len(frame_bytes), client_socket)
 
-        # 控制帧率
-        elapsed = time.time() - start_time
-        sleep_time = frame_interval - elapsed
-        if sleep_time > 0:
-            time.sleep(sleep_time)
+        if time.time() - last_telemetry > TELEMETRY_INTERVAL:
+            last_telemetry = time.time()
+            t = encoder.telemetry()
+            c = capture.stats()
+            print(f"画质 {t['quality']} | {t['width']}x{t['height']} | {t['fps']} fps | "
+                  f"发送 {t['send_ms']} ms | 队列 {t['backlog']} B | 帧 {t['frame_bytes']} B")
+            print(f"采集 {c['captured']} | 发送 {c['sent']} | 丢弃 {c['dropped']} | 超时 {schedule.overruns}")
 
 except KeyboardInterrupt:
     print("小车端退出")
 finally:
+    capture.stop()
     cap.release()
     client_socket.close()
@@ -0,0 +1,63 @@
+# change_gate.py
+# 推理前的变化门：画面跟上一次真正推理的那帧比几乎没变时，直接复用上一次的结果
+# 比较用的是 32x24 灰度缩略图，缩放 + 做差加起来不到 1 ms，比一次 HandLandmarker 便宜得多
+import time
+
+import cv2
+import numpy as np
+
+
+class ChangeGate:
+    """
+    check(frame) -> (result, thumb)：result 不为 None 表示画面没变，可以直接用；
+    否则照常推理，推理完调用 update(thumb, result)。
+    缩略图里亮度差超过 pixel_threshold 的像素占比超过 changed_ratio 算“变了”；
+    同一个结果最多复用 max_age 秒，防止缓慢漂移或漏判一直不推理。
+    """
+
+    def __init__(self, pixel_threshold=8, changed_ratio=0.005, max_age=0.5, size=(32, 24)):
+        self.pixel_threshold = pixel_threshold
+        self.changed_ratio = changed_ratio
+        self.max_age = max_age
+        self.size = size
+        self._thumb = None       # 上一次推理那帧的缩略图（不是上一帧，缓慢变化也能累积出来）
+        self._result = None
+        self._result_time = 0.0
+        self.checked = 0
+        self.skipped = 0
+        self.last_change = 0.0   # 最近一次比较的变化像素占比，调阈值时看
+
+    def thumbnail(self, frame):
+        # 先 INTER_AREA 缩小再转灰度，转色只做 768 个像素；输入是 decode.py 出的 RGB
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_RGB2GRAY) if small.ndim == 3 else small
+
+    def check(self, frame, now=None):
+        now = time.time() if now is None else now
+        thumb = self.thumbnail(frame)
+        self.checked += 1
+        if self._thumb is None or self._result is None or now - self._result_time > self.max_age:
+            return None, thumb
+        diff = cv2.absdiff(thumb, self._thumb)
+        self.last_change = float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+        if self.last_change > self.changed_ratio:
+            return None, thumb
+        self.skipped += 1
+        return self._result, thumb
+
+    def update(self, thumb, result, now=None):
+        self._thumb = thumb
+        self._result = result
+        self._result_time = time.time() if now is None else now
+
+    def reset(self):
+        self._thumb = None
+        self._result = None
+
+    def stats(self):
+        return {
+            "checked": self.checked,
+            "skipped": self.skipped,
+            "skip_ratio": self.skipped / self.checked if self.checked else 0.0,
+            "last_change": self.last_change,
+        }
@@ -1,4 +1,6 @@
 # config.py
+import os
+import socket
 
 # GPIO 定义
 LEFT_FORWARD  = 22
@@ -9,10 +11,44 @@ RIGHT_FORWARD  = 24
 RIGHT_BACKWARD = 25
 RIGHT_PWM      = 23
 
+# 硬件后端: real（树莓派 GPIO + 摄像头）/ sim（sim_hardware 模拟）
+HARDWARE = os.environ.get("CAR_HARDWARE", "real")
+
 # 网络
 SERVER_PORT = 12345
+ECS_IP = os.environ.get("ECS_IP", "47.105.118.110")
+ECS_PORT = int(os.environ.get("ECS_PORT", "8088"))
+CAR_ID = os.environ.get("CAR_ID") or socket.gethostname()  # ECS 按它区分多辆车
+UDP_CONTROL_PORT = int(os.environ.get("UDP_CONTROL_PORT", "12346"))  # 手机 UDP 摇杆端口，0 关闭
+UDP_MAX_AGE = 0.2         # 摇杆包比最快的包晚到这么多秒就丢掉
+NET_MODE = os.environ.get("CAR_NET_MODE", "threads")  # threads: 三个网络线程 / asyncio: 单事件循环
 
 # 控制参数
 CONTROL_HZ = 50           # 控制频率
 MAX_POWER = 0.6           # 最大速度
 TIMEOUT_STOP = 0.5        # 失联自动停车（秒）
+MOTOR_MAX_ACCEL = 0       # 每个轮子每秒最大功率变化，0 不限制（开了会让避让转角变小）
+
+# 避障（自动模式前进时）
+CRUISE_SPEED = 0.3        # 张手前进 / 避让后恢复的速度
+AVOID_DISTANCE = 0.2      # 兜底：距离小于它无论速度都避让（米）
+AVOID_TTC = 1.5           # 按当前指令速度，预计这么多秒内撞上就避让（巡航 0.3 时约 0.27 m）
+AVOID_TURN_SPEED = 0.3
+AVOID_TURN_TIME = 0.5     # 原地左转时长（秒），约 90 度
+AVOID_RESUME_TIME = 0.2   # 转完后这段时间不看距离，等超声波读数刷新
+
+# 超声波后台采样
+DISTANCE_RATE = 20        # 采样频率 Hz
+DISTANCE_WINDOW = 5       # 中值窗口
+DISTANCE_ALPHA = 0.5      # EMA 系数
+DISTANCE_MAX_AGE = 0.3    # 读数超过这么久没更新就当没有
+SPEED_PER_POWER = 0.6     # 满功率直行速度（m/s），用来把指令功率换算成接近速度
+
+# 视频上传（自适应控制的上下限）
+VIDEO_WIDTH = 320
+VIDEO_HEIGHT = 240
+VIDEO_QUALITY = 50        # 初始 JPEG 画质
+VIDEO_MIN_QUALITY = 20
+VIDEO_MAX_QUALITY = 60
+VIDEO_MIN_FPS = 3
+VIDEO_SNDBUF = 64 * 1024  # 限制内核发送缓冲，避免链路变差时排队越积越多
@@ -0,0 +1,106 @@
+# decode.py
+# JPEG -> 推理用 RGB 的解码阶段
+# 源图比推理分辨率大时用 IMREAD_REDUCED_COLOR_* 让解码器直接按 1/2、1/4、1/8 出图（DCT 阶段就缩小，省算力）；
+# 只缩小不放大；BGR->RGB 写进复用的预分配缓冲区，交给 mp.Image 时不再分配
+import cv2
+import numpy as np
+
+REDUCED_FLAGS = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)]
+# 不带尺寸的标记：DHT、JPG、DAC
+SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(data):
+    """从 SOF 段读出 (宽, 高)，不解码；不是 JPEG 或读不到时返回 None"""
+    n = len(data)
+    if n < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    pos = 2
+    while pos + 9 <= n:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1  # 填充字节
+            continue
+        if marker in SOF_MARKERS:
+            height = data[pos + 5] << 8 | data[pos + 6]
+            width = data[pos + 7] << 8 | data[pos + 8]
+            return width, height
+        if marker == 0xD9 or marker == 0xDA:
+            return None  # 到了图像数据还没见到 SOF
+        pos += 2 + (data[pos + 2] << 8 | data[pos + 3])
+    return None
+
+
+def fit_size(width, height, max_width=None, max_height=None):
+    """保持宽高比缩到 max 以内；比 max 小的不放大"""
+    scale = 1.0
+    if max_width and width > max_width:
+        scale = max_width / width
+    if max_height and height > max_height:
+        scale = min(scale, max_height / height)
+    if scale >= 1.0:
+        return width, height
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+class FrameDecoder:
+    """
+    decode(jpeg) / convert(bgr) -> RGB 数组（推理分辨率，连续内存）。
+    返回的是内部复用的缓冲区，下一次调用会覆盖；需要留着的话自己 copy()。
+    一个解码器只给一个线程用。
+    """
+
+    def __init__(self, max_width=None, max_height=None):
+        self.max_width = max_width
+        self.max_height = max_height
+        self._rgb = None
+        self._scratch = None   # 缩放后的 BGR（解码尺寸和目标尺寸对不上时才用）
+        self.frames = 0
+        self.reduced = 0       # 走了缩小解码的帧数
+        self.resized = 0       # 解码后还需要 resize 的帧数
+        self.failed = 0
+
+    def _buffer(self, name, width, height):
+        buf = getattr(self, name)
+        if buf is None or buf.shape[0] != height or buf.shape[1] != width:
+            buf = np.empty((height, width, 3), np.uint8)
+            setattr(self, name, buf)
+        return buf
+
+    def decode(self, jpeg):
+        data = np.frombuffer(jpeg, np.uint8)
+        size = jpeg_size(jpeg)
+        flags = cv2.IMREAD_COLOR
+        if size is not None:
+            target = fit_size(*size, self.max_width, self.max_height)
+            for factor, reduced in REDUCED_FLAGS:
+                # 缩小后仍不小于目标尺寸才用，保证之后只会再缩一点，不会放大
+                if size[0] // factor >= target[0] and size[1] // factor >= target[1]:
+                    flags = reduced
+                    self.reduced += 1
+                    break
+        bgr = cv2.imdecode(data, flags)
+        if bgr is None:
+            self.failed += 1
+            return None
+        return self.convert(bgr)
+
+    def convert(self, bgr):
+        h, w = bgr.shape[:2]
+        tw, th = fit_size(w, h, self.max_width, self.max_height)
+        self.frames += 1
+        if (tw, th) != (w, h):
+            bgr = cv2.resize(bgr, (tw, th), dst=self._buffer("_scratch", tw, th), interpolation=cv2.INTER_AREA)
+            self.resized += 1
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=self._buffer("_rgb", tw, th))
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "reduced": self.reduced,
+            "resized": self.resized,
+            "failed": self.failed,
+            "shape": None if self._rgb is None else self._rgb.shape[:2],
+        }
@@ -0,0 +1,94 @@
+# distance_sampler.py
+# 超声波后台采样：固定频率读数进环形缓冲，中值去掉偶发的错误回波，再 EMA 平滑
+# 控制循环只读 latest（一个不可变元组，整体替换，不用加锁），不再在控制线程里同步测距
+import math
+import threading
+import time
+
+
+class DistanceSampler:
+    """
+    latest = (时间戳, 滤波后距离 m, 接近速度 m/s, 碰撞时间 s)，还没有读数时为 None。
+    接近速度由指令速度换算：两轮平均功率 * speed_per_power，只算前进方向；
+    不前进时碰撞时间为 inf。
+    """
+
+    def __init__(self, read, speed=None, rate=20, window=5, alpha=0.5,
+                 speed_per_power=0.6, max_distance=4.0):
+        self.read = read              # 返回原始距离（米）的函数
+        self.speed = speed            # 返回 (左, 右) 指令功率的函数
+        self.interval = 1 / rate
+        self.alpha = alpha
+        self.speed_per_power = speed_per_power
+        self.max_distance = max_distance
+        self.ring = [(0.0, 0.0)] * window  # (时间戳, 原始读数)
+        self.index = 0
+        self.filled = 0
+        self.samples = 0
+        self.failed = 0
+        self.latest = None
+        self._ema = None
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _run(self):
+        next_deadline = time.monotonic()
+        while self._running:
+            try:
+                raw = self.read()
+            except Exception:
+                raw = None
+            self.add(raw)
+            next_deadline += self.interval
+            delay = next_deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_deadline = time.monotonic()
+
+    def add(self, raw, ts=None):
+        """加入一个原始读数并更新 latest（采样线程调用，也方便离线喂数据）"""
+        if ts is None:
+            ts = time.monotonic()
+        if raw is None or not 0 <= raw <= self.max_distance:
+            self.failed += 1
+            return self.latest
+        self.ring[self.index] = (ts, raw)
+        self.index = (self.index + 1) % len(self.ring)
+        self.filled = min(self.filled + 1, len(self.ring))
+        self.samples += 1
+
+        recent = sorted(r for _, r in self.ring[:self.filled])
+        median = recent[len(recent) // 2]
+        self._ema = median if self._ema is None else self._ema + self.alpha * (median - self._ema)
+
+        closing = 0.0
+        if self.speed is not None:
+            left, right = self.speed()
+            closing = max(0.0, (left + right) / 2 * self.speed_per_power)
+        ttc = self._ema / closing if closing > 0 else math.inf
+        self.latest = (ts, self._ema, closing, ttc)
+        return self.latest
+
+    def estimate(self, max_age=0.5, now=None):
+        """返回 (距离, 碰撞时间)；读数太旧或还没有读数返回 (None, None)"""
+        latest = self.latest
+        if now is None:
+            now = time.monotonic()
+        if latest is None or now - latest[0] > max_age:
+            return None, None
+        return latest[1], latest[3]
+
+    def stats(self):
+        return {"samples": self.samples, "failed": self.failed}
@@ -0,0 +1,265 @@
+# ecs_session.py
+# ECS 端多车会话：每辆车独立的帧槽、手势状态和回传通道
+# 所有连接的收发都跑在一个 selectors 事件循环里，不再一车一线程
+import collections
+import selectors
+import socket
+import threading
+
+from frame_receiver import FrameReceiver
+from frame_slot import LatestFrameSlot
+from protocol import parse_hello, frame_header, encode_gesture, encode_batch, MsgType, Gesture
+
+
+class CarSession:
+    MAX_OUTBOX = 64  # 对端不读回执时（例如只发不收的小车）待发队列的上限
+
+    def __init__(self, conn, addr):
+        self.conn = conn
+        self.addr = addr
+        self.car_id = None        # 握手后确定
+        self.version = 0
+        self.rx = FrameReceiver()
+        self.slot = LatestFrameSlot()
+        self.gesture = "NO_HAND"
+        self.last_sent_gesture = "NO_HAND"
+        self.closed = False
+        self.seq = 0               # v3 指令消息序号
+        self._outbox = collections.deque()  # [待发 memoryview, 发完回调, 可丢弃]
+        self.dropped = 0           # 待发队列满时丢掉的纯 ACK
+        self._out_lock = threading.Lock()
+        self._loop = None
+
+    def next_seq(self):
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        return self.seq
+
+    def send(self, data, on_sent=None, droppable=False):
+        """
+        线程安全：排队待发数据，由事件循环在可写时发出；发完后在循环线程里调用 on_sent()。
+        droppable=True 的消息（纯 ACK）在队列超过 MAX_OUTBOX 时先丢最旧的，手势不丢
+        """
+        if self.closed:
+            return False
+        with self._out_lock:
+            if len(self._outbox) >= self.MAX_OUTBOX:
+                # 队头可能已经发出一半，不能丢
+                for i in range(1, len(self._outbox)):
+                    if self._outbox[i][2]:
+                        del self._outbox[i]
+                        self.dropped += 1
+                        break
+            self._outbox.append([memoryview(data), on_sent, droppable])
+        if self._loop is not None:
+            self._loop.want_write(self)
+        return True
+
+    def _flush(self):
+        done = []
+        try:
+            with self._out_lock:
+                while self._outbox:
+                    item = self._outbox[0]
+                    try:
+                        n = self.conn.send(item[0])
+                    except BlockingIOError:
+                        return False
+                    if n < len(item[0]):
+                        item[0] = item[0][n:]
+                        return False
+                    self._outbox.popleft()
+                    if item[1] is not None:
+                        done.append(item[1])
+                return True
+        finally:
+            for on_sent in done:
+                on_sent()
+
+
+def encode_reply(session, frame_id, gesture):
+    """
+    按小车的协议版本编码回执：
+    v3 每帧回一个 ACK（小车据此算往返时间），手势变化时同一批里带上 GESTURE；
+    v2 / 旧小车只在手势变化时回字符串，v2 回显 frame_id
+    """
+    if session.version >= 3:
+        messages = []
+        if gesture is not None:
+            messages.append((MsgType.GESTURE, session.next_seq(), frame_id, bytes([Gesture[gesture]])))
+        messages.append((MsgType.ACK, session.next_seq(), frame_id, b""))
+        return encode_batch(messages)
+    if gesture is None:
+        return None
+    return encode_gesture(gesture, frame_id if session.version >= 2 else None)
+
+
+class SessionRegistry:
+    """car_id -> CarSession，附带一个“有新帧”的就绪队列供推理线程等待"""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._sessions = {}
+        self._ready = collections.deque()
+
+    def add(self, session):
+        with self._cond:
+            old = self._sessions.get(session.car_id)
+            self._sessions[session.car_id] = session
+        return old
+
+    def remove(self, session):
+        with self._cond:
+            if self._sessions.get(session.car_id) is session:
+                del self._sessions[session.car_id]
+
+    def sessions(self):
+        with self._cond:
+            return list(self._sessions.values())
+
+    def publish(self, session, frame, ts):
+        if session.slot.publish(frame, ts):
+            with self._cond:
+                self._ready.append(session)
+                self._cond.notify()
+
+    def requeue(self, session):
+        """推理进程池放下一帧时调用：推理期间新到的帧 publish 时槽位不空，不会自己排队"""
+        with self._cond:
+            self._ready.append(session)
+            self._cond.notify()
+
+    def next_ready(self, timeout=None):
+        """阻塞到某辆车有新帧，返回该会话；超时返回 None"""
+        with self._cond:
+            while True:
+                if not self._ready:
+                    if not self._cond.wait(timeout):
+                        return None
+                    continue
+                session = self._ready.popleft()
+                if not session.closed:
+                    return session
+
+
+class IngestLoop:
+    """
+    单线程 selectors 循环：accept、握手、收帧、回传全部在这里完成。
+    on_frame(session, ts, frame_id, view) 在循环线程内调用，view 只在回调期间有效；
+    on_close(session) 在连接关闭后同样在循环线程内调用（可选）。
+    单辆车处理时抛出的任何异常（含超长帧）只关闭这辆车，不会让循环退出。
+    """
+
+    def __init__(self, server_socket, registry, on_frame, on_close=None):
+        self.server_socket = server_socket
+        self.registry = registry
+        self.on_frame = on_frame
+        self.on_close = on_close
+        self.sel = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+
+    def want_write(self, session):
+        with self._dirty_lock:
+            self._dirty.add(session)
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # 唤醒管道已满，循环迟早会醒
+
+    def run(self):
+        self.server_socket.setblocking(False)
+        self.sel.register(self.server_socket, selectors.EVENT_READ, None)
+        self.sel.register(self._wake_r, selectors.EVENT_READ, None)
+        while True:
+            for key, events in self.sel.select():
+                if key.fileobj is self.server_socket:
+                    self._accept()
+                elif key.fileobj is self._wake_r:
+                    self._on_wake()
+                else:
+                    session = key.data
+                    try:
+                        if events & selectors.EVENT_READ:
+                            self._on_readable(session)
+                        if events & selectors.EVENT_WRITE and not session.closed:
+                            self._on_writable(session)
+                    except (ConnectionResetError, BrokenPipeError):
+                        self._close(session)
+                    except Exception as e:
+                        # 一辆车的坏数据或回调异常只断开这辆车，循环继续服务其他车
+                        if not isinstance(e, OSError):
+                            print(f"小车 {session.car_id or session.addr} 处理出错，断开: {e!r}")
+                        self._close(session)
+
+    def _accept(self):
+        try:
+            conn, addr = self.server_socket.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        session = CarSession(conn, addr)
+        session._loop = self
+        self.sel.register(conn, selectors.EVENT_READ, session)
+        print(f"小车已连接: {addr}")
+
+    def _on_wake(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        for session in dirty:
+            if not session.closed:
+                self.sel.modify(session.conn, selectors.EVENT_READ | selectors.EVENT_WRITE, session)
+
+    def _on_readable(self, session):
+        try:
+            session.rx.fill(session.conn)
+        except BlockingIOError:
+            return
+        if session.car_id is None:
+            hello = parse_hello(session.rx)
+            if hello is None:
+                return
+            car_id, session.version = hello
+            session.rx.header = frame_header(session.version)
+            session.car_id = car_id or f"{session.addr[0]}:{session.addr[1]}"
+            old = self.registry.add(session)
+            if old is not None and old is not session:
+                print(f"小车 {session.car_id} 重连，关闭旧连接")
+                self._close(old)
+            print(f"小车注册: {session.car_id} (协议 v{session.version})")
+        while True:
+            item = session.rx.next_frame()
+            if item is None:
+                break
+            ts, frame_id, frame_bytes = item
+            self.on_frame(session, ts, frame_id, frame_bytes)
+
+    def _on_writable(self, session):
+        if session._flush():
+            self.sel.modify(session.conn, selectors.EVENT_READ, session)
+
+    def _close(self, session):
+        if session.closed:
+            return
+        session.closed = True
+        session.slot.close()
+        self.registry.remove(session)
+        try:
+            self.sel.unregister(session.conn)
+        except (KeyError, ValueError):
+            pass
+        session.conn.close()
+        print(f"小车断开连接: {session.car_id or session.addr}")
+        if self.on_close is not None:
+            try:
+                self.on_close(session)
+            except Exception as e:
+                print(f"小车 {session.car_id or session.addr} 关闭回调出错: {e!r}")
@@ -0,0 +1,92 @@
+# frame_receiver.py
+# 零拷贝分帧接收：预分配 bytearray + recv_into(memoryview)
+from protocol import FRAME_HEADER_V1
+
+FRAME_HEADER = FRAME_HEADER_V1  # 默认帧头，握手后可按协议版本替换 header
+MAX_FRAME_BYTES = 4 * 1024 * 1024  # 单帧上限：长度字段是 32 位，坏数据或恶意连接不能让缓冲区涨到 4 GB
+
+
+class FrameReceiver:
+    """
+    复用的接收引擎。next_frame() 返回的 memoryview 直接指向内部缓冲区，
+    只在下一次 fill() 之前有效（解码完再收下一批）。
+    """
+
+    def __init__(self, capacity=256 * 1024, header=FRAME_HEADER, max_frame=MAX_FRAME_BYTES):
+        self.header = header
+        self.max_frame = max_frame
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0  # 未消费数据起点
+        self._end = 0    # 已接收数据终点
+        self._want = header.size  # 凑齐下一帧所需的字节数
+
+    def fill(self, sock):
+        """recv_into 一次，返回收到的字节数；对端关闭抛 ConnectionResetError"""
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif self._start + self._want > len(self._buf):
+            self._compact()
+        n = sock.recv_into(self._view[self._end:])
+        if n == 0:
+            raise ConnectionResetError
+        self._end += n
+        return n
+
+    def _compact(self):
+        # 把残留的半帧挪到开头；单帧超过容量时扩容
+        pending = self._end - self._start
+        if self._want > len(self._buf):
+            size = len(self._buf)
+            while size < self._want:
+                size *= 2
+            buf = bytearray(size)
+            buf[:pending] = self._view[self._start:self._end]
+            self._buf = buf
+            self._view = memoryview(buf)
+        else:
+            self._view[:pending] = self._view[self._start:self._end]
+        self._start = 0
+        self._end = pending
+
+    def peek(self, n):
+        """查看开头 n 字节（不消费），不够返回 None"""
+        if self._end - self._start < n:
+            self._want = n
+            return None
+        return self._view[self._start:self._start + n]
+
+    def skip(self, n):
+        self._start += n
+        self._want = self.header.size
+
+    def next_frame(self):
+        """
+        缓冲区里有完整一帧时返回 (ts, frame_id, memoryview)，否则返回 None；旧帧头 frame_id 为 0。
+        帧长度超过 max_frame 抛 ValueError，调用方应断开连接（之后的数据已无法分帧）
+        """
+        avail = self._end - self._start
+        hsize = self.header.size
+        if avail < hsize:
+            self._want = hsize
+            return None
+        fields = self.header.unpack_from(self._buf, self._start)
+        length = fields[-1]
+        if length > self.max_frame:
+            raise ValueError(f"帧长度 {length} 超过上限 {self.max_frame}")
+        total = hsize + length
+        if avail < total:
+            self._want = total
+            return None
+        frame = self._view[self._start + hsize:self._start + total]
+        self._start += total
+        self._want = hsize
+        return fields[0], (fields[1] if len(fields) > 2 else 0), frame
+
+    def recv_frame(self, sock):
+        """阻塞读取一帧"""
+        while True:
+            item = self.next_frame()
+            if item is not None:
+                return item
+            self.fill(sock)
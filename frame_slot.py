@@ -0,0 +1,57 @@
+# frame_slot.py
+# 最新帧信箱：生产者只管覆盖，消费者睡眠等待新帧（drop-oldest）
+import threading
+import time
+
+
+class LatestFrameSlot:
+    """单槽最新值信箱：Condition 保护下交换一个引用（新帧直接覆盖旧帧），附带 发布/消费/丢弃 计数"""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        # 单槽：_pending 只存一个引用，publish 覆盖、take() 取走置空，都不拷贝帧数据
+        self._pending = None
+        self._pending_ts = 0
+        self._closed = False
+        self.published = 0
+        self.consumed = 0
+        self.dropped = 0
+
+    def publish(self, frame, ts=None):
+        """放入新帧；槽位原本为空时返回 True（用于通知外部就绪队列）"""
+        if ts is None:
+            ts = time.time()
+        with self._cond:
+            was_empty = self._pending is None
+            if not was_empty:
+                self.dropped += 1  # 旧帧还没被取走，直接丢掉
+            self._pending = frame
+            self._pending_ts = ts
+            self.published += 1
+            self._cond.notify()
+        return was_empty
+
+    def take(self, timeout=None):
+        """阻塞直到有新帧，返回 (frame, ts)；超时或关闭返回 (None, 0)"""
+        with self._cond:
+            if self._pending is None and not self._closed:
+                self._cond.wait_for(lambda: self._pending is not None or self._closed, timeout)
+            frame, ts = self._pending, self._pending_ts
+            if frame is None:
+                return None, 0
+            self._pending = None
+            self.consumed += 1
+            return frame, ts
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "published": self.published,
+                "consumed": self.consumed,
+                "dropped": self.dropped,
+            }
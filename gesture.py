@@ -0,0 +1,170 @@
+# gesture.py
+# 手势分类（FIST / OPEN / UNKNOWN），对一批手做向量化计算；GestureDebouncer 做逐路的时间滤波
+import collections
+import math
+
+import numpy as np
+
+WRIST = 0
+MIDDLE_MCP = 9                # 中指 MCP
+TIP_IDS = [8, 12, 16, 20]     # 食指~小指指尖
+
+# 默认阈值（与原先各入口里写死的一致）
+STRAIGHT_RATIO = 1.55   # 指尖到手腕 / 掌长 超过它算伸直；平均值超过它才算 OPEN
+FIST_RATIO = 1.25       # 平均比值低于它（且无伸直手指）算 FIST
+OPEN_MIN_STRAIGHT = 3   # OPEN 至少需要的伸直手指数
+
+# 滞回：已经确认是 OPEN / FIST 时，用更宽松的退出阈值判这一帧，比值在边界附近抖动不会来回翻
+OPEN_EXIT_RATIO = 1.45
+FIST_EXIT_RATIO = 1.35
+CONFIRM_FRAMES = 3      # 最近 WINDOW_FRAMES 帧里同一手势至少这么多帧才确认
+WINDOW_FRAMES = 5
+
+# 手腕之外要用到的点：掌长基准 + 4 个指尖
+_POINTS = np.array([MIDDLE_MCP] + TIP_IDS)
+
+
+def landmarks_to_array(hands):
+    """MediaPipe 的 hand_landmarks 列表 -> (N_hands, 21, 3) float64 数组"""
+    flat = np.fromiter((v for hand in hands for lm in hand for v in (lm.x, lm.y, lm.z)),
+                       np.float64, count=len(hands) * 63)
+    return flat.reshape(len(hands), 21, 3)
+
+
+def finger_ratios(arr):
+    """每只手 4 根手指的 指尖-手腕距离 / 掌长，形状 (N, 4)，只用 x/y"""
+    d = arr[:, _POINTS, :2] - arr[:, WRIST:WRIST + 1, :2]
+    dist = np.hypot(d[..., 0], d[..., 1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return dist[:, 1:] / dist[:, :1]
+
+
+def classify_hands(arr, straight_ratio=STRAIGHT_RATIO, fist_ratio=FIST_RATIO,
+                   open_min_straight=OPEN_MIN_STRAIGHT):
+    """(N, 21, 3) 数组 -> 每只手的手势字符串列表"""
+    return classify_ratios(finger_ratios(arr), straight_ratio, fist_ratio, open_min_straight)
+
+
+def classify_ratios(ratios, straight_ratio=STRAIGHT_RATIO, fist_ratio=FIST_RATIO,
+                    open_min_straight=OPEN_MIN_STRAIGHT):
+    """finger_ratios 的结果 (N, 4) -> 每只手的手势字符串列表"""
+    straight = (ratios > straight_ratio).sum(axis=1).tolist()
+    avg_ratio = (ratios.sum(axis=1) / len(TIP_IDS)).tolist()
+    return [
+        "FIST" if s == 0 and a < fist_ratio
+        else "OPEN" if s >= open_min_straight and a > straight_ratio
+        else "UNKNOWN"
+        for s, a in zip(straight, avg_ratio)
+    ]
+
+
+def hand_ratios(hand):
+    """
+    单只手（MediaPipe landmark 列表）的 4 个比值，纯 Python 只读 6 个点。
+    转 (1, 21, 3) 数组要读 63 个属性、numpy 小数组开销也大，从 landmark 对象出发时比向量化快
+    """
+    w, m = hand[WRIST], hand[MIDDLE_MCP]
+    palm = math.hypot(m.x - w.x, m.y - w.y)
+    dists = [math.hypot(hand[t].x - w.x, hand[t].y - w.y) for t in TIP_IDS]
+    if palm == 0:
+        return [math.inf if d else math.nan for d in dists]  # 和 numpy 除零结果一致
+    return [d / palm for d in dists]
+
+
+def classify_one(ratios, straight_ratio=STRAIGHT_RATIO, fist_ratio=FIST_RATIO,
+                 open_min_straight=OPEN_MIN_STRAIGHT):
+    """单只手的 4 个比值 -> 手势字符串，规则和 classify_ratios 相同"""
+    straight = sum(r > straight_ratio for r in ratios)
+    avg_ratio = sum(ratios) / len(TIP_IDS)
+    if straight == 0 and avg_ratio < fist_ratio:
+        return "FIST"
+    if straight >= open_min_straight and avg_ratio > straight_ratio:
+        return "OPEN"
+    return "UNKNOWN"
+
+
+def classify_landmarks(hands, **thresholds):
+    """
+    MediaPipe 的 hand_landmarks 列表 -> 手势列表，逐只手走纯 Python。
+    从 landmark 对象出发时转数组（每手约 10 us）比分类本身还贵，几只手的批量向量化也追不回来；
+    已经是数组的（录制、测试数据）用 classify_hands
+    """
+    return [classify_one(hand_ratios(hand), **thresholds) for hand in hands]
+
+
+def detect_gesture(hand, **thresholds):
+    """单只手的便捷入口"""
+    return classify_one(hand_ratios(hand), **thresholds)
+
+
+class GestureDebouncer:
+    """
+    每路视频流一个。update(hand, ts) 喂这一帧第一只手：MediaPipe 的 landmark 列表（线上，不转数组）
+    或 (1, 21, 3) 数组，没手传 None；
+    返回 (确认后的手势, 置信度)：
+    - 单帧先按比值分类；当前确认的是 OPEN / FIST 时，这一帧用退出阈值判（滞回）
+    - 最近 window 帧里某个手势（含 NO_HAND）至少 confirm 帧才切换过去，单帧闪烁不会改变输出
+    - 置信度 = 窗口里和确认手势一致的帧占比
+    max_age 秒以前的帧移出窗口，视频断一阵再来时不会拿旧帧凑数
+    """
+
+    def __init__(self, confirm=CONFIRM_FRAMES, window=WINDOW_FRAMES, max_age=1.0,
+                 straight_ratio=STRAIGHT_RATIO, fist_ratio=FIST_RATIO,
+                 open_exit_ratio=OPEN_EXIT_RATIO, fist_exit_ratio=FIST_EXIT_RATIO,
+                 open_min_straight=OPEN_MIN_STRAIGHT):
+        if not 1 <= confirm <= window:
+            raise ValueError(f"confirm ({confirm}) 必须在 1..window ({window}) 之间，否则手势永远确认不了")
+        self.confirm = confirm
+        self.max_age = max_age
+        self.straight_ratio = straight_ratio
+        self.fist_ratio = fist_ratio
+        self.open_exit_ratio = open_exit_ratio
+        self.fist_exit_ratio = fist_exit_ratio
+        self.open_min_straight = open_min_straight
+        self._window = collections.deque(maxlen=window)   # (ts, 单帧手势)
+        self.gesture = "NO_HAND"
+        self.confidence = 0.0
+        self.raw = "NO_HAND"       # 最近一帧的单帧结果
+        self.frames = 0
+        self.changes = 0           # 确认手势切换次数
+        self.raw_changes = 0       # 单帧结果切换次数（不滤波时会发出去的次数）
+
+    def classify(self, hand):
+        if hand is None:
+            return "NO_HAND"
+        straight, fist = self.straight_ratio, self.fist_ratio
+        if self.gesture == "OPEN":
+            straight = self.open_exit_ratio
+        elif self.gesture == "FIST":
+            fist = self.fist_exit_ratio
+        ratios = finger_ratios(hand)[0].tolist() if isinstance(hand, np.ndarray) else hand_ratios(hand)
+        return classify_one(ratios, straight, fist, self.open_min_straight)
+
+    def update(self, hand, ts, vote=True):
+        """vote=False：这一帧没有真正推理（变化门沿用的旧结果），不进窗口，只返回当前确认的手势"""
+        if not vote:
+            return self.gesture, self.confidence
+        raw = self.classify(hand)
+        self.frames += 1
+        if raw != self.raw:
+            self.raw_changes += 1
+        self.raw = raw
+        while self._window and ts - self._window[0][0] > self.max_age:
+            self._window.popleft()
+        self._window.append((ts, raw))
+        votes = collections.Counter(g for _, g in self._window)
+        best, count = votes.most_common(1)[0]
+        if best != self.gesture and count >= self.confirm:
+            self.gesture = best
+            self.changes += 1
+        self.confidence = votes[self.gesture] / len(self._window)
+        return self.gesture, self.confidence
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "changes": self.changes,
+            "raw_changes": self.raw_changes,
+            "gesture": self.gesture,
+            "confidence": self.confidence,
+        }
@@ -0,0 +1,81 @@
+# hand_detector.py
+# HandLandmarker 三种运行模式的统一封装
+# image: 每帧都跑手掌检测
+# video: detect_for_video，跟踪上一帧的关键点，命中时跳过手掌检测
+# live : detect_async，结果通过回调返回，不阻塞调用线程
+import threading
+import time
+
+import mediapipe as mp
+from mediapipe.tasks import python
+from mediapipe.tasks.python import vision
+
+RUNNING_MODES = {
+    "image": vision.RunningMode.IMAGE,
+    "video": vision.RunningMode.VIDEO,
+    "live": vision.RunningMode.LIVE_STREAM,
+}
+
+
+class HandDetector:
+    """
+    detect(rgb, ts, context) -> result
+    image/video 模式同步返回结果；live 模式返回 None，结果交给 on_result(result, context)
+    ts 为帧时间戳（秒，一般取小车帧头里的时间），缺省用本机 monotonic 时钟
+    """
+
+    def __init__(self, model_path, running_mode="image", num_hands=1, on_result=None,
+                 min_hand_detection_confidence=0.5,
+                 min_hand_presence_confidence=0.5,
+                 min_tracking_confidence=0.5):
+        if running_mode not in RUNNING_MODES:
+            raise ValueError(f"未知运行模式: {running_mode}，可选 {list(RUNNING_MODES)}")
+        if running_mode == "live" and on_result is None:
+            raise ValueError("live 模式需要 on_result 回调")
+        self.running_mode = running_mode
+        self.on_result = on_result
+        self._last_ms = -1
+        self._contexts = {}  # live 模式: 时间戳 -> 调用方上下文
+        self._ctx_lock = threading.Lock()
+
+        options = vision.HandLandmarkerOptions(
+            base_options=python.BaseOptions(model_asset_path=model_path),
+            running_mode=RUNNING_MODES[running_mode],
+            num_hands=num_hands,
+            min_hand_detection_confidence=min_hand_detection_confidence,
+            min_hand_presence_confidence=min_hand_presence_confidence,
+            min_tracking_confidence=min_tracking_confidence,
+            result_callback=self._on_async_result if running_mode == "live" else None,
+        )
+        self._landmarker = vision.HandLandmarker.create_from_options(options)
+
+    def _timestamp_ms(self, ts):
+        # MediaPipe 要求时间戳严格递增；小车时钟回跳或同一毫秒内两帧时顺延 1 ms
+        ms = int((time.monotonic() if ts is None else ts) * 1000)
+        if ms <= self._last_ms:
+            ms = self._last_ms + 1
+        self._last_ms = ms
+        return ms
+
+    def detect(self, rgb, ts=None, context=None):
+        image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
+        if self.running_mode == "image":
+            return self._landmarker.detect(image)
+        ts_ms = self._timestamp_ms(ts)
+        if self.running_mode == "video":
+            return self._landmarker.detect_for_video(image, ts_ms)
+        with self._ctx_lock:
+            self._contexts[ts_ms] = context
+        self._landmarker.detect_async(image, ts_ms)
+        return None
+
+    def _on_async_result(self, result, output_image, ts_ms):
+        # MediaPipe 内部线程回调；被丢弃的帧不会回调，顺手清理比它更早的上下文
+        with self._ctx_lock:
+            context = self._contexts.pop(ts_ms, None)
+            for stale in [t for t in self._contexts if t < ts_ms]:
+                del self._contexts[stale]
+        self.on_result(result, context)
+
+    def close(self):
+        self._landmarker.close()
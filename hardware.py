@@ -0,0 +1,25 @@
+# hardware.py
+# 硬件后端选择：real 用 gpiozero + 真摄像头，sim 用 sim_hardware 里的模拟小车
+# CAR_HARDWARE=sim python main.py 就能在没有树莓派的机器上跑
+import cv2
+
+import config
+
+BACKEND = config.HARDWARE
+
+if BACKEND == "sim":
+    from sim_hardware import Motor, PWMOutputDevice, DistanceSensor, VideoCapture
+elif BACKEND == "real":
+    from gpiozero import Motor, PWMOutputDevice, DistanceSensor
+    VideoCapture = cv2.VideoCapture
+else:
+    raise ValueError(f"未知硬件后端: {BACKEND}（可选 real / sim）")
+
+
+def open_camera(index=0, width=None, height=None):
+    cap = VideoCapture(index)
+    if width:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    if height:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    return cap
@@ -0,0 +1,260 @@
+# inference_pool.py
+# 多进程推理：N 个子进程各自持有检测器（HandLandmarker），绕开 GIL，一台 ECS 能按车数用满多核
+# 解码后的 RGB 放进每辆车一块的 shared_memory，队列里只传 (车, 共享内存名, 形状, 时间戳) 小元组，不 pickle 图像；
+# 同一辆车固定分给同一个进程（video 模式的跟踪状态和单调时间戳都在那个进程的检测器里），
+# 每辆车同一时刻最多一帧在推理，结果回来才放下一帧，所以一块共享内存就够
+import itertools
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+import traceback
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# 子进程 -> 主进程的消息状态
+DONE = "done"      # 同步模式：结果随消息返回，共享内存已用完
+QUEUED = "queued"  # live 模式：已交给 detect_async，共享内存已用完，结果稍后回调
+ASYNC = "async"    # live 模式的回调结果
+ERROR = "error"
+
+
+def _worker(make_detector, shared, requests, results):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C 由主进程处理，再通过队列让子进程退出
+    detectors = {}   # 车 id -> 检测器；shared 时所有车共用 None 这一个
+    buffers = {}     # 车 id -> SharedMemory
+
+    def on_result(result, context):
+        cid, token = context
+        results.put((cid, token, result, ASYNC))
+
+    while True:
+        msg = requests.get()
+        if msg is None:
+            break
+        cid, token, name, shape, ts = msg
+        if token is None:
+            # 车断开：关掉它的检测器和共享内存映射
+            detector = detectors.pop(cid, None)
+            if detector is not None:
+                detector.close()
+            shm = buffers.pop(cid, None)
+            if shm is not None:
+                shm.close()
+            continue
+        shm = buffers.get(cid)
+        if shm is None or shm.name != name:
+            if shm is not None:
+                shm.close()  # 主进程换了更大的一块
+            shm = buffers[cid] = shared_memory.SharedMemory(name=name)
+        key = None if shared else cid
+        try:
+            detector = detectors.get(key)
+            if detector is None:
+                detector = detectors[key] = make_detector(on_result)
+            image = np.ndarray(shape, np.uint8, buffer=shm.buf)
+            result = detector.detect(image, ts, context=(cid, token))
+            del image  # 释放对 shm.buf 的引用，之后才能 close
+            results.put((cid, token, result, DONE if result is not None else QUEUED))
+        except Exception:
+            traceback.print_exc()
+            results.put((cid, token, None, ERROR))
+    for detector in detectors.values():
+        detector.close()
+    for shm in buffers.values():
+        shm.close()
+
+
+class InferencePool:
+    """
+    submit(key, image, ts, context)：把图像拷进 key 的共享内存交给它所在的进程；key 上一帧还没回来时返回 False。
+    结果在收集线程里回调 on_result(result, context)，之后 key 才算空闲并回调 on_free(key)。
+    make_detector(on_result) 在子进程里调用，返回有 detect(image, ts, context) / close() 的对象；
+    shared=True 时每个进程只建一个检测器给所有车用（image 模式）。
+    用 fork 启动，子进程继承已导入的模块；要在起其他线程、绑定监听端口之前创建。
+    收集线程每 check_interval 秒检查一次子进程，死掉的进程会被重启，分给它的车在途帧作废、重新放行。
+    """
+
+    def __init__(self, workers, make_detector, on_result, on_free=None, shared=False, max_shape=(240, 320, 3),
+                 check_interval=1.0):
+        self._ctx = multiprocessing.get_context("fork")
+        # 先起 resource_tracker 再 fork，子进程和主进程共用一个；否则每个子进程 attach 时各起一个，
+        # 退出时把主进程已经 unlink 的共享内存当成泄漏再删一遍
+        resource_tracker.ensure_running()
+        self.on_result = on_result
+        self.on_free = on_free
+        self.max_shape = max_shape
+        self.check_interval = check_interval
+        self._make_detector = make_detector
+        self._shared = shared
+        self._results = self._ctx.Queue()
+        self._requests = [self._ctx.Queue() for _ in range(workers)]
+        self._procs = [self._process(i) for i in range(workers)]
+        for p in self._procs:
+            p.start()
+        self._lock = threading.Lock()
+        self._closing = False
+        self._keys = {}       # key -> [进程序号, SharedMemory, 车 id]
+        self._by_id = {}      # 车 id -> key
+        self._busy = {}       # key -> 在途帧的 token；只有这个 token 的回执能放行
+        self._contexts = {}   # token -> (车 id, context)
+        self._tokens = itertools.count()
+        self._ids = itertools.count()
+        self.load = [0] * workers   # 每个进程分到的车数
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self.restarts = 0
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _process(self, i):
+        return self._ctx.Process(target=_worker, name=f"infer-{i}", daemon=True,
+                                 args=(self._make_detector, self._shared, self._requests[i], self._results))
+
+    def busy(self, key):
+        with self._lock:
+            return key in self._busy
+
+    def keys(self):
+        with self._lock:
+            return list(self._keys)
+
+    def submit(self, key, image, ts, context=None):
+        with self._lock:
+            if key in self._busy:
+                return False
+            entry = self._keys.get(key)
+            if entry is None:
+                # 新车分给车最少的进程
+                worker = self.load.index(min(self.load))
+                size = max(int(np.prod(self.max_shape)), image.nbytes)
+                entry = self._keys[key] = [worker, shared_memory.SharedMemory(create=True, size=size),
+                                           next(self._ids)]
+                self._by_id[entry[2]] = key
+                self.load[worker] += 1
+            worker, shm, cid = entry
+            if image.nbytes > shm.size:
+                # 帧比预留的大：换一块，子进程看到新名字会重新映射
+                shm.close()
+                shm.unlink()
+                shm = entry[1] = shared_memory.SharedMemory(create=True, size=image.nbytes)
+            token = next(self._tokens)
+            self._busy[key] = token
+            self._contexts[token] = (cid, context)
+            self.submitted += 1
+            requests = self._requests[worker]
+        dst = np.ndarray(image.shape, np.uint8, buffer=shm.buf)
+        np.copyto(dst, image)
+        del dst
+        requests.put((cid, token, shm.name, image.shape, ts))
+        return True
+
+    def _collect(self):
+        last_check = time.monotonic()
+        while True:
+            try:
+                msg = self._results.get(timeout=self.check_interval)
+            except queue.Empty:
+                msg = ()
+            if msg is None:
+                break
+            if time.monotonic() - last_check >= self.check_interval:
+                last_check = time.monotonic()
+                self._check_workers()
+            if not msg:
+                continue
+            cid, token, result, status = msg
+            with self._lock:
+                key = self._by_id.get(cid)
+                item = None if status == QUEUED else self._contexts.pop(token, None)
+                if status == ASYNC:
+                    # live 模式被 MediaPipe 丢掉的帧不会回调，顺手清理这辆车更早的上下文
+                    for t in [t for t, (c, _) in self._contexts.items() if c == cid and t < token]:
+                        del self._contexts[t]
+                if status == ERROR:
+                    self.errors += 1
+            if result is not None and item is not None:
+                self.completed += 1
+                try:
+                    self.on_result(result, item[1])
+                except Exception:
+                    traceback.print_exc()
+            if status != ASYNC:
+                # 先处理完结果再放下一帧，同一辆车的回调不会和下一次 submit 交叠；
+                # 重启前死掉的进程留下的旧回执 token 对不上，不能放行已经交给新进程的帧
+                with self._lock:
+                    freed = key is not None and self._busy.get(key) == token
+                    if freed:
+                        del self._busy[key]
+                if freed and self.on_free is not None:
+                    self.on_free(key)
+
+    def _check_workers(self):
+        for i in range(len(self._procs)):
+            with self._lock:
+                dead = self._procs[i]
+                if self._closing or dead.is_alive():
+                    continue
+                # 分给它的车：在途帧作废，换新队列（旧队列里的请求没人取了），起一个新进程接手
+                keys = [key for key, entry in self._keys.items() if entry[0] == i]
+                cids = {self._keys[key][2] for key in keys}
+                freed = [key for key in keys if self._busy.pop(key, None) is not None]
+                for t in [t for t, (c, _) in self._contexts.items() if c in cids]:
+                    del self._contexts[t]
+                old = self._requests[i]
+                self._requests[i] = self._ctx.Queue()
+                proc = self._procs[i] = self._process(i)
+                self.restarts += 1
+            old.cancel_join_thread()
+            old.close()
+            print(f"!!! 推理进程 {dead.name} 意外退出（exitcode {dead.exitcode}），重启；"
+                  f"{len(keys)} 辆车改由新进程处理，作废在途帧 {len(freed)} 个")
+            proc.start()
+            if self.on_free is not None:
+                for key in freed:
+                    self.on_free(key)
+
+    def release(self, key):
+        """车断开后调用：通知子进程关掉检测器，释放共享内存"""
+        with self._lock:
+            entry = self._keys.pop(key, None)
+            if entry is None:
+                return
+            worker, shm, cid = entry
+            del self._by_id[cid]
+            self._busy.pop(key, None)
+            self.load[worker] -= 1
+            requests = self._requests[worker]
+        requests.put((cid, None, None, None, None))
+        shm.close()
+        shm.unlink()  # 子进程还映射着也没关系，名字删掉后等它 close 才真正释放
+
+    def close(self):
+        with self._lock:
+            self._closing = True
+        for key in self.keys():
+            self.release(key)
+        for q in self._requests:
+            q.put(None)
+        for p in self._procs:
+            p.join(timeout=2)
+            if p.is_alive():
+                p.terminate()
+        self._results.put(None)
+        self._collector.join(timeout=1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": len(self._procs),
+                "alive": sum(p.is_alive() for p in self._procs),
+                "load": list(self.load),
+                "in_flight": len(self._busy),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "errors": self.errors,
+                "restarts": self.restarts,
+            }
@@ -0,0 +1,137 @@
+# latency_trace.py
+# 分阶段延迟直方图（p50/p95/p99），可导出 JSON 离线分析
+# 导出: 给进程发 SIGUSR1（kill -USR1 <pid>），或退出时自动写文件
+# 查看: python latency_trace.py latency_car_xxx.json
+import json
+import math
+import signal
+import sys
+import threading
+import time
+
+# 小车端: capture 采集到开始编码 | encode 编码 | send 发送 | reply 发完到收到手势回执 | actuation 电机执行
+#         total 采集到电机执行完（只用小车时钟）
+# ECS 端: recv 采集到 ECS 收齐（跨机器，依赖时钟同步）| decode 解码 | infer 解码完到出结果（含排队）
+#         reply 出结果到回执写进 socket
+CAR_STAGES = ["capture", "encode", "send", "reply", "actuation", "total"]
+ECS_STAGES = ["recv", "decode", "infer", "reply"]
+
+
+class LatencyHistogram:
+    """对数分桶直方图，固定内存，每桶约 5% 精度，单位 ms"""
+
+    BASE = 0.01     # 最小桶下界 ms
+    RATIO = 1.05
+    BUCKETS = 330   # 覆盖到约 100 s
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, ms):
+        if ms < self.BASE:
+            i = 0
+        else:
+            i = min(int(math.log(ms / self.BASE, self.RATIO)), self.BUCKETS - 1)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                # 取桶的几何中点
+                return min(self.BASE * self.RATIO ** (i + 0.5), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 2) if self.count else 0.0,
+            "p50": round(self.percentile(50), 2),
+            "p95": round(self.percentile(95), 2),
+            "p99": round(self.percentile(99), 2),
+            "max": round(self.max, 2),
+        }
+
+
+def format_table(summary):
+    lines = [f"{'阶段':<10}{'次数':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)"]
+    for stage, s in summary.items():
+        if s["count"]:
+            lines.append(f"{stage:<12}{s['count']:>8}{s['p50']:>9.1f}{s['p95']:>9.1f}"
+                         f"{s['p99']:>9.1f}{s['max']:>9.1f}")
+    return "\n".join(lines)
+
+
+class LatencyTracer:
+    def __init__(self, role, stages):
+        self.role = role
+        self.stages = list(stages)
+        self._hists = {s: LatencyHistogram() for s in self.stages}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            hist = self._hists.get(stage)
+            if hist is None:
+                hist = self._hists[stage] = LatencyHistogram()
+                self.stages.append(stage)
+            hist.record(seconds * 1000)
+
+    def summary(self):
+        with self._lock:
+            return {s: self._hists[s].summary() for s in self.stages}
+
+    def format_summary(self):
+        return format_table(self.summary())
+
+    def dump(self, path=None):
+        """写 JSON（汇总 + 原始分桶），返回文件路径"""
+        if path is None:
+            path = f"latency_{self.role}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        with self._lock:
+            data = {
+                "role": self.role,
+                "time": time.time(),
+                "bucket_base_ms": LatencyHistogram.BASE,
+                "bucket_ratio": LatencyHistogram.RATIO,
+                "stages": {
+                    s: dict(self._hists[s].summary(), buckets=self._hists[s].counts)
+                    for s in self.stages
+                },
+            }
+        with open(path, "w") as f:
+            json.dump(data, f)
+        return path
+
+    def install_signal(self, signum=None):
+        """收到信号（默认 SIGUSR1）时导出（只能在主线程调用）；没有这个信号的平台（Windows）跳过，返回 False"""
+        if signum is None:
+            signum = getattr(signal, "SIGUSR1", None)
+            if signum is None:
+                return False
+        def handler(sig, frame):
+            # 信号处理跑在主线程里，主线程可能正持有锁，另起线程导出避免死锁
+            threading.Thread(target=lambda: print(f"延迟数据已导出: {self.dump()}")).start()
+        signal.signal(signum, handler)
+        return True
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python latency_trace.py <导出的 json>")
+        sys.exit(1)
+    with open(sys.argv[1]) as f:
+        data = json.load(f)
+    print(f"角色: {data['role']} | 导出时间: {time.ctime(data['time'])}")
+    print(format_table(data["stages"]))
@@ -1,30 +1,53 @@
+import asyncio
 import socket
 import threading
 import time
-import cv2
-import struct
 
 from motor import CarMotor
 from joystick import joystick_to_speed
 import config
-
-from tripod import get_distance, turn_left_90
+from concurrent.futures import ThreadPoolExecutor
+from protocol import (encode_hello, FRAME_HEADER_V2, MessageReader, MsgType, Gesture, ProtocolError,
+                      MSG_HEADER, parse_message_header)
+from latency_trace import LatencyTracer, CAR_STAGES
+from adaptive_sender import CongestionController
+from capture import CaptureThread
+from scheduler import PeriodicScheduler
+from udp_control import ControlChannel, ControlProtocol
+
+from hardware import open_camera
+from tripod import get_distance
+from avoidance import ObstacleAvoider
+from distance_sampler import DistanceSampler
 
 # ===== 全局变量 =====
 angle = 0
 strength = 0
 last_recv_time = time.time()
 mode = "auto"  # auto / manual
+udp_mode = None  # UDP 摇杆包上一次带的模式，只在它变化时切换
 running = True
 lock = threading.Lock()
 conn = None
 server = None
 cap = None
+capture = None
 client_socket = None
 ult_flag = False
 
 FPS = 10
-frame_interval = 1.0 / FPS
+STATS_INTERVAL = 10  # 秒
+
+# 上传画质/分辨率/帧率随链路状况自动调整
+encoder = CongestionController(
+    quality=config.VIDEO_QUALITY,
+    min_quality=config.VIDEO_MIN_QUALITY,
+    max_quality=config.VIDEO_MAX_QUALITY,
+    fps=FPS, min_fps=config.VIDEO_MIN_FPS, max_fps=FPS,
+)
+
+# 分阶段延迟直方图，kill -USR1 <pid> 导出 JSON，退出时也会导出
+tracer = LatencyTracer("car", CAR_STAGES)
 
 motor = CarMotor(
     config.LEFT_FORWARD,
@@ -32,59 +55,217 @@ motor = CarMotor(
     config.LEFT_PWM,
     config.RIGHT_FORWARD,
     config.RIGHT_BACKWARD,
-    config.RIGHT_PWM
+    config.RIGHT_PWM,
+    max_accel=config.MOTOR_MAX_ACCEL,
+)
+
+# 避障状态机，控制循环每拍推进一次，握拳 / 切手动时打断
+avoider = ObstacleAvoider(
+    motor,
+    trigger_distance=config.AVOID_DISTANCE,
+    trigger_ttc=config.AVOID_TTC,
+    turn_time=config.AVOID_TURN_TIME,
+    turn_speed=config.AVOID_TURN_SPEED,
+    cruise_speed=config.CRUISE_SPEED,
+    resume_time=config.AVOID_RESUME_TIME,
+)
+
+# 超声波后台采样，控制循环只读缓存的估计值
+sampler = DistanceSampler(
+    get_distance,
+    speed=lambda: motor.speed,
+    rate=config.DISTANCE_RATE,
+    window=config.DISTANCE_WINDOW,
+    alpha=config.DISTANCE_ALPHA,
+    speed_per_power=config.SPEED_PER_POWER,
 )
 
 auto_left = 0
 auto_right = 0
-ECS_IP = "47.105.118.110"
-ECS_PORT = 8088
+ECS_IP = config.ECS_IP
+ECS_PORT = config.ECS_PORT
 
 
 # ===== ECS 视频发送线程 =====
+def ensure_camera():
+    global cap, capture
+    if cap is None:
+        cap = open_camera(0, config.VIDEO_WIDTH, config.VIDEO_HEIGHT)
+        capture = CaptureThread(cap).start()
+    capture.paused = False
+
+
+def pause_camera():
+    if capture is not None:
+        capture.paused = True
+
+
+def encode_frame(frame, capture_ts):
+    """编码一帧并打包帧头，返回 (frame_id, 数据, 编码完成时刻)；线程模式和 asyncio 执行器共用"""
+    picked = time.time()
+    tracer.record("capture", picked - capture_ts)
+    start = time.perf_counter()
+    frame_bytes = encoder.encode(frame)
+    encoded = time.perf_counter()
+    tracer.record("encode", encoded - start)
+
+    frame_id = next_frame_id()
+    header = FRAME_HEADER_V2.pack(capture_ts, frame_id, len(frame_bytes))
+    return frame_id, header + frame_bytes, encoded
+
+
+def frame_sent(sock, frame_id, capture_ts, nbytes, encoded):
+    sent = time.perf_counter()
+    tracer.record("send", sent - encoded)
+    encoder.observe(sent - encoded, nbytes, sock)
+    remember_frame(frame_id, capture_ts, sent)
+
+
+def print_upload_stats(schedule):
+    c = capture.stats()
+    t = encoder.telemetry()
+    rtt = "-" if t["rtt_ms"] is None else f"{t['rtt_ms']:.0f} ms"
+    print(f"上传统计: 采集 {c['captured']} | 发送 {c['sent']} | 丢弃 {c['dropped']} | 超时 {schedule.overruns}")
+    print(f"码率控制: 画质 {t['quality']} | {t['width']}x{t['height']} | {t['fps']} fps | 发送 {t['send_ms']} ms | "
+          f"队列 {t['backlog']} B | RTT {rtt} | 帧 {t['frame_bytes']} B")
+    if t["decisions"]:
+        d = t["decisions"][-1]
+        print(f"码率控制最近一次调整: {d['action']}（{d['reason']}）{time.time() - d['time']:.0f} 秒前")
+
+
 def ecs_sender_worker():
-    global cap, client_socket, running, mode
+    global client_socket
+    schedule = PeriodicScheduler(encoder.frame_interval)
+    last_stats = time.time()
     while running:
         if mode != "auto":
+            pause_camera()
             time.sleep(0.05)
             continue
-
-        if cap is None:
-            cap = cv2.VideoCapture(0)
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
+        ensure_camera()
 
         if client_socket is None:
             try:
                 client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 client_socket.settimeout(5)
+                client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, config.VIDEO_SNDBUF)
                 client_socket.connect((ECS_IP, ECS_PORT))
+                client_socket.sendall(encode_hello(config.CAR_ID))
             except:
                 client_socket = None
                 time.sleep(1)
                 continue
 
-        ret, frame = cap.read()
-        if not ret or frame is None:
-            time.sleep(frame_interval)
+        # 按截止时间发帧，取发送时刻最新的一帧
+        schedule.interval = encoder.frame_interval
+        schedule.wait()
+        frame, capture_ts = capture.read(timeout=schedule.interval)
+        if frame is None:
             continue
 
-        _, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 50])
-        frame_bytes = buffer.tobytes()
-        header = struct.pack("dI", time.time(), len(frame_bytes))
+        frame_id, data, encoded = encode_frame(frame, capture_ts)
         try:
-            client_socket.sendall(header + frame_bytes)
+            client_socket.sendall(data)
+            frame_sent(client_socket, frame_id, capture_ts, len(data), encoded)
         except:
             try: client_socket.close()
             except: pass
             client_socket = None
 
-        time.sleep(frame_interval)
+        if time.time() - last_stats > STATS_INTERVAL:
+            last_stats = time.time()
+            print_upload_stats(schedule)
+
+
+# ===== 延迟追踪 =====
+# frame_id -> (采集时间戳, 发送完成时刻)，收到 ECS 的 ACK / 手势时算 reply / total
+_frame_id = 0
+_inflight = {}
+_inflight_lock = threading.Lock()
+MAX_INFLIGHT = 256  # 丢帧或断线时收不到 ACK，超出后丢最旧的
+
+def next_frame_id():
+    global _frame_id
+    _frame_id = (_frame_id + 1) & 0xFFFFFFFF
+    return _frame_id
+
+def remember_frame(frame_id, capture_ts, sent):
+    with _inflight_lock:
+        _inflight[frame_id] = (capture_ts, sent)
+        if len(_inflight) > MAX_INFLIGHT:
+            del _inflight[next(iter(_inflight))]
+
+def lookup_frame(frame_id):
+    with _inflight_lock:
+        return _inflight.get(frame_id)
+
+def pop_frame(frame_id):
+    with _inflight_lock:
+        return _inflight.pop(frame_id, None)
+
+
+def stop_cruise():
+    """
+    停车并退出巡航，调用方持有 lock。ECS 断线、切模式、看门狗停车都走这里：
+    只停电机不清 ult_flag 的话，重连后的 OPEN 会被当成重复忽略，车停着状态却还是“巡航”
+    """
+    global ult_flag
+    ult_flag = False
+    avoider.cancel()
+    motor.stop()
 
 
 # ===== 手机控制线程 =====
+def handle_phone_line(msg):
+    """处理手机发来的一行指令，返回要回给手机的字节（没有则 None）；共享状态都在锁内改"""
+    global angle, strength, last_recv_time, mode
+    with lock:
+        last_recv_time = time.time()
+        if msg == "s":
+            if mode != "manual":
+                stop_cruise()
+            mode = "manual"
+            return b"s\n"
+        if msg == "z":
+            if mode != "auto":
+                stop_cruise()
+            mode = "auto"
+            angle = 0
+            strength = 0
+            return b"z\n"
+        if msg.startswith("angle:") and mode == "manual":
+            parts = msg.split(',')
+            angle = int(parts[0].split(':')[1])
+            strength = int(parts[1].split(':')[1])
+    return None
+
+
+def handle_joystick(a, s, m):
+    """
+    UDP 摇杆包：包里的模式变化时才切换（每个包都带模式，照单全收会盖掉 TCP 的 s/z），切回自动时清零；
+    手动模式下更新摇杆
+    """
+    global angle, strength, last_recv_time, mode, udp_mode
+    with lock:
+        last_recv_time = time.time()
+        if m != udp_mode:
+            if m != mode:
+                stop_cruise()
+            udp_mode = mode = m
+            if m != "manual":
+                angle = 0
+                strength = 0
+        if m == "manual" and mode == "manual":
+            angle = a
+            strength = s
+
+
+# UDP 摇杆通道，TCP 的 s/z 和 angle 行仍然可用
+udp_control = ControlChannel(handle_joystick, config.UDP_MAX_AGE)
+
+
 def socket_worker():
-    global angle, strength, last_recv_time, mode, running, conn, server
+    global last_recv_time, conn, server
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     server.bind(('', config.SERVER_PORT))
@@ -101,22 +282,9 @@ def socket_worker():
                 line = f.readline()
                 if not line:
                     break
-                msg = line.strip()
-                with lock:
-                    last_recv_time = time.time()
-
-                if msg == "s":
-                    mode = "manual"
-                    conn.sendall(b"s\n")
-                elif msg == "z":
-                    mode = "auto"
-                    angle = 0
-                    strength = 0
-                    conn.sendall(b"z\n")
-                elif msg.startswith("angle:") and mode == "manual":
-                    parts = msg.split(',')
-                    angle = int(parts[0].split(':')[1])
-                    strength = int(parts[1].split(':')[1])
+                reply = handle_phone_line(line.strip())
+                if reply is not None:
+                    conn.sendall(reply)
 
             f.close()
             conn.close()
@@ -128,79 +296,258 @@ def socket_worker():
 
 
 # ===== ECS 手势控制线程 =====
+def drop_ecs_connection(sock):
+    global client_socket
+    try: sock.close()
+    except OSError: pass
+    if client_socket is sock:
+        client_socket = None  # 发送线程会重连
+
+
+def apply_gesture(gesture, frame_id):
+    global ult_flag
+    with lock:
+        if mode == "auto":
+            start = time.perf_counter()
+            # 只在状态真的要变时动电机，按巡航标志判断（避让时电机速度会变，不能拿速度判断）：
+            # 没在巡航时握拳、已经在巡航（含避让中）时张手都不处理，重复的 OPEN 不会打断正在进行的避让
+            if gesture == Gesture.FIST and ult_flag:
+                print("停车")
+                stop_cruise()
+            elif gesture == Gesture.OPEN and not ult_flag:
+                print("前进")
+                ult_flag = True
+                avoider.cancel()
+                motor.set_speed(config.CRUISE_SPEED, config.CRUISE_SPEED)
+            tracer.record("actuation", time.perf_counter() - start)
+
+    inflight = lookup_frame(frame_id)
+    if inflight is not None:
+        tracer.record("total", time.time() - inflight[0])
+
+
+def handle_ecs_message(msg_type, frame_id, payload):
+    if msg_type == MsgType.GESTURE and len(payload) == 1:
+        try:
+            gesture = Gesture(payload[0])
+        except ValueError:
+            return
+        apply_gesture(gesture, frame_id)
+    elif msg_type == MsgType.ACK:
+        inflight = pop_frame(frame_id)
+        if inflight is not None:
+            rtt = time.perf_counter() - inflight[1]
+            tracer.record("reply", rtt)
+            encoder.on_ack(rtt)
+
+
 def ecs_receiver_worker():
-    global client_socket, running, mode, motor, ult_flag
+    reader = None
     while running:
-        if client_socket is None:
+        sock = client_socket
+        if sock is None:
             time.sleep(0.1)
             continue
+        if reader is None or reader.sock is not sock:
+            reader = MessageReader(sock)
 
         try:
-            header = client_socket.recv(4)
-            if not header or len(header) < 4:
-                time.sleep(0.05)
-                continue
+            msg_type, seq, frame_id, payload = reader.read()
+        except socket.timeout:
+            continue  # 暂时没有消息，已读到一半的内容保留在 reader 里
+        except (ProtocolError, OSError) as e:
+            print(f"ECS 连接断开: {e!r}")
+            drop_ecs_connection(sock)
+            continue
 
-            length = struct.unpack("I", header)[0]
-            data = b""
-            while len(data) < length:
-                packet = client_socket.recv(length - len(data))
-                if not packet:
-                    break
-                data += packet
+        handle_ecs_message(msg_type, frame_id, payload)
 
-            msg = data.decode("utf-8")
-            with lock:
-                if mode == "auto":
-                    if msg == "FIST":
-                        print("停车")
-                        ult_flag = False
-                        motor.stop()
-                    elif msg == "OPEN":
-                        print("前进")
-                        ult_flag = True
-                        motor.set_speed(0.3, 0.3)
 
-        except:
-            print("ECS 连接断开")
-            time.sleep(0.1)
+# ===== asyncio 网络模式 =====
+# CAR_NET_MODE=asyncio 时，手机服务、ECS 上行、ECS 下行都是同一个事件循环里的协程，
+# 只占一个线程；JPEG 编码丢给单线程执行器，不阻塞循环。
+async def phone_client_async(reader, writer):
+    global conn, last_recv_time
+    conn = writer
+    with lock:
+        last_recv_time = time.time()
+    try:
+        while running:
+            line = await reader.readline()
+            if not line:
+                break
+            reply = handle_phone_line(line.decode("utf-8", "replace").strip())
+            if reply is not None:
+                writer.write(reply)
+                await writer.drain()
+    except (ConnectionError, ValueError):
+        print("APP连接断开")
+    finally:
+        conn = None
+        writer.close()
+
+
+async def phone_server_async():
+    global server
+    srv = await asyncio.start_server(phone_client_async, '', config.SERVER_PORT, reuse_address=True)
+    server = srv
+    async with srv:
+        await srv.serve_forever()
+
+
+async def ecs_uplink_async(writer, executor):
+    loop = asyncio.get_running_loop()
+    sock = writer.get_extra_info("socket")
+    schedule = PeriodicScheduler(encoder.frame_interval)
+    last_stats = time.time()
+    while running and client_socket is sock:
+        if mode != "auto":
+            pause_camera()
+            await asyncio.sleep(0.05)
+            continue
+        ensure_camera()
+
+        schedule.interval = encoder.frame_interval
+        await asyncio.sleep(schedule.delay())
+        schedule.mark()
+        frame, capture_ts = capture.read(timeout=0)
+        if frame is None:
+            continue
+
+        frame_id, data, encoded = await loop.run_in_executor(executor, encode_frame, frame, capture_ts)
+        writer.write(data)
+        await writer.drain()
+        frame_sent(sock, frame_id, capture_ts, len(data), encoded)
+
+        if time.time() - last_stats > STATS_INTERVAL:
+            last_stats = time.time()
+            print_upload_stats(schedule)
+
+
+async def ecs_downlink_async(reader):
+    while running:
+        header = await reader.readexactly(MSG_HEADER.size)
+        msg_type, seq, frame_id, length = parse_message_header(header)
+        payload = await reader.readexactly(length) if length else b""
+        handle_ecs_message(msg_type, frame_id, payload)
+
+
+async def ecs_client_async(executor):
+    global client_socket
+    while running:
+        if mode != "auto":
+            pause_camera()
+            await asyncio.sleep(0.05)
+            continue
+        ensure_camera()
+
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(ECS_IP, ECS_PORT), 5)
+        except (OSError, asyncio.TimeoutError):
+            await asyncio.sleep(1)
+            continue
+        sock = writer.get_extra_info("socket")
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, config.VIDEO_SNDBUF)
+        writer.write(encode_hello(config.CAR_ID))
+        client_socket = sock
+
+        tasks = [asyncio.ensure_future(ecs_uplink_async(writer, executor)),
+                 asyncio.ensure_future(ecs_downlink_async(reader))]
+        # 上下行任意一个结束（断线、协议错误）就整条连接重来
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for t in pending:
+            t.cancel()
+        for t in done:
+            if t.exception() is not None:
+                print(f"ECS 连接断开: {t.exception()!r}")
+        if client_socket is sock:
+            client_socket = None
+        writer.close()
+
+
+async def network_async():
+    if config.UDP_CONTROL_PORT:
+        await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: ControlProtocol(udp_control), local_addr=('0.0.0.0', config.UDP_CONTROL_PORT))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        await asyncio.gather(phone_server_async(), ecs_client_async(executor))
+
+
+def start_network():
+    if config.NET_MODE == "asyncio":
+        print("网络模式: asyncio 单事件循环")
+        threading.Thread(target=asyncio.run, args=(network_async(),), daemon=True).start()
+    else:
+        if config.UDP_CONTROL_PORT:
+            udp_control.bind(config.UDP_CONTROL_PORT).start()
+        threading.Thread(target=socket_worker, daemon=True).start()
+        threading.Thread(target=ecs_sender_worker, daemon=True).start()
+        threading.Thread(target=ecs_receiver_worker, daemon=True).start()
 
 
 # ===== 主程序 =====
 def main():
     global running, conn, server, motor
 
-    threading.Thread(target=socket_worker, daemon=True).start()
-    threading.Thread(target=ecs_sender_worker, daemon=True).start()
-    threading.Thread(target=ecs_receiver_worker, daemon=True).start()
+    tracer.install_signal()
+    start_network()
+    sampler.start()
+
+    # 控制循环按截止时间跑，干活时间不同也不会把频率拖低
+    schedule = PeriodicScheduler(1 / config.CONTROL_HZ)
+    link_lost = False
+    last_stats = time.time()
 
     try:
         while True:
+            schedule.wait()
             with lock:
                 a = angle
                 s = strength
                 current_mode = mode
                 conn_alive = conn is not None
                 ecs_alive = client_socket is not None
+                avoid = ult_flag
+                silence = time.time() - last_recv_time
+
+            if time.time() - last_stats > STATS_INTERVAL:
+                last_stats = time.time()
+                print(f"控制循环: {schedule.stats()} | 电机: {motor.stats()}")
 
             if current_mode == "auto" and not ecs_alive:
-                motor.stop()
-                time.sleep(1 / config.CONTROL_HZ)
+                # 重连后要重新张手才走
+                with lock:
+                    stop_cruise()
                 continue
 
-            if current_mode == "auto" and ult_flag == True:
-                dist = get_distance()
-                print(f"Distance: {dist:.2f} m")
-                if(dist<=0.2):
-                    turn_left_90(motor)
+            if current_mode == "auto" and avoid:
+                dist, ttc = sampler.estimate(config.DISTANCE_MAX_AGE)
+                with lock:
+                    # 取快照之后可能刚收到握拳，锁内再确认一次，免得把停下的车又转起来
+                    if mode == "auto" and ult_flag:
+                        avoider.step(dist, ttc=ttc)
+            elif avoider.active:
+                with lock:
+                    avoider.cancel()
+
+            if current_mode == "auto" and config.MOTOR_MAX_ACCEL > 0:
+                with lock:
+                    motor.update()  # 手势 / 避让给的目标速度按加速度限制逐拍逼近
 
             if current_mode == "manual":
+                # 看门狗：手机超过 TIMEOUT_STOP 没消息就停车，等它再发指令
+                if silence > config.TIMEOUT_STOP:
+                    if not link_lost:
+                        link_lost = True
+                        print(f"手机 {silence:.1f} 秒无消息，停车")
+                        with lock:
+                            stop_cruise()
+                    continue
+                link_lost = False
                 with lock:
                     left, right = joystick_to_speed(a, s, config.MAX_POWER)
                     motor.set_speed(left, right)
 
-            time.sleep(1 / config.CONTROL_HZ)
-
     except KeyboardInterrupt:
         running = False
         try: conn.close()
@@ -208,6 +555,12 @@ def main():
         try: server.close()
         except: pass
         motor.stop()
+        sampler.stop()
+        print(f"控制循环: {schedule.stats()} | 测距: {sampler.stats()} | 电机: {motor.stats()}")
+        if config.UDP_CONTROL_PORT:
+            print(f"UDP 摇杆: {udp_control.stats()}")
+        print(tracer.format_summary())
+        print(f"延迟数据已导出: {tracer.dump()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+# mjpeg.py
+# 一份 JPEG 多人看：生产者把最新一帧放进共享槽，每个 HTTP 客户端按自己的节奏取最新的
+# 慢的客户端只会跳帧，不会拖慢生产者和其他客户端；每个客户端可以单独限帧率
+# 同样的槽也用来推 SSE 文本事件（手势 / 延迟叠加信息走旁路，不画进像素）
+import threading
+import time
+
+BOUNDARY = b"frame"
+
+
+def multipart_part(jpeg):
+    return (b"--" + BOUNDARY + b"\r\nContent-Type: image/jpeg\r\nContent-Length: " +
+            str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n")
+
+
+def sse_event(data):
+    return b"data: " + data + b"\n\n"
+
+
+SSE_PING = b": ping\n\n"  # SSE 注释行，浏览器忽略
+
+
+class JpegBroadcaster:
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._jpeg = None
+        self._seq = 0
+        self._ts = 0.0
+        self.clients = 0
+        self.published = 0
+        self.sent = 0
+        self.skipped = 0   # 客户端没来得及取就被覆盖的帧（按客户端累加）
+
+    def publish(self, jpeg, ts=None):
+        """放入最新一帧（bytes，发布后不要再改；SSE 用时放 utf-8 文本）"""
+        with self._cond:
+            self._jpeg = jpeg
+            self._seq += 1
+            self._ts = time.time() if ts is None else ts
+            self.published += 1
+            self._cond.notify_all()
+
+    def latest(self, after_seq=0, timeout=None):
+        """等到比 after_seq 新的帧，返回 (seq, jpeg, ts)；超时返回 None"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after_seq, timeout):
+                return None
+            return self._seq, self._jpeg, self._ts
+
+    def stream(self, max_fps=None, timeout=5.0, fmt=multipart_part, idle=None):
+        """
+        生成器，交给 Flask Response；默认 multipart/x-mixed-replace，fmt=sse_event 时为 text/event-stream。
+        idle 不为空时先发一次（让响应头立即发出），之后每次等待超时再发一次当心跳。
+        客户端断开时 GeneratorExit 会走 finally
+        """
+        interval = 1 / max_fps if max_fps else 0
+        with self._cond:
+            self.clients += 1
+        seq = 0
+        next_time = 0.0
+        try:
+            if idle is not None:
+                yield idle
+            while True:
+                if interval:
+                    delay = next_time - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_time = max(next_time + interval, time.monotonic())
+                item = self.latest(seq, timeout)
+                if item is None:
+                    if idle is not None:
+                        yield idle
+                    continue  # 生产者暂时没出帧，继续等
+                new_seq, jpeg, ts = item
+                if seq:
+                    self.skipped += new_seq - seq - 1
+                seq = new_seq
+                self.sent += 1
+                yield fmt(jpeg)
+        finally:
+            with self._cond:
+                self.clients -= 1
+
+    def stats(self):
+        return {
+            "clients": self.clients,
+            "published": self.published,
+            "sent": self.sent,
+            "skipped": self.skipped,
+        }
@@ -1,72 +1,87 @@
-# # motor.py
-from gpiozero import Motor, PWMOutputDevice
-
-
-
-
-# # 纯 Windows 模拟版 - 完全移除 gpiozero 依赖，适配你的 main.py
-# class PWMOutputDevice:
-#     """模拟 gpiozero.PWMOutputDevice 类，仅用于 Windows 测试"""
-#     def __init__(self, pin):
-#         self.pin = pin
-#         self._value = 0.0
-
-#     @property
-#     def value(self):
-#         return self._value
-
-#     @value.setter
-#     def value(self, val):
-#         self._value = max(0.0, min(1.0, val))
-        
-
-# class Motor:
-#     """模拟 gpiozero.Motor 类，解决命名冲突问题"""
-#     def __init__(self, forward, backward):
-#         # 重命名属性，避免和 forward()/backward() 方法冲突
-#         self.forward_pin = forward
-#         self.backward_pin = backward
-        
-
-#     def forward(self):
-#         pass
-
-#     def backward(self):
-#         pass
-
-#     def stop(self):
-#         pass
-
+# motor.py
+import time
 
+from hardware import Motor, PWMOutputDevice
+from rate_logger import RateLimitedLogger
 
 
 class CarMotor:
-    def __init__(self, lf, lb, lpwm, rf, rb, rpwm):
+    """
+    set_speed 只在值真的变了时才写 GPIO（方向和 PWM 分开比较），没变的计入 suppressed；
+    max_accel > 0 时每个轮子每秒最多变化这么多功率，没到目标的部分由 update() 每拍继续推进；
+    stop() 不受限，立即停。日志走限频的后台队列，不在控制线程里 print。
+    """
+
+    def __init__(self, lf, lb, lpwm, rf, rb, rpwm, max_accel=0, logger=None):
         self.left_motor = Motor(forward=lf, backward=lb)
         self.left_pwm = PWMOutputDevice(lpwm)
 
         self.right_motor = Motor(forward=rf, backward=rb)
         self.right_pwm = PWMOutputDevice(rpwm)
-
-    def _set_one(self, motor, pwm, speed):
-        speed = max(-1.0, min(1.0, speed))
-        if speed > 0:
-            motor.forward()
-            pwm.value = speed
-        elif speed < 0:
-            motor.backward()
-            pwm.value = -speed
+        self.speed = (0.0, 0.0)  # 最近一次指令 (左, 右)，测距线程用来估算接近速度
+        self.output = (0.0, 0.0)  # 限速后实际输出的 (左, 右)
+        self.max_accel = max_accel
+        self.logger = logger or RateLimitedLogger()
+        self.writes = 0
+        self.suppressed = 0
+        self._dir = [None, None]   # 每个轮子当前方向 1 / -1 / 0，None 表示还没写过
+        self._pwm = [None, None]
+        self._last_update = None
+
+    def _set_one(self, i, motor, pwm, speed):
+        speed = round(max(-1.0, min(1.0, speed)), 3)
+        direction = (speed > 0) - (speed < 0)
+        wrote = False
+        if direction != self._dir[i]:
+            if direction > 0:
+                motor.forward()
+            elif direction < 0:
+                motor.backward()
+            else:
+                motor.stop()
+            self._dir[i] = direction
+            wrote = True
+        if abs(speed) != self._pwm[i]:
+            pwm.value = abs(speed)
+            self._pwm[i] = abs(speed)
+            wrote = True
+        if wrote:
+            self.writes += 1
         else:
-            motor.stop()
-            pwm.value = 0
+            self.suppressed += 1
+        return wrote
 
     def set_speed(self, left, right):
-        self._set_one(self.left_motor, self.left_pwm, left)
-        self._set_one(self.right_motor, self.right_pwm, -right)
-        print(f"Set speed: left={left:.2f}, right={right:.2f}")
+        self.speed = (left, right)
+        self.update()
+
+    def update(self, now=None):
+        """按 max_accel 向目标速度推进一步并写出，控制循环每拍调用"""
+        if now is None:
+            now = time.monotonic()
+        left, right = self.speed
+        if self.max_accel > 0:
+            # 间隔最多按 0.1 s 算，长时间没调用后也不会一步跳到目标
+            elapsed = 0.1 if self._last_update is None else min(now - self._last_update, 0.1)
+            step = self.max_accel * elapsed
+            out_l, out_r = self.output
+            left = out_l + max(-step, min(step, left - out_l))
+            right = out_r + max(-step, min(step, right - out_r))
+        self._last_update = now
+        self.output = (left, right)
+        wrote = self._set_one(0, self.left_motor, self.left_pwm, left)
+        wrote = self._set_one(1, self.right_motor, self.right_pwm, -right) or wrote
+        if wrote:
+            self.logger.log("speed", "Set speed: left={:.2f}, right={:.2f}", left, right)
 
     def stop(self):
-        self.left_motor.stop()
-        self.right_motor.stop()
-        self.left_pwm.value = 0
-        self.right_pwm.value = 0
+        self.speed = (0.0, 0.0)
+        self.output = (0.0, 0.0)
+        self._last_update = time.monotonic()
+        wrote = self._set_one(0, self.left_motor, self.left_pwm, 0)
+        wrote = self._set_one(1, self.right_motor, self.right_pwm, 0) or wrote
+        if wrote:
+            self.logger.log("stop", "Stop")
+
+    def stats(self):
+        return {"writes": self.writes, "suppressed": self.suppressed, "log": self.logger.stats()}
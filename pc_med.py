@@ -4,12 +4,15 @@ import os
 import urllib.request
 import numpy as np
 import mediapipe as mp
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
+
+from gesture import classify_landmarks
+from hand_detector import HandDetector
+from roi_tracker import RoiTracker
+from decode import FrameDecoder
 
 # ================== CONFIG ==================
 STREAM_URL = "http://192.168.137.243:5000/video"
-FRAME_WIDTH = 640
+FRAME_WIDTH = 640   # 推理分辨率上限：更大的画面缩小，小车的 320x240 原样用，不再放大
 FRAME_HEIGHT = 480
 HEARTBEAT_TIMEOUT = 5
 RECONNECT_INTERVAL = 2
@@ -20,35 +23,6 @@ MODEL_URL = (
     "hand_landmarker/hand_landmarker/float16/1/hand_landmarker.task"
 )
 # ================== CONFIG ==================
-def detect_gesture(hand):
-    wrist = hand[0]
-    mcp = hand[9]  # 中指 MCP
-
-    def dist(a, b):
-        return ((a.x - b.x)**2 + (a.y - b.y)**2) ** 0.5
-
-    palm = dist(wrist, mcp)
-
-    tip_ids = [8, 12, 16, 20]  # 食指~小指
-    straight = 0
-    ratios = []
-
-    for tid in tip_ids:
-        r = dist(hand[tid], wrist) / palm
-        ratios.append(r)
-        if r > 1.55:
-            straight += 1
-
-    avg_ratio = sum(ratios) / len(ratios)
-
-    if straight == 0 and avg_ratio < 1.25:
-        return "FIST"
-    elif straight >= 3 and avg_ratio > 1.55:
-        return "OPEN"
-    else:
-        return "UNKNOWN"
-
-
 # def detect_gesture(hand):
 #     wrist = hand[0]
 #     mid_mcp = hand[9]
@@ -82,14 +56,21 @@ def detect_gesture(hand):
 if not os.path.exists(MODEL_PATH):
     urllib.request.urlretrieve(MODEL_URL, MODEL_PATH)
 
-options = vision.HandLandmarkerOptions(
-    base_options=python.BaseOptions(model_asset_path=MODEL_PATH),
-    num_hands=2,
-    min_hand_detection_confidence=0.5,
-    min_hand_presence_confidence=0.5,
-    min_tracking_confidence=0.5,
-)
-detector = vision.HandLandmarker.create_from_options(options)
+# image / video / live；流式模式跟踪上一帧的手，跳过手掌检测
+RUNNING_MODE = os.environ.get("MP_RUNNING_MODE", "video")
+latest_result = None  # live 模式下最近一次回调的结果
+
+def on_result(result, context):
+    global latest_result
+    latest_result = result
+
+detector = HandDetector(MODEL_PATH, RUNNING_MODE, num_hands=2, on_result=on_result)
+
+# 手框 ROI 裁剪：只在 image 模式下启用（流式模式由 MediaPipe 自己跟踪）
+ROI_TRACKING = RUNNING_MODE == "image" and os.environ.get("ROI_TRACKING", "1") == "1"
+roi_tracker = RoiTracker() if ROI_TRACKING else None
+decoder = FrameDecoder(FRAME_WIDTH, FRAME_HEIGHT)  # BGR->RGB 写进复用缓冲区
+STATS_INTERVAL = 10  # 秒
 
 # ================== STREAM ==================
 class NetworkStream:
@@ -118,7 +99,7 @@ class NetworkStream:
         if ret:
             self.last_ok = time.time()
             self.connected = True
-            return True, cv2.resize(frame, (FRAME_WIDTH, FRAME_HEIGHT))
+            return True, frame
 
         if time.time() - self.last_ok > HEARTBEAT_TIMEOUT:
             self.connected = False
@@ -139,6 +120,7 @@ cv2.putText(blank, "NETWORK DISCONNECTED", (80, FRAME_HEIGHT // 2),
 
 stream = NetworkStream(STREAM_URL)
 prev = time.time()
+last_stats = prev
 
 # ================== LOOP ==================
 try:
@@ -149,21 +131,27 @@ try:
         if not ok:
             frame = blank.copy()
         else:
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            image, roi = roi_tracker.crop(frame) if roi_tracker else (frame, None)
+            rgb = decoder.convert(image)
             try:
-                result = detector.detect(
-                    mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
-                )
-                if result.hand_landmarks:
+                start = time.perf_counter()
+                result = detector.detect(rgb)
+                if result is None:
+                    result = latest_result  # live 模式: 画最近一次的异步结果
+                elif roi_tracker:
+                    # 关键点映射回整幅图坐标，后面的绘制不用改
+                    roi_tracker.update(result, roi, (time.perf_counter() - start) * 1000)
+                if result is not None and result.hand_landmarks:
                     h, w, _ = frame.shape
-                    for hand in result.hand_landmarks:
+                    # 所有手一次性分类
+                    gestures = classify_landmarks(result.hand_landmarks)
+                    for hand, gesture in zip(result.hand_landmarks, gestures):
                         pts = []
                         for lm in hand:
                             x, y = int(lm.x * w), int(lm.y * h)
                             pts.append((x, y))
                             cv2.circle(frame, (x, y), 5, (0, 255, 0), -1)
 
-                        gesture = detect_gesture(hand)
                         print("Gesture:", gesture)
 
                         cv2.putText(frame, gesture, (pts[0][0], pts[0][1] - 20),
@@ -175,6 +163,11 @@ try:
                 pass
 
         now = time.time()
+        if roi_tracker and now - last_stats > STATS_INTERVAL:
+            last_stats = now
+            r = roi_tracker.stats()
+            print(f"推理耗时: ROI {r['roi_avg_ms']:.1f} ms ({r['roi_count']} 次) | "
+                  f"全图 {r['full_avg_ms']:.1f} ms ({r['full_count']} 次) | 节省 {r['saved_percent']:.0f}%")
         fps = int(1 / (now - prev)) if now != prev else 0
         prev = now
 
@@ -0,0 +1,134 @@
+# protocol.py
+# 小车 <-> ECS 线路格式
+import struct
+from enum import IntEnum
+
+# ===== 握手 =====
+# 小车连上 ECS 后先发: magic(4s) + 版本(B) + car_id 长度(B) + car_id(utf-8)
+# 不发握手的旧小车按连接地址区分，视为版本 0
+HELLO_MAGIC = b"CARH"
+HELLO_HEADER = struct.Struct("4sBB")
+# v2: 帧头带 frame_id，手势回执回显 frame_id
+# v3: ECS -> 小车改为二进制消息（见下方 “指令消息”）
+PROTOCOL_VERSION = 3
+
+
+def encode_hello(car_id, version=PROTOCOL_VERSION):
+    raw = car_id.encode("utf-8")[:255]
+    return HELLO_HEADER.pack(HELLO_MAGIC, version, len(raw)) + raw
+
+
+def parse_hello(rx):
+    """
+    从 FrameReceiver 里解析握手。
+    数据不够返回 None；不是握手返回 (None, 0) 且不消费数据；否则返回 (car_id, version)
+    """
+    head = rx.peek(HELLO_HEADER.size)
+    if head is None:
+        return None
+    magic, version, n = HELLO_HEADER.unpack(head)
+    if magic != HELLO_MAGIC:
+        return None, 0
+    body = rx.peek(HELLO_HEADER.size + n)
+    if body is None:
+        return None
+    car_id = bytes(body[HELLO_HEADER.size:]).decode("utf-8", "replace")
+    rx.skip(HELLO_HEADER.size + n)
+    return car_id, version
+
+
+# ===== 视频帧 =====
+# v0/v1: 采集时间戳(double) + 长度(uint32) + JPEG
+# v2:    采集时间戳(double) + frame_id(uint32) + 长度(uint32) + JPEG
+FRAME_HEADER_V1 = struct.Struct("dI")
+FRAME_HEADER_V2 = struct.Struct("dII")
+
+
+def frame_header(version):
+    return FRAME_HEADER_V2 if version >= 2 else FRAME_HEADER_V1
+
+
+# ===== 手势回传 =====
+# v0/v1: 长度(uint32) + 手势字符串
+# v2:    长度(uint32) + frame_id(uint32) + 手势字符串
+GESTURE_HEADER = struct.Struct("I")
+GESTURE_HEADER_V2 = struct.Struct("II")
+
+
+def encode_gesture(gesture, frame_id=None):
+    raw = gesture.encode("utf-8")
+    if frame_id is None:
+        return GESTURE_HEADER.pack(len(raw)) + raw
+    return GESTURE_HEADER_V2.pack(len(raw), frame_id) + raw
+
+
+# ===== 指令消息（v3，ECS -> 小车） =====
+# magic(2s) + 消息版本(B) + 类型(B) + 序号(uint32) + frame_id(uint32) + 负载长度(uint16) + 负载
+# 多条消息可以直接拼在一起一次发送
+MSG_MAGIC = b"GC"
+MSG_VERSION = 1
+MSG_HEADER = struct.Struct("<2sBBIIH")
+MAX_PAYLOAD = 1024
+
+
+class MsgType(IntEnum):
+    GESTURE = 1   # 负载 1 字节 Gesture
+    ACK = 2       # 无负载，表示 frame_id 这一帧已处理完
+
+
+class Gesture(IntEnum):
+    NO_HAND = 0
+    FIST = 1
+    OPEN = 2
+    UNKNOWN = 3
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def encode_message(msg_type, seq, frame_id=0, payload=b""):
+    return MSG_HEADER.pack(MSG_MAGIC, MSG_VERSION, msg_type, seq & 0xFFFFFFFF,
+                           frame_id, len(payload)) + payload
+
+
+def encode_batch(messages):
+    """[(类型, 序号, frame_id, 负载), ...] -> 一次 send 的字节串"""
+    return b"".join(encode_message(*m) for m in messages)
+
+
+def parse_message_header(header):
+    """校验消息头，返回 (类型, 序号, frame_id, 负载长度)；格式不对抛 ProtocolError"""
+    magic, version, msg_type, seq, frame_id, length = MSG_HEADER.unpack_from(header)
+    if magic != MSG_MAGIC or version != MSG_VERSION or length > MAX_PAYLOAD:
+        raise ProtocolError(f"bad message header: {bytes(header[:MSG_HEADER.size])!r}")
+    return msg_type, seq, frame_id, length
+
+
+class MessageReader:
+    """
+    精确长度读取：先读满消息头，再读满负载，读到一半超时下次接着读，不会错位。
+    缓冲区预分配，返回的负载是缓冲区上的 memoryview，只在下一次 read() 前有效。
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._buf = bytearray(MSG_HEADER.size + MAX_PAYLOAD)
+        self._view = memoryview(self._buf)
+        self._have = 0
+
+    def _fill(self, n):
+        while self._have < n:
+            got = self.sock.recv_into(self._view[self._have:n])
+            if got == 0:
+                raise ConnectionResetError
+            self._have += got
+
+    def read(self):
+        """返回 (类型, 序号, frame_id, 负载)；对端关闭抛 ConnectionResetError，格式不对抛 ProtocolError"""
+        self._fill(MSG_HEADER.size)
+        msg_type, seq, frame_id, length = parse_message_header(self._buf)
+        end = MSG_HEADER.size + length
+        self._fill(end)
+        self._have = 0
+        return msg_type, seq, frame_id, self._view[MSG_HEADER.size:end]
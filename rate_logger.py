@@ -0,0 +1,48 @@
+# rate_logger.py
+# 限频日志：调用方只往队列里丢一条（格式化也挪到后台线程），同一个 key 一段时间内只留一条
+# 控制线程里不再直接 print，终端/串口慢的时候不会拖住电机指令
+import queue
+import threading
+import time
+
+
+class RateLimitedLogger:
+    def __init__(self, interval=0.5, maxsize=256, out=print):
+        self.interval = interval
+        self.out = out
+        self.logged = 0
+        self.suppressed = 0   # 同 key 限频丢掉的
+        self.dropped = 0      # 队列满丢掉的
+        self._last = {}
+        self._queue = queue.Queue(maxsize)
+        self._thread = None
+
+    def log(self, key, fmt, *args):
+        """排队一条日志，被限频或队列满返回 False"""
+        now = time.monotonic()
+        last = self._last.get(key)
+        if last is not None and now - last < self.interval:
+            self.suppressed += 1
+            return False
+        self._last[key] = now
+        try:
+            self._queue.put_nowait((fmt, args))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self.logged += 1
+        return True
+
+    def _run(self):
+        while True:
+            fmt, args = self._queue.get()
+            try:
+                self.out(fmt.format(*args))
+            except Exception:
+                pass
+
+    def stats(self):
+        return {"logged": self.logged, "suppressed": self.suppressed, "dropped": self.dropped}
@@ -0,0 +1,302 @@
+# recording.py
+# 视频流录制 / 回放容器：只追加写，关闭时在末尾写帧索引；回放用 mmap，帧直接是映射内存上的 memoryview
+#
+# 文件格式（小端）:
+#   文件头   magic "CARREC1\0" + 版本(uint32)
+#   帧记录   时间戳(double) + frame_id(uint32) + 长度(uint32) + JPEG，重复 N 次
+#   索引     [偏移(uint64) + 时间戳(double)] * N
+#   尾部     索引偏移(uint64) + 帧数(uint32) + magic "CARIDX1\0"
+# 没正常关闭（断电、被 kill）的文件没有尾部，读取时顺序扫描帧记录重建索引。
+#
+# 用法:
+#   python recording.py info <文件>
+#   python recording.py replay <文件> [主机] [端口] [--speed=2] [--loop] [--car-id=ID]   当作小车回放给 ECS
+import collections
+import mmap
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+from protocol import encode_hello, FRAME_HEADER_V2
+
+FILE_MAGIC = b"CARREC1\0"
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct("<8sI")
+RECORD_HEADER = struct.Struct("<dII")
+INDEX_ENTRY = struct.Struct("<Qd")
+FOOTER = struct.Struct("<QI8s")
+INDEX_MAGIC = b"CARIDX1\0"
+
+
+class RecordingWriter:
+    """追加写帧；frame 可以是 memoryview（接收缓冲区），写进文件缓冲后即可复用"""
+
+    def __init__(self, path, buffering=1024 * 1024):
+        self.path = path
+        self._f = open(path, "wb", buffering=buffering)
+        self._f.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION))
+        self._offset = FILE_HEADER.size
+        self._index = []
+        self.bytes = 0
+
+    def write(self, ts, frame_id, frame):
+        self._index.append((self._offset, ts))
+        self._f.write(RECORD_HEADER.pack(ts, frame_id, len(frame)))
+        self._f.write(frame)
+        self._offset += RECORD_HEADER.size + len(frame)
+        self.bytes += len(frame)
+
+    def __len__(self):
+        return len(self._index)
+
+    def close(self):
+        if self._f.closed:
+            return
+        index_offset = self._offset
+        for entry in self._index:
+            self._f.write(INDEX_ENTRY.pack(*entry))
+        self._f.write(FOOTER.pack(index_offset, len(self._index), INDEX_MAGIC))
+        self._f.close()
+
+
+class RecorderThread:
+    """
+    后台线程写所有车的录制文件，接收循环只把 (车, 帧) 放进队列：
+    磁盘慢时队列满了就丢帧（计数），不会拖住接收；写盘出错（ENOSPC 等）只停这辆车的录制，打日志，不影响连接。
+    write(key, name, ts, frame_id, jpeg) 的 jpeg 要是 bytes（接收缓冲区会被复用）；close(key) 写索引收尾。
+    """
+
+    def __init__(self, directory, maxsize=256):
+        self.directory = directory
+        self.maxsize = maxsize
+        self._cond = threading.Condition(threading.Lock())
+        self._queue = collections.deque()   # (key, name, ts, frame_id, jpeg)；jpeg 为 None 表示关闭
+        self._frames = 0                     # 队列里的帧数，关闭消息不占名额
+        self._running = True
+        self._writers = {}                   # key -> RecordingWriter，只在写线程里用
+        self._failed = set()                 # 写出错、已停止录制的车
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, key, name, ts, frame_id, jpeg):
+        with self._cond:
+            if self._frames >= self.maxsize:
+                self.dropped += 1
+                return False
+            self._frames += 1
+            self._queue.append((key, name, ts, frame_id, jpeg))
+            self._cond.notify()
+        return True
+
+    def close(self, key):
+        with self._cond:
+            self._queue.append((key, None, 0, 0, None))
+            self._cond.notify()
+
+    def stop(self, timeout=5.0):
+        """写完队列里剩下的，关闭所有文件"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def _open(self, key, name):
+        os.makedirs(self.directory, exist_ok=True)
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+        path = os.path.join(self.directory, f"{safe}_{time.strftime('%Y%m%d_%H%M%S')}.carrec")
+        writer = self._writers[key] = RecordingWriter(path)
+        print(f"[{name}] 开始录制: {path}")
+        return writer
+
+    def _finish(self, key, name=None):
+        writer = self._writers.pop(key, None)
+        if writer is None:
+            return
+        try:
+            writer.close()
+            print(f"[{name or key}] 录制结束: {writer.path}（{len(writer)} 帧）")
+        except OSError as e:
+            self.errors += 1
+            print(f"[{name or key}] 录制收尾失败: {writer.path}: {e!r}")
+
+    def _run(self):
+        names = {}
+        while True:
+            with self._cond:
+                while not self._queue and self._running:
+                    self._cond.wait()
+                if not self._queue:
+                    break
+                key, name, ts, frame_id, jpeg = self._queue.popleft()
+                if jpeg is not None:
+                    self._frames -= 1
+            if jpeg is None:
+                self._finish(key, names.pop(key, None))
+                self._failed.discard(key)
+                continue
+            if key in self._failed:
+                continue
+            names[key] = name
+            try:
+                writer = self._writers.get(key) or self._open(key, name)
+                writer.write(ts, frame_id, jpeg)
+                self.written += 1
+            except OSError as e:
+                # 停掉这辆车的录制，已经写下的部分尽量补上索引
+                self.errors += 1
+                self._failed.add(key)
+                print(f"[{name}] 录制写入失败，停止录制: {e!r}")
+                self._finish(key, name)
+        for key in list(self._writers):
+            self._finish(key, names.get(key))
+
+    def stats(self):
+        with self._cond:
+            return {
+                "written": self.written,
+                "dropped": self.dropped,
+                "queued": self._frames,
+                "errors": self.errors,
+                "recording": len(self._writers),
+            }
+
+
+class RecordingReader:
+    """mmap 整个文件；frame(i) 返回 (ts, frame_id, memoryview)，不拷贝"""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+        magic, version = FILE_HEADER.unpack_from(self._mm)
+        if magic != FILE_MAGIC:
+            raise ValueError(f"{path} 不是录制文件")
+        self.version = version
+        self.complete = True
+        self.offsets = self._read_index()
+
+    def _read_index(self):
+        size = len(self._mm)
+        if size >= FILE_HEADER.size + FOOTER.size:
+            index_offset, count, magic = FOOTER.unpack_from(self._mm, size - FOOTER.size)
+            if magic == INDEX_MAGIC and index_offset + count * INDEX_ENTRY.size + FOOTER.size == size:
+                return [INDEX_ENTRY.unpack_from(self._mm, index_offset + i * INDEX_ENTRY.size)[0]
+                        for i in range(count)]
+        # 没有索引：顺序扫描，最后一帧写了一半就丢掉
+        self.complete = False
+        offsets = []
+        pos = FILE_HEADER.size
+        while pos + RECORD_HEADER.size <= size:
+            _, _, length = RECORD_HEADER.unpack_from(self._mm, pos)
+            end = pos + RECORD_HEADER.size + length
+            if end > size:
+                break
+            offsets.append(pos)
+            pos = end
+        return offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def frame(self, i):
+        pos = self.offsets[i]
+        ts, frame_id, length = RECORD_HEADER.unpack_from(self._mm, pos)
+        start = pos + RECORD_HEADER.size
+        return ts, frame_id, self._view[start:start + length]
+
+    def __iter__(self):
+        for i in range(len(self.offsets)):
+            yield self.frame(i)
+
+    def replay(self, speed=1.0):
+        """按原始时间间隔（除以 speed）逐帧产出；speed <= 0 不等待，尽快产出"""
+        start = time.monotonic()
+        first = None
+        for ts, frame_id, frame in self:
+            if first is None:
+                first = ts
+            if speed > 0:
+                delay = start + (ts - first) / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            yield ts, frame_id, frame
+
+    def duration(self):
+        if not self.offsets:
+            return 0.0
+        return self.frame(len(self) - 1)[0] - self.frame(0)[0]
+
+    def close(self):
+        self._view.release()
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # 调用方还拿着帧视图，等它们释放后随 GC 关闭
+        self._f.close()
+
+
+def replay_to_ecs(path, host, port, speed=1.0, loop=False, car_id="replay"):
+    """当作一辆小车连到 ECS 回放；帧头时间戳换成发送时刻，ECS 端的延迟统计仍然有意义"""
+    reader = RecordingReader(path)
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.sendall(encode_hello(car_id))
+
+    def drain():
+        # ECS 回的 ACK / 手势直接丢掉，避免接收缓冲满了把 ECS 堵住
+        try:
+            while sock.recv(4096):
+                pass
+        except OSError:
+            pass
+
+    threading.Thread(target=drain, daemon=True).start()
+    sent = 0
+    start = time.time()
+    try:
+        while True:
+            for ts, frame_id, frame in reader.replay(speed):
+                # header 和映射内存一起交给内核，JPEG 不经过 Python 拷贝
+                header = FRAME_HEADER_V2.pack(time.time(), sent, len(frame))
+                n = sock.sendmsg([header, frame])
+                if n < len(header) + len(frame):
+                    # 被信号打断等情况下只发出一部分，剩下的补发
+                    sock.sendall((header + bytes(frame))[n:])
+                sent += 1
+            if not loop:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+        reader.close()
+    elapsed = time.time() - start
+    print(f"回放 {sent} 帧，用时 {elapsed:.1f} s（{sent / elapsed if elapsed else 0:.1f} fps）")
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    opts = [a for a in sys.argv[1:] if a.startswith("--")]
+    if len(args) < 2 or args[0] not in ("info", "replay"):
+        print("用法: python recording.py info <文件>\n"
+              "      python recording.py replay <文件> [主机] [端口] [--speed=2] [--loop] [--car-id=ID]")
+        sys.exit(1)
+    if args[0] == "info":
+        r = RecordingReader(args[1])
+        sizes = [len(f) for _, _, f in r]
+        print(f"{args[1]}: {len(r)} 帧 | 时长 {r.duration():.1f} s | "
+              f"平均 {sum(sizes) / max(len(sizes), 1) / 1024:.1f} KB/帧 | 索引 {'完整' if r.complete else '缺失（已扫描重建）'}")
+        r.close()
+    else:
+        options = dict(o[2:].split("=", 1) if "=" in o else (o[2:], "1") for o in opts)
+        host = args[2] if len(args) > 2 else "127.0.0.1"
+        port = int(args[3]) if len(args) > 3 else 8088
+        replay_to_ecs(args[1], host, port, speed=float(options.get("speed", 1.0)),
+                      loop="loop" in options, car_id=options.get("car-id", "replay"))
@@ -0,0 +1,89 @@
+# roi_tracker.py
+# 根据上一次检测到的手，只对手周围的区域做推理
+import time
+
+import numpy as np
+
+
+class RoiTracker:
+    """
+    crop(frame) 给出本次推理用的图像（有上一帧手框时是带边距的正方形裁剪）；
+    update(result, roi, infer_ms) 把关键点映射回整幅图坐标并更新手框。
+    连续 max_misses 次没找到手，或距上次全图搜索超过 refresh_interval 秒，退回全图。
+    """
+
+    def __init__(self, pad=0.5, max_misses=2, refresh_interval=1.0, min_side=96):
+        self.pad = pad                        # 手框每边外扩比例
+        self.max_misses = max_misses
+        self.refresh_interval = refresh_interval
+        self.min_side = min_side              # 裁剪最小边长（像素）
+        self.box = None                       # 上一次手框，归一化 (x0, y0, x1, y1)
+        self.misses = 0
+        self.last_full = 0.0
+        self.roi_ms = 0.0
+        self.roi_count = 0
+        self.full_ms = 0.0
+        self.full_count = 0
+
+    def crop(self, frame, now=None):
+        """返回 (image, roi)；roi 为 None 表示整幅图"""
+        now = time.time() if now is None else now
+        if (self.box is None or self.misses >= self.max_misses
+                or now - self.last_full > self.refresh_interval):
+            self.last_full = now
+            return frame, None
+
+        h, w = frame.shape[:2]
+        x0, y0, x1, y1 = self.box
+        cx, cy = (x0 + x1) / 2 * w, (y0 + y1) / 2 * h
+        side = max((x1 - x0) * w, (y1 - y0) * h) * (1 + 2 * self.pad)
+        side = int(min(max(side, self.min_side), w, h))
+        left = int(min(max(cx - side / 2, 0), w - side))
+        top = int(min(max(cy - side / 2, 0), h - side))
+        roi = (left, top, side, side, w, h)
+        # MediaPipe 需要连续内存，小区域拷贝一次即可
+        return np.ascontiguousarray(frame[top:top + side, left:left + side]), roi
+
+    def update(self, result, roi, infer_ms=None):
+        if infer_ms is not None:
+            if roi is None:
+                self.full_ms += infer_ms
+                self.full_count += 1
+            else:
+                self.roi_ms += infer_ms
+                self.roi_count += 1
+
+        if not result.hand_landmarks:
+            self.misses += 1
+            if roi is None:
+                self.box = None
+            return result
+
+        if roi is not None:
+            left, top, cw, ch, w, h = roi
+            sx, sy = cw / w, ch / h
+            ox, oy = left / w, top / h
+            for hand in result.hand_landmarks:
+                for lm in hand:
+                    lm.x = ox + lm.x * sx
+                    lm.y = oy + lm.y * sy
+                    lm.z = lm.z * sx
+
+        # 多只手时取并集，保证下一次裁剪能覆盖所有手
+        xs = [lm.x for hand in result.hand_landmarks for lm in hand]
+        ys = [lm.y for hand in result.hand_landmarks for lm in hand]
+        self.box = (min(xs), min(ys), max(xs), max(ys))
+        self.misses = 0
+        return result
+
+    def stats(self):
+        roi_avg = self.roi_ms / self.roi_count if self.roi_count else 0.0
+        full_avg = self.full_ms / self.full_count if self.full_count else 0.0
+        saved = (1 - roi_avg / full_avg) * 100 if roi_avg and full_avg else 0.0
+        return {
+            "roi_count": self.roi_count,
+            "roi_avg_ms": roi_avg,
+            "full_count": self.full_count,
+            "full_avg_ms": full_avg,
+            "saved_percent": saved,
+        }
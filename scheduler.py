@@ -0,0 +1,60 @@
+# scheduler.py
+# 按截止时间排程的周期任务：睡到下一个截止点，而不是“干完活再睡固定时长”
+import time
+
+from latency_trace import LatencyHistogram
+
+
+class PeriodicScheduler:
+    """
+    wait() 睡到下一个截止时间。落后超过一个周期时直接对齐到当前时间，
+    不会为了“补课”连续快跑；overruns 记录错过截止时间的次数。
+    每次醒来记录实际周期相对 interval 的偏差（抖动直方图，ms）。
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.next_deadline = time.monotonic() + interval
+        self.overruns = 0
+        self.ticks = 0
+        self.jitter = LatencyHistogram()
+        self._last_tick = None
+
+    def delay(self):
+        """推进到下一个截止时间，返回需要睡眠的秒数（asyncio 里用 await asyncio.sleep(delay)）"""
+        now = time.monotonic()
+        delay = self.next_deadline - now
+        self.next_deadline += self.interval
+        if delay <= 0:
+            self.overruns += 1
+            # 落后不到一个周期就按原节拍继续，否则重新对齐
+            if self.next_deadline <= now:
+                self.next_deadline = now + self.interval
+            return 0.0
+        return delay
+
+    def mark(self, now=None):
+        """记录一次醒来；wait() 自动调用，asyncio 里 sleep 回来后手动调用"""
+        if now is None:
+            now = time.monotonic()
+        if self._last_tick is not None:
+            self.jitter.record(abs(now - self._last_tick - self.interval) * 1000)
+        self._last_tick = now
+        self.ticks += 1
+
+    def wait(self):
+        delay = self.delay()
+        if delay > 0:
+            time.sleep(delay)
+        self.mark()
+
+    def stats(self):
+        s = self.jitter.summary()
+        return {
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "hz": round(1 / self.interval, 1),
+            "jitter_p50": s["p50"],
+            "jitter_p99": s["p99"],
+            "jitter_max": s["max"],
+        }
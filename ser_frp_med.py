@@ -2,13 +2,14 @@ import cv2
 import time
 import os
 import urllib.request
-import mediapipe as mp
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
+
+from gesture import classify_landmarks
+from hand_detector import HandDetector
+from decode import FrameDecoder
 
 # ================== CONFIG ==================
 STREAM_URL = "http://47.105.118.110:8088/video"
-FRAME_WIDTH = 640
+FRAME_WIDTH = 640   # 推理分辨率上限，只缩不放
 FRAME_HEIGHT = 480
 
 MODEL_PATH = "hand_landmarker.task"
@@ -17,47 +18,22 @@ MODEL_URL = (
     "hand_landmarker/hand_landmarker/float16/1/hand_landmarker.task"
 )
 
-# ================== GESTURE ==================
-def detect_gesture(hand):
-    wrist = hand[0]
-    mcp = hand[9]  # 中指 MCP
-
-    def dist(a, b):
-        return ((a.x - b.x)**2 + (a.y - b.y)**2) ** 0.5
-
-    palm = dist(wrist, mcp)
-
-    tip_ids = [8, 12, 16, 20]  # 食指~小指
-    straight = 0
-    ratios = []
-
-    for tid in tip_ids:
-        r = dist(hand[tid], wrist) / palm
-        ratios.append(r)
-        if r > 1.55:
-            straight += 1
-
-    avg_ratio = sum(ratios) / len(ratios)
-
-    if straight == 0 and avg_ratio < 1.25:
-        return "FIST"
-    elif straight >= 3 and avg_ratio > 1.55:
-        return "OPEN"
-    else:
-        return "UNKNOWN"
-
 # ================== MODEL ==================
 if not os.path.exists(MODEL_PATH):
     urllib.request.urlretrieve(MODEL_URL, MODEL_PATH)
 
-options = vision.HandLandmarkerOptions(
-    base_options=python.BaseOptions(model_asset_path=MODEL_PATH),
-    num_hands=1,  # 服务器端建议 1
-    min_hand_detection_confidence=0.5,
-    min_hand_presence_confidence=0.5,
-    min_tracking_confidence=0.5,
-)
-detector = vision.HandLandmarker.create_from_options(options)
+# image / video / live；流式模式跟踪上一帧的手，跳过手掌检测
+RUNNING_MODE = os.environ.get("MP_RUNNING_MODE", "video")
+
+def on_result(result, context=None):
+    if result.hand_landmarks:
+        for gesture in classify_landmarks(result.hand_landmarks):
+            print(gesture)
+
+detector = HandDetector(MODEL_PATH, RUNNING_MODE, num_hands=1,  # 服务器端建议 1
+                        on_result=on_result)
+
+decoder = FrameDecoder(FRAME_WIDTH, FRAME_HEIGHT)
 
 # ================== STREAM ==================
 cap = cv2.VideoCapture(STREAM_URL)
@@ -71,17 +47,12 @@ try:
             time.sleep(0.01)
             continue
 
-        frame = cv2.resize(frame, (FRAME_WIDTH, FRAME_HEIGHT))
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        result = detector.detect(
-            mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
-        )
+        rgb = decoder.convert(frame)
 
-        if result.hand_landmarks:
-            for hand in result.hand_landmarks:
-                gesture = detect_gesture(hand)
-                print(gesture)
+        # live 模式立即返回 None，结果在 on_result 回调里打印
+        result = detector.detect(rgb)
+        if result is not None:
+            on_result(result)
 
 except KeyboardInterrupt:
     pass
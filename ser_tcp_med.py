@@ -1,184 +1,374 @@
+import json
+import os
 import socket
-import struct
 import threading
 import time
-import cv2
-import numpy as np
-import mediapipe as mp
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
 
-from flask import Flask, Response
-gesture_text = ""  # 用于网页叠加手势文字
-gesture = "NO_HAND"
-last_sent_gesture = "NO_HAND"
+from flask import Flask, Response, abort, jsonify, request
+
+from ecs_session import SessionRegistry, IngestLoop, encode_reply
+from gesture import GestureDebouncer
+from hand_detector import HandDetector
+from roi_tracker import RoiTracker
+from change_gate import ChangeGate
+from decode import FrameDecoder
+from inference_pool import InferencePool
+from latency_trace import LatencyTracer, ECS_STAGES
+from recording import RecorderThread
+from mjpeg import JpegBroadcaster, BOUNDARY, sse_event, SSE_PING
 
 HOST = "0.0.0.0"
 PORT = 8088
 
 # ================== Mediapipe 初始化 ==================
 MODEL_PATH = "hand_landmarker.task"
-options = vision.HandLandmarkerOptions(
-    base_options=python.BaseOptions(model_asset_path=MODEL_PATH),
-    num_hands=1,
-    min_hand_detection_confidence=0.5,
-    min_hand_presence_confidence=0.5,
-    min_tracking_confidence=0.5,
-)
-detector = vision.HandLandmarker.create_from_options(options)
+# image: 每帧完整检测；video/live: 用小车帧头时间戳做流式跟踪，每辆车一个检测器
+# 默认 video：MediaPipe 自己跟踪手，代价是下面的 ROI 裁剪（只适用于 image）随之关闭，要用它设 MP_RUNNING_MODE=image
+RUNNING_MODE = os.environ.get("MP_RUNNING_MODE", "video")
+# >0 时推理放到这么多个子进程里（inference_pool.py），0 在本进程的推理线程里做
+INFER_WORKERS = int(os.environ.get("INFER_WORKERS", 0))
+
+def make_detector(on_result=None):
+    # 进程池的子进程传自己的回调进来；本进程 live 模式直接回 handle_result
+    if RUNNING_MODE != "live":
+        on_result = None
+    elif on_result is None:
+        on_result = handle_result
+    return HandDetector(MODEL_PATH, RUNNING_MODE, num_hands=1, on_result=on_result)
+
+shared_detector = make_detector() if RUNNING_MODE == "image" and not INFER_WORKERS else None
+detectors = {}  # session -> HandDetector，跟踪状态和时间戳按车隔离
+
+def get_detector(session):
+    if shared_detector is not None:
+        return shared_detector
+    detector = detectors.get(session)
+    if detector is None:
+        detector = detectors[session] = make_detector()
+    return detector
+
+# 解码：小车发的是 320x240，比这个大的帧用缩小解码降到推理分辨率（只缩不放）
+INFER_MAX_WIDTH = int(os.environ.get("INFER_MAX_WIDTH", 320))
+INFER_MAX_HEIGHT = int(os.environ.get("INFER_MAX_HEIGHT", 240))
+decoders = {}  # session -> FrameDecoder，只在推理线程里用
+
+def get_decoder(session):
+    decoder = decoders.get(session)
+    if decoder is None:
+        decoder = decoders[session] = FrameDecoder(INFER_MAX_WIDTH, INFER_MAX_HEIGHT)
+    return decoder
+
+# 手框 ROI 裁剪：只在 image 模式下启用。video/live 模式由 MediaPipe 自己跟踪，裁剪会打乱它的坐标和跟踪状态；
+# 默认的 video 模式下这里是关的，两者二选一：image + ROI 每帧推理更省但手丢了要回全图，video 靠跟踪跳过手掌检测
+ROI_TRACKING = RUNNING_MODE == "image" and os.environ.get("ROI_TRACKING", "1") == "1"
+if os.environ.get("ROI_TRACKING") == "1" and not ROI_TRACKING:
+    print(f"ROI_TRACKING 只在 image 模式下生效，当前 {RUNNING_MODE} 模式，已关闭")
+roi_trackers = {}  # session -> RoiTracker
+
+def get_roi_tracker(session):
+    if not ROI_TRACKING:
+        return None
+    tracker = roi_trackers.get(session)
+    if tracker is None:
+        tracker = roi_trackers[session] = RoiTracker()
+    return tracker
+
+# 录制：设置 RECORD_DIR 后把每辆车收到的原始帧流写进录制文件（recording.py 回放）
+# 写盘在 RecorderThread 里做，接收循环只入队；磁盘慢时丢帧，写盘出错只停这辆车的录制
+RECORD_DIR = os.environ.get("RECORD_DIR")
+recorder = RecorderThread(RECORD_DIR) if RECORD_DIR else None
+
+def close_recorder(session):
+    # 连接关闭时由接收循环调用，写线程收到后写入帧索引
+    if recorder is not None:
+        recorder.close(session)
+
+# 变化门：画面跟上次推理那帧几乎一样时复用上次结果；live 模式结果异步回来，配不上缩略图，不启用
+CHANGE_GATE = RUNNING_MODE != "live" and os.environ.get("CHANGE_GATE", "1") == "1"
+GATE_PIXEL_THRESHOLD = int(os.environ.get("GATE_PIXEL_THRESHOLD", 8))    # 灰度差（0~255）
+GATE_CHANGED_RATIO = float(os.environ.get("GATE_CHANGED_RATIO", 0.005))  # 变化像素占比
+GATE_MAX_AGE = float(os.environ.get("GATE_MAX_AGE", 0.5))                # 秒，结果最多复用多久
+change_gates = {}  # session -> ChangeGate
+
+def get_change_gate(session):
+    if not CHANGE_GATE:
+        return None
+    gate = change_gates.get(session)
+    if gate is None:
+        gate = change_gates[session] = ChangeGate(GATE_PIXEL_THRESHOLD, GATE_CHANGED_RATIO, GATE_MAX_AGE)
+    return gate
+
+# 手势滤波：最近 GESTURE_WINDOW 帧里至少 GESTURE_CONFIRM 帧一致才确认，单帧闪烁不会发给小车
+GESTURE_CONFIRM = int(os.environ.get("GESTURE_CONFIRM", 3))
+GESTURE_WINDOW = int(os.environ.get("GESTURE_WINDOW", 5))
+if not 1 <= GESTURE_CONFIRM <= GESTURE_WINDOW:
+    raise ValueError(f"GESTURE_CONFIRM ({GESTURE_CONFIRM}) 必须在 1..GESTURE_WINDOW ({GESTURE_WINDOW}) 之间")
+debouncers = {}  # session -> GestureDebouncer；进程池的收集线程也会插入，增删遍历都要持锁
+debouncers_lock = threading.Lock()
+
+def get_debouncer(session):
+    with debouncers_lock:
+        debouncer = debouncers.get(session)
+        if debouncer is None:
+            debouncer = debouncers[session] = GestureDebouncer(GESTURE_CONFIRM, GESTURE_WINDOW)
+    return debouncer
+
+def prune_detectors():
+    for session in [s for s in detectors if s.closed]:
+        detectors.pop(session).close()
+    for session in [s for s in roi_trackers if s.closed]:
+        del roi_trackers[session]
+    for session in [s for s in change_gates if s.closed]:
+        del change_gates[session]
+    for session in [s for s in decoders if s.closed]:
+        del decoders[session]
+    with debouncers_lock:
+        for session in [s for s in debouncers if s.closed]:
+            del debouncers[session]
+    if pool:
+        for session in [s for s in pool.keys() if s.closed]:
+            pool.release(session)
+    # 转发槽按 car_id 留着方便重连续看；车不在线又没人看的删掉，没握手的车按 ip:port 命名，每次重连都是新的
+    online = {s.car_id for s in sessions.sessions()}
+    with relays_lock:
+        for car_id in [c for c, r in relays.items()
+                       if c not in online and not r.video.clients and not r.events.clients]:
+            del relays[car_id]
+
+# ================== 推理进程池 ==================
+# fork 出来的子进程会继承当时的线程和文件描述符，所以在绑定端口、起线程之前创建；
+# 回调里用到的函数和 sessions 在后面定义，调用时才取
+pool = None
+if INFER_WORKERS:
+    pool = InferencePool(INFER_WORKERS, make_detector,
+                         on_result=lambda result, job: finish_inference(result, *job),
+                         on_free=lambda session: sessions.requeue(session),
+                         shared=RUNNING_MODE == "image",
+                         max_shape=(INFER_MAX_HEIGHT, INFER_MAX_WIDTH, 3))
+    print(f"推理进程池: {INFER_WORKERS} 个进程 ({RUNNING_MODE} 模式)")
 
 # ================== TCP 服务 ==================
 server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 server_socket.bind((HOST, PORT))
-server_socket.listen(5)
+server_socket.listen(64)
 print(f"ECS服务启动，监听端口 {PORT}")
 
-# 最新帧共享
-latest_frame = None
-latest_ts = 0
-frame_lock = threading.Lock()
-
-def handle_client(conn, addr):
-    global latest_frame, latest_ts, gesture, last_sent_gesture
-    print(f"小车已连接: {addr}")
-    payload_size = struct.calcsize("dI")  # timestamp(double) + length(uint32)
-    data = b""
-    try:
-        while True:
-            # 接收头部
-            while len(data) < payload_size:
-                packet = conn.recv(4096)
-                if not packet:
-                    raise ConnectionResetError
-                data += packet
-            header = data[:payload_size]
-            data = data[payload_size:]
-            ts, length = struct.unpack("dI", header)
-
-            # 接收帧数据
-            while len(data) < length:
-                packet = conn.recv(4096)
-                if not packet:
-                    raise ConnectionResetError
-                data += packet
-            frame_bytes = data[:length]
-            data = data[length:]
-
-            # 解码 JPEG
-            frame = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_COLOR)
-            with frame_lock:
-                latest_frame = frame
-                latest_ts = ts
-
-                # if(gesture != last_sent_gesture):
-                #     last_sent_gesture = gesture
-                #     gesture_bytes = gesture.encode("utf-8")
-                #     gesture_header = struct.pack("I", len(gesture_bytes))
-                #     conn.sendall(gesture_header + gesture_bytes)
-                #     print(f"发送手势: {gesture}")
-                
-
-    except (ConnectionResetError, BrokenPipeError):
-        print("小车断开连接")
-        conn.close()
+# 多车会话：每辆车独立的帧槽/手势状态/回传通道
+sessions = SessionRegistry()
+STATS_INTERVAL = 10  # 秒，打印帧计数
+
+# 分阶段延迟直方图，kill -USR1 <pid> 导出 JSON
+tracer = LatencyTracer("ecs", ECS_STAGES)
+
+def on_frame(session, ts, frame_id, frame_bytes):
+    # 在接收循环线程内调用；frame_bytes 是接收缓冲区上的 memoryview
+    tracer.record("recv", time.time() - ts)  # 依赖小车与 ECS 时钟同步
+    # 接收缓冲区会被复用，拷一份 JPEG（比解码后的图小一个数量级）；解码留给推理线程，被覆盖丢弃的帧不用解
+    jpeg = bytes(frame_bytes)
+    if recorder is not None:
+        recorder.write(session, session.car_id, ts, frame_id, jpeg)
+    relay = get_relay(session.car_id)
+    if relay.video.clients:
+        # 原样转发小车的 JPEG，不解码不重编码
+        relay.video.publish(jpeg, ts)
+    sessions.publish(session, (jpeg, frame_id), ts)
+
+def print_stats():
+    for session in sessions.sessions():
+        s = session.slot.stats()
+        print(f"[{session.car_id}] 帧统计: 发布 {s['published']} | 处理 {s['consumed']} | 丢弃 {s['dropped']}")
+        if session.dropped:
+            print(f"[{session.car_id}] 回执未读取，丢弃 ACK {session.dropped} 条")
+        tracker = roi_trackers.get(session)
+        if tracker is not None:
+            r = tracker.stats()
+            print(f"[{session.car_id}] 推理耗时: ROI {r['roi_avg_ms']:.1f} ms ({r['roi_count']} 次) | "
+                  f"全图 {r['full_avg_ms']:.1f} ms ({r['full_count']} 次) | 节省 {r['saved_percent']:.0f}%")
+        gate = change_gates.get(session)
+        if gate is not None:
+            g = gate.stats()
+            print(f"[{session.car_id}] 变化门: 跳过推理 {g['skipped']}/{g['checked']} ({g['skip_ratio'] * 100:.0f}%)")
+        with debouncers_lock:
+            debouncer = debouncers.get(session)
+        if debouncer is not None:
+            d = debouncer.stats()
+            print(f"[{session.car_id}] 手势滤波: 单帧切换 {d['raw_changes']} 次 -> 确认切换 {d['changes']} 次")
+    if recorder is not None:
+        r = recorder.stats()
+        print(f"录制: 写入 {r['written']} | 丢弃 {r['dropped']} | 排队 {r['queued']} | 出错 {r['errors']}")
+    if pool:
+        p = pool.stats()
+        print(f"推理进程池: 存活 {p['alive']}/{p['workers']} | 分车 {p['load']} | 推理中 {p['in_flight']} | "
+              f"提交 {p['submitted']} | 完成 {p['completed']} | 出错 {p['errors']} | 重启 {p['restarts']}")
+    print(tracer.format_summary())
 
 def process_frames():
-    global latest_frame, latest_ts, gesture, last_sent_gesture
+    last_stats = time.time()
     while True:
-        with frame_lock:
-            if latest_frame is None:
+        # 睡眠等待任意一辆车的新帧
+        session = sessions.next_ready(timeout=1.0)
+        if time.time() - last_stats > STATS_INTERVAL:
+            last_stats = time.time()
+            print_stats()
+            prune_detectors()
+        if session is None:
+            continue
+        if pool and pool.busy(session):
+            continue  # 这辆车上一帧还在子进程里，结果回来时会重新排队
+        job, ts = session.slot.take(timeout=0)
+        if job is None:
+            continue
+        jpeg, frame_id = job
+        # 直接解码到推理分辨率的 RGB（解码器内部复用的缓冲区，下一帧前用完）
+        start = time.perf_counter()
+        frame = get_decoder(session).decode(jpeg)
+        decoded = time.perf_counter()
+        tracer.record("decode", decoded - start)
+        if frame is None:
+            continue
+        context = (session, ts, frame_id, decoded)
+
+        # 画面没变就沿用上次结果，仍然走 handle_result 给小车回 ACK
+        gate = get_change_gate(session)
+        thumb = None
+        if gate:
+            reused, thumb = gate.check(frame)
+            if reused is not None:
+                handle_result(reused, context, reused=True)
                 continue
-            frame = latest_frame.copy()
-            ts = latest_ts
-            latest_frame = None  # 丢掉旧帧
-
-        latency = (time.time() - ts) * 1000  # ms
-
-        # Mediapipe 手势识别
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        result = detector.detect(mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb))
-        
-        gesture = "NO_HAND" 
-        if result.hand_landmarks:
-            hand = result.hand_landmarks[0]
-
-            # 手势识别函数
-            wrist = hand[0]
-            mcp = hand[9]
-            def dist(a, b):
-                return ((a.x - b.x)**2 + (a.y - b.y)**2)**0.5
-            palm = dist(wrist, mcp)
-            tip_ids = [8, 12, 16, 20]
-            straight = 0
-            ratios = []
-            for tid in tip_ids:
-                r = dist(hand[tid], wrist) / palm
-                ratios.append(r)
-                if r > 1.55:
-                    straight += 1
-            avg_ratio = sum(ratios)/len(ratios)
-            if straight == 0 and avg_ratio < 1.25:
-                gesture = "FIST"
-            elif straight >= 3 and avg_ratio > 1.55:
-                gesture = "OPEN"
-            else:
-                gesture = "UNKNOWN"
-
-        # 只打印非 NO_HAND
-        if gesture != "NO_HAND":
-            print(f"延迟: {latency:.0f} ms | 手势: {gesture}")
-        
-            if gesture != last_sent_gesture:
-                last_sent_gesture = gesture
-                if conn:
-                    try:
-                        gesture_bytes = gesture.encode("utf-8")
-                        gesture_header = struct.pack("I", len(gesture_bytes))
-                        conn.sendall(gesture_header + gesture_bytes)
-                        print(f"发送手势: {gesture}")
-                    except:
-                        pass
-
-
-# # ================== Flask MJPEG Web ==================
-# app = Flask(__name__)
-
-# def generate_mjpeg():
-#     global latest_frame, gesture_text
-#     while True:
-#         with frame_lock:
-#             if latest_frame is None:
-#                 continue
-#             frame = latest_frame.copy()
-#             text = gesture_text
-
-#         # 在画面上叠加手势文字
-#         if text:
-#             cv2.putText(frame, text, (10, 30),
-#                         cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-
-#         ret, jpeg = cv2.imencode('.jpg', frame)
-#         if not ret:
-#             continue
-#         frame_bytes = jpeg.tobytes()
-
-#         # MJPEG 多部分格式
-#         yield (b'--frame\r\n'
-#                b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-
-# @app.route('/video')
-# def video_feed():
-#     return Response(generate_mjpeg(),
-#                     mimetype='multipart/x-mixed-replace; boundary=frame')
-
-# # 启动 Flask 服务线程
-# threading.Thread(target=lambda: app.run(host="0.0.0.0", port=7000, threaded=True), daemon=True).start()
+
+        # 有上一帧手框时只裁剪手附近区域
+        tracker = get_roi_tracker(session)
+        image, roi = tracker.crop(frame) if tracker else (frame, None)
+
+        start = time.perf_counter()
+        if pool:
+            # 拷进这辆车的共享内存，结果在进程池的收集线程里走 finish_inference
+            pool.submit(session, image, ts, (context, tracker, roi, gate, thumb, start))
+            continue
+
+        # Mediapipe 手势识别（live 模式立即返回，结果走 handle_result 回调；mp.Image 会拷贝像素，缓冲区可以马上复用）
+        result = get_detector(session).detect(image, ts, context=context)
+        if result is not None:
+            finish_inference(result, context, tracker, roi, gate, thumb, start)
+
+def finish_inference(result, context, tracker, roi, gate, thumb, start):
+    if tracker:
+        # 关键点映射回整幅图坐标，下游无感知
+        tracker.update(result, roi, (time.perf_counter() - start) * 1000)
+    if gate:
+        gate.update(thumb, result)
+    handle_result(result, context)
+
+def handle_result(result, context, reused=False):
+    session, ts, frame_id, decoded = context
+    done = time.perf_counter()
+    tracer.record("infer", done - decoded)
+    latency = (time.time() - ts) * 1000  # ms
+
+    # 单帧分类 + 时间滤波，回传和打印都只看确认后的手势；
+    # 变化门沿用的结果不算新的一票，否则一次误判在静止画面里重复几帧就能凑够 GESTURE_CONFIRM
+    debouncer = get_debouncer(session)
+    hand = result.hand_landmarks[0] if not reused and result.hand_landmarks else None
+    gesture, confidence = debouncer.update(hand, ts, vote=not reused)
+
+    session.gesture = gesture
+    relay = get_relay(session.car_id)
+    if relay.events.clients:
+        relay.events.publish(json.dumps({
+            "car_id": session.car_id, "frame_id": frame_id, "ts": ts,
+            "gesture": gesture, "raw": debouncer.raw, "confidence": round(confidence, 2),
+            "latency_ms": round(latency, 1),
+        }).encode(), ts)
+    changed = gesture != "NO_HAND" and gesture != session.last_sent_gesture
+
+    # 只打印非 NO_HAND
+    if gesture != "NO_HAND":
+        print(f"[{session.car_id}] 延迟: {latency:.0f} ms | 手势: {gesture} ({confidence:.0%})")
+
+    # 只回传给这一帧所属的小车
+    if changed:
+        session.last_sent_gesture = gesture
+    reply = encode_reply(session, frame_id, gesture if changed else None)
+    if reply:
+        on_sent = lambda: tracer.record("reply", time.perf_counter() - done)
+        if session.send(reply, on_sent, droppable=not changed) and changed:
+            print(f"[{session.car_id}] 发送手势: {gesture}")
+
+
+# ================== MJPEG 转发 ==================
+# 浏览器看小车画面：直接转发小车发来的原始 JPEG，ECS 不解码不重编码；
+# 手势 / 延迟走 SSE 旁路（/events/<car_id>），网页自己叠加，不画进像素
+# 默认关闭；画面没有鉴权，默认只听本机，要给别的机器看显式设 RELAY_HOST=0.0.0.0
+RELAY_PORT = int(os.environ.get("RELAY_PORT", 0))  # 0 关闭，例如 7000
+RELAY_HOST = os.environ.get("RELAY_HOST", "127.0.0.1")
+RELAY_MAX_FPS = 15
+app = Flask(__name__)
+
+class Relay:
+    def __init__(self):
+        self.video = JpegBroadcaster()
+        self.events = JpegBroadcaster()
+
+relays = {}  # car_id -> Relay，按 car_id 而不是连接，小车重连后观看不中断
+relays_lock = threading.Lock()
+
+def get_relay(car_id):
+    relay = relays.get(car_id)
+    if relay is None:
+        with relays_lock:
+            relay = relays.setdefault(car_id, Relay())
+    return relay
+
+def find_relay(car_id):
+    if car_id is None:
+        # 不指定车时看第一辆在线的车
+        cars = [s.car_id for s in sessions.sessions()]
+        if not cars:
+            abort(404)
+        car_id = cars[0]
+    relay = relays.get(car_id)  # 只认连过的车，随便输的 car_id 不建转发槽
+    if relay is None:
+        abort(404)
+    return relay
+
+@app.route("/video")
+@app.route("/video/<car_id>")
+def video_feed(car_id=None):
+    fps = request.args.get("fps", RELAY_MAX_FPS, type=float)
+    relay = find_relay(car_id)
+    return Response(relay.video.stream(max_fps=min(fps, RELAY_MAX_FPS)),
+                    mimetype="multipart/x-mixed-replace; boundary=" + BOUNDARY.decode())
+
+@app.route("/events")
+@app.route("/events/<car_id>")
+def events_feed(car_id=None):
+    relay = find_relay(car_id)
+    return Response(relay.events.stream(fmt=sse_event, idle=SSE_PING), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache"})
+
+@app.route("/cars")
+def cars():
+    online = {s.car_id: s.gesture for s in sessions.sessions()}
+    return jsonify({car_id: {"online": car_id in online, "gesture": online.get(car_id),
+                             "video": relay.video.stats(), "events": relay.events.stats()}
+                    for car_id, relay in list(relays.items())})
+
+if RELAY_PORT:
+    threading.Thread(target=lambda: app.run(host=RELAY_HOST, port=RELAY_PORT, threaded=True), daemon=True).start()
+    print(f"画面转发: http://{RELAY_HOST}:{RELAY_PORT}/video/<car_id>  手势事件: /events/<car_id>")
 
 
 # 启动处理线程
 threading.Thread(target=process_frames, daemon=True).start()
 
-# 等待客户端连接
-while True:
-    conn, addr = server_socket.accept()
-    threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
+# 所有小车连接的接收/回传都在主线程的事件循环里
+tracer.install_signal()
+try:
+    IngestLoop(server_socket, sessions, on_frame, on_close=close_recorder).run()
+except KeyboardInterrupt:
+    if recorder is not None:
+        recorder.stop()
+    if pool:
+        pool.close()
@@ -0,0 +1,72 @@
+# sim_ecs.py
+# 替身 ECS：和 ser_tcp_med.py 一样的握手/收帧/回执，但不跑 MediaPipe，手势按脚本轮换
+# 本地联调: python sim_ecs.py  然后  CAR_HARDWARE=sim ECS_IP=127.0.0.1 python main.py
+# 用法: python sim_ecs.py [端口] [每个手势持续秒数] [--decode]
+import socket
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from ecs_session import SessionRegistry, IngestLoop, encode_reply
+
+SCRIPT = ["OPEN", "NO_HAND", "FIST", "NO_HAND"]  # 张手前进 -> 没手 -> 握拳停车 -> 没手
+STATS_INTERVAL = 5
+
+port = 8088
+hold = 3.0
+decode = "--decode" in sys.argv
+args = [a for a in sys.argv[1:] if not a.startswith("--")]
+if args:
+    port = int(args[0])
+if len(args) > 1:
+    hold = float(args[1])
+
+start = time.time()
+frames = 0
+frame_bytes = 0
+decode_time = 0.0
+last_stats = time.time()
+
+
+def scripted_gesture():
+    return SCRIPT[int((time.time() - start) / hold) % len(SCRIPT)]
+
+
+def on_frame(session, ts, frame_id, frame):
+    global frames, frame_bytes, decode_time, last_stats
+    frames += 1
+    frame_bytes += len(frame)
+    if decode:
+        # 压测 ECS 解码开销时打开
+        t = time.perf_counter()
+        cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_COLOR)
+        decode_time += time.perf_counter() - t
+
+    gesture = scripted_gesture()
+    changed = gesture != "NO_HAND" and gesture != session.last_sent_gesture
+    if changed:
+        session.last_sent_gesture = gesture
+        print(f"[{session.car_id}] 发送手势: {gesture}")
+    reply = encode_reply(session, frame_id, gesture if changed else None)
+    if reply:
+        session.send(reply, droppable=not changed)
+
+    if time.time() - last_stats > STATS_INTERVAL:
+        elapsed = time.time() - last_stats
+        last_stats = time.time()
+        extra = f" | 解码 {decode_time / frames * 1000:.1f} ms/帧" if decode and frames else ""
+        print(f"收帧 {frames / elapsed:.1f} fps | {frame_bytes / elapsed / 1024:.0f} KB/s | "
+              f"延迟 {(time.time() - ts) * 1000:.0f} ms | 在线 {len(sessions.sessions())} 辆{extra}")
+        frames = frame_bytes = 0
+        decode_time = 0.0
+
+
+sessions = SessionRegistry()
+server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+server_socket.bind(("0.0.0.0", port))
+server_socket.listen(64)
+print(f"替身 ECS 监听 {port}，手势脚本 {SCRIPT}，每个 {hold:.0f} 秒")
+IngestLoop(server_socket, sessions, on_frame).run()
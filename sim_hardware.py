@@ -0,0 +1,184 @@
+# sim_hardware.py
+# 硬件模拟：接口和 gpiozero.Motor / PWMOutputDevice / DistanceSensor、cv2.VideoCapture 一致，
+# 背后是一个简单的差速小车 + 矩形房间模型，整个 main.py 可以在笔记本上跑起来做压测
+import math
+import random
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import config
+
+TRACK_WIDTH = 0.15          # 两轮间距 m
+ROOM = (3.0, 2.0)           # 房间宽、高 m，小车从中心出发朝 +x
+ECHO_NOISE = 0.01           # 测距高斯噪声 m
+ECHO_GLITCH = 0.02          # 偶发错误回波的概率
+
+
+class SimWorld:
+    """
+    差速运动学：轮速 = 方向 * PWM * SPEED_PER_POWER，读状态时按流逝时间积分。
+    障碍物就是四面墙，前方距离用射线和墙求交。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.x = ROOM[0] / 2
+        self.y = ROOM[1] / 2
+        self.heading = 0.0
+        self.collisions = 0
+        self._t = time.monotonic()
+        self._dir = {}   # 方向引脚 forward -> 1 / -1 / 0
+        self._pwm = {}   # PWM 引脚 -> 0~1
+
+    def _wheel(self, forward_pin, pwm_pin):
+        return self._dir.get(forward_pin, 0) * self._pwm.get(pwm_pin, 0.0) * config.SPEED_PER_POWER
+
+    def _advance(self):
+        now = time.monotonic()
+        dt = now - self._t
+        self._t = now
+        left = self._wheel(config.LEFT_FORWARD, config.LEFT_PWM)
+        # CarMotor 给右轮写的是 -right（右电机反装），这里翻回来
+        right = -self._wheel(config.RIGHT_FORWARD, config.RIGHT_PWM)
+        v = (left + right) / 2
+        self.heading += (right - left) / TRACK_WIDTH * dt
+        x = self.x + v * math.cos(self.heading) * dt
+        y = self.y + v * math.sin(self.heading) * dt
+        if 0 < x < ROOM[0] and 0 < y < ROOM[1]:
+            self.x, self.y = x, y
+        elif v != 0:
+            self.collisions += 1  # 撞墙，停在原地
+
+    def set_direction(self, forward_pin, direction):
+        with self.lock:
+            self._advance()
+            self._dir[forward_pin] = direction
+
+    def set_pwm(self, pin, value):
+        with self.lock:
+            self._advance()
+            self._pwm[pin] = value
+
+    def distance_ahead(self):
+        with self.lock:
+            self._advance()
+            c, s = math.cos(self.heading), math.sin(self.heading)
+            hits = []
+            if c > 1e-9:
+                hits.append((ROOM[0] - self.x) / c)
+            elif c < -1e-9:
+                hits.append(-self.x / c)
+            if s > 1e-9:
+                hits.append((ROOM[1] - self.y) / s)
+            elif s < -1e-9:
+                hits.append(-self.y / s)
+            return min(hits)
+
+    def pose(self):
+        with self.lock:
+            self._advance()
+            return self.x, self.y, self.heading
+
+
+world = SimWorld()
+
+
+class Motor:
+    def __init__(self, forward, backward):
+        self.forward_pin = forward
+        self.backward_pin = backward
+
+    def forward(self):
+        world.set_direction(self.forward_pin, 1)
+
+    def backward(self):
+        world.set_direction(self.forward_pin, -1)
+
+    def stop(self):
+        world.set_direction(self.forward_pin, 0)
+
+
+class PWMOutputDevice:
+    def __init__(self, pin):
+        self.pin = pin
+        self._value = 0.0
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, val):
+        self._value = max(0.0, min(1.0, val))
+        world.set_pwm(self.pin, self._value)
+
+
+class DistanceSensor:
+    def __init__(self, trigger=None, echo=None, max_distance=1, queue_len=1, **kwargs):
+        self.max_distance = max_distance
+
+    @property
+    def distance(self):
+        if random.random() < ECHO_GLITCH:
+            return random.uniform(0, self.max_distance)
+        d = world.distance_ahead() + random.gauss(0, ECHO_NOISE)
+        return max(0.0, min(self.max_distance, d))
+
+
+class VideoCapture:
+    """合成画面：渐变背景 + 随朝向平移的竖条（看得出车在转）+ 时间戳，按 fps 节拍出帧"""
+
+    def __init__(self, index=0, fps=30):
+        self.width = config.VIDEO_WIDTH
+        self.height = config.VIDEO_HEIGHT
+        self.interval = 1 / fps
+        self._next = time.monotonic()
+        self._opened = True
+        self._build_background()
+
+    def _build_background(self):
+        x = np.linspace(0, 255, self.width, dtype=np.uint8)
+        y = np.linspace(0, 255, self.height, dtype=np.uint8)
+        self._bg = np.empty((self.height, self.width, 3), np.uint8)
+        self._bg[..., 0] = x[None, :]
+        self._bg[..., 1] = y[:, None]
+        self._bg[..., 2] = 128
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            self.width = int(value)
+        elif prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            self.height = int(value)
+        elif prop == cv2.CAP_PROP_FPS and value > 0:
+            self.interval = 1 / value
+        else:
+            return False
+        self._build_background()
+        return True
+
+    def isOpened(self):
+        return self._opened
+
+    def grab(self):
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next = max(self._next + self.interval, time.monotonic())
+        return self._opened
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        frame = self._bg.copy()
+        x, y, heading = world.pose()
+        bar = int((heading / (2 * math.pi)) % 1 * self.width)
+        cv2.rectangle(frame, (bar, 0), (min(bar + 20, self.width - 1), self.height - 1), (0, 0, 255), -1)
+        cv2.putText(frame, f"{time.time():.2f} ({x:.2f},{y:.2f})", (5, 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        return True, frame
+
+    def release(self):
+        self._opened = False
@@ -0,0 +1,4 @@
+import os
+
+# main.py / motor.py 通过 hardware.py 选后端，测试里一律用模拟硬件
+os.environ.setdefault("CAR_HARDWARE", "sim")
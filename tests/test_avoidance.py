@@ -0,0 +1,58 @@
+from avoidance import APPROACH, RESUME, TURNING, ObstacleAvoider
+
+
+class FakeMotor:
+    def __init__(self):
+        self.calls = []
+        self.logger = None
+
+    def set_speed(self, left, right):
+        self.calls.append((left, right))
+
+    def stop(self):
+        self.calls.append("stop")
+
+
+class Log:
+    def __init__(self):
+        self.lines = []
+
+    def log(self, key, fmt, *args):
+        self.lines.append(fmt.format(*args))
+        return True
+
+
+def make(**kwargs):
+    motor = FakeMotor()
+    log = Log()
+    avoider = ObstacleAvoider(motor, trigger_distance=0.2, turn_time=0.5, turn_speed=0.3,
+                              cruise_speed=0.4, resume_time=0.2, logger=log, **kwargs)
+    return avoider, motor, log
+
+
+def test_full_cycle_without_blocking():
+    avoider, motor, log = make()
+    assert avoider.step(1.0, now=0.0) == APPROACH and motor.calls == []
+    assert avoider.step(0.15, now=1.0) == TURNING
+    assert motor.calls == [(-0.3, 0.3)] and avoider.active and len(log.lines) == 1
+    assert avoider.step(0.15, now=1.3) == TURNING         # 转弯中不重复下指令
+    assert avoider.step(0.15, now=1.5) == RESUME
+    assert motor.calls[1:] == ["stop", (0.4, 0.4)]
+    assert avoider.step(0.1, now=1.6) == RESUME           # 恢复期内不看距离
+    assert avoider.step(1.0, now=1.7) == APPROACH
+    assert avoider.turns == 1
+
+
+def test_ttc_trigger_and_missing_distance():
+    avoider, motor, _ = make(trigger_ttc=0.8)
+    assert avoider.step(None, now=0.0) == APPROACH
+    assert avoider.step(1.0, now=0.1, ttc=1.5) == APPROACH
+    assert avoider.step(1.0, now=0.2, ttc=0.5) == TURNING
+
+
+def test_cancel_returns_to_approach():
+    avoider, motor, _ = make()
+    avoider.step(0.1, now=0.0)
+    avoider.cancel()
+    assert not avoider.active
+    assert avoider.step(1.0, now=0.6) == APPROACH and motor.calls == [(-0.3, 0.3)]
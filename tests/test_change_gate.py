@@ -0,0 +1,54 @@
+import numpy as np
+
+from change_gate import ChangeGate
+
+
+def frame(value=100, spot=None):
+    img = np.full((240, 320, 3), value, np.uint8)
+    if spot is not None:
+        y, x = spot
+        img[y:y + 40, x:x + 40] = 255
+    return img
+
+
+def test_first_frame_always_runs():
+    gate = ChangeGate()
+    result, thumb = gate.check(frame(), now=0.0)
+    assert result is None and thumb.shape == (24, 32)
+
+
+def test_reuses_result_while_unchanged():
+    gate = ChangeGate()
+    _, thumb = gate.check(frame(), now=0.0)
+    gate.update(thumb, "hand", now=0.0)
+    assert gate.check(frame(), now=0.1)[0] == "hand"
+    # 轻微噪声（低于像素阈值）也算没变
+    assert gate.check(frame(103), now=0.2)[0] == "hand"
+    assert gate.stats()["skipped"] == 2
+
+
+def test_reruns_on_change():
+    gate = ChangeGate()
+    _, thumb = gate.check(frame(spot=(20, 20)), now=0.0)
+    gate.update(thumb, "hand", now=0.0)
+    result, _ = gate.check(frame(spot=(120, 200)), now=0.1)
+    assert result is None and gate.last_change > gate.changed_ratio
+
+
+def test_compares_against_last_inferred_frame():
+    # 每帧只挪一点，和上一帧比都低于阈值，但和上次推理的那帧比累积起来就超了
+    gate = ChangeGate(max_age=10)
+    _, thumb = gate.check(frame(100), now=0.0)
+    gate.update(thumb, "hand", now=0.0)
+    results = [gate.check(frame(100 + 4 * i), now=i * 0.01)[0] for i in range(1, 6)]
+    assert results[0] == "hand" and results[-1] is None
+
+
+def test_max_age_and_reset():
+    gate = ChangeGate(max_age=0.5)
+    _, thumb = gate.check(frame(), now=0.0)
+    gate.update(thumb, "hand", now=0.0)
+    assert gate.check(frame(), now=0.6)[0] is None
+    gate.update(thumb, "hand", now=1.0)
+    gate.reset()
+    assert gate.check(frame(), now=1.1)[0] is None
@@ -0,0 +1,62 @@
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+from decode import FrameDecoder, fit_size, jpeg_size
+
+
+def encode(width, height, **params):
+    img = np.zeros((height, width, 3), np.uint8)
+    img[:, : width // 2] = (0, 0, 255)  # 左半边红色（BGR）
+    flags = [cv2.IMWRITE_JPEG_PROGRESSIVE, 1] if params.get("progressive") else []
+    return cv2.imencode(".jpg", img, flags)[1].tobytes()
+
+
+def segment(marker, body):
+    return bytes([0xFF, marker]) + struct.pack(">H", len(body) + 2) + body
+
+
+@pytest.mark.parametrize("size", [(320, 240), (641, 479), (16, 8)])
+def test_jpeg_size_from_encoder(size):
+    assert jpeg_size(encode(*size)) == size
+    assert jpeg_size(encode(*size, progressive=True)) == size
+
+
+def test_jpeg_size_hand_built_segments():
+    sof0 = segment(0xC0, bytes([8]) + struct.pack(">HH", 120, 160) + b"\x03")
+    app0 = segment(0xE0, b"JFIF\x00" + b"\x00" * 9)
+    # APP 段要跳过，段之间的 0xFF 填充字节也要跳过
+    assert jpeg_size(b"\xff\xd8" + app0 + b"\xff" + sof0) == (160, 120)
+    sof2 = segment(0xC2, bytes([8]) + struct.pack(">HH", 2, 3) + b"\x01")
+    assert jpeg_size(b"\xff\xd8" + sof2) == (3, 2)
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"\x89PNG\r\n\x1a\n" + b"\x00" * 16,
+    b"\xff\xd8" + segment(0xDA, b"\x00" * 8),              # 先到了扫描数据
+    b"\xff\xd8" + segment(0xC4, b"\x00" * 8)[:-4],         # 截断
+    b"\xff\xd8\x00\x00" + b"\x00" * 16,                     # 段标记错位
+])
+def test_jpeg_size_rejects(data):
+    assert jpeg_size(data) is None
+
+
+def test_fit_size():
+    assert fit_size(640, 480, 320, 240) == (320, 240)
+    assert fit_size(640, 360, 320, 240) == (320, 180)
+    assert fit_size(160, 120, 320, 240) == (160, 120)   # 不放大
+    assert fit_size(640, 480) == (640, 480)
+
+
+def test_decoder_reuses_buffer_and_outputs_rgb():
+    decoder = FrameDecoder(320, 240)
+    first = decoder.decode(encode(640, 480))
+    assert first.shape == (240, 320, 3)
+    assert tuple(first[120, 10]) == pytest.approx((255, 0, 0), abs=8)
+    second = decoder.decode(encode(640, 480))
+    assert second is first
+    assert decoder.stats()["reduced"] == 2
+    assert decoder.decode(b"\xff\xd8garbage") is None and decoder.failed == 1
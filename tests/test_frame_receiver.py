@@ -0,0 +1,87 @@
+import socket
+import struct
+
+import pytest
+
+from frame_receiver import FrameReceiver
+from protocol import FRAME_HEADER_V1, FRAME_HEADER_V2
+
+
+def frames(rx, sock):
+    """收完对端已经发出的数据，返回所有完整帧（拷贝出来，view 下一次 fill 后失效）"""
+    out = []
+    sock.setblocking(False)
+    while True:
+        while True:
+            item = rx.next_frame()
+            if item is None:
+                break
+            ts, frame_id, view = item
+            out.append((ts, frame_id, bytes(view)))
+        try:
+            rx.fill(sock)
+        except BlockingIOError:
+            return out
+
+
+def test_v1_and_v2_headers():
+    a, b = socket.socketpair()
+    a.sendall(FRAME_HEADER_V1.pack(1.5, 3) + b"abc")
+    assert frames(FrameReceiver(), b) == [(1.5, 0, b"abc")]
+
+    a.sendall(FRAME_HEADER_V2.pack(2.5, 7, 2) + b"xy" + FRAME_HEADER_V2.pack(3.5, 8, 0))
+    assert frames(FrameReceiver(header=FRAME_HEADER_V2), b) == [(2.5, 7, b"xy"), (3.5, 8, b"")]
+
+
+def test_frames_split_across_reads():
+    a, b = socket.socketpair()
+    rx = FrameReceiver(header=FRAME_HEADER_V2)
+    data = b"".join(FRAME_HEADER_V2.pack(i, i, 5) + bytes([i]) * 5 for i in range(20))
+    got = []
+    # 一次一个字节地送，帧头和负载都会被切开
+    for i in range(len(data)):
+        a.sendall(data[i:i + 1])
+        got += frames(rx, b)
+    assert [f for _, f, _ in got] == list(range(20))
+    assert all(payload == bytes([f]) * 5 for _, f, payload in got)
+
+
+def test_grows_for_frames_larger_than_capacity():
+    a, b = socket.socketpair()
+    rx = FrameReceiver(capacity=64, header=FRAME_HEADER_V2)
+    big = bytes(range(256)) * 40
+    a.sendall(FRAME_HEADER_V2.pack(0, 1, 4) + b"head")
+    a.sendall(FRAME_HEADER_V2.pack(0, 2, len(big)))
+    assert [p for _, _, p in frames(rx, b)] == [b"head"]
+    a.sendall(big + FRAME_HEADER_V2.pack(0, 3, 4) + b"tail")
+    got = frames(rx, b)
+    assert [(f, p) for _, f, p in got] == [(2, big), (3, b"tail")]
+
+
+def test_recv_frame_blocking():
+    a, b = socket.socketpair()
+    a.sendall(FRAME_HEADER_V1.pack(9.0, 2) + b"ok")
+    assert FrameReceiver().recv_frame(b)[0] == 9.0
+    a.close()
+    with pytest.raises(ConnectionResetError):
+        FrameReceiver().recv_frame(b)
+
+
+def test_rejects_oversized_length():
+    a, b = socket.socketpair()
+    rx = FrameReceiver(header=FRAME_HEADER_V2, max_frame=1024)
+    a.sendall(FRAME_HEADER_V2.pack(0, 1, 1025))
+    rx.fill(b)
+    with pytest.raises(ValueError):
+        rx.next_frame()
+
+
+def test_peek_and_skip():
+    a, b = socket.socketpair()
+    rx = FrameReceiver()
+    a.sendall(b"HELO" + FRAME_HEADER_V1.pack(1.0, 1) + b"z")
+    rx.fill(b)
+    assert bytes(rx.peek(4)) == b"HELO"
+    rx.skip(4)
+    assert rx.next_frame()[2].tobytes() == b"z"
+    assert rx.peek(struct.calcsize("dI")) is None
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from gesture import MIDDLE_MCP, TIP_IDS, WRIST, GestureDebouncer, classify_hands, finger_ratios
+
+
+def hand(ratio):
+    """4 根手指的 指尖-手腕 / 掌长 都等于 ratio 的一只手，形状 (1, 21, 3)"""
+    arr = np.zeros((1, 21, 3))
+    arr[0, WRIST, :2] = (0.5, 0.9)
+    arr[0, MIDDLE_MCP, :2] = (0.5, 0.8)
+    for i, tip in enumerate(TIP_IDS):
+        angle = np.radians(60 + 20 * i)
+        arr[0, tip, :2] = (0.5 + 0.1 * ratio * np.cos(angle), 0.9 - 0.1 * ratio * np.sin(angle))
+    return arr
+
+
+def feed(debouncer, arrs, start=0.0, step=0.05):
+    return [debouncer.update(arr, start + i * step)[0] for i, arr in enumerate(arrs)]
+
+
+def test_classify_thresholds():
+    assert finger_ratios(hand(1.8))[0] == pytest.approx([1.8] * 4)
+    assert classify_hands(np.concatenate([hand(1.8), hand(1.0), hand(1.4)])) == ["OPEN", "FIST", "UNKNOWN"]
+
+
+def test_k_of_m_confirm():
+    d = GestureDebouncer(confirm=3, window=5)
+    assert feed(d, [hand(1.8)] * 3) == ["NO_HAND", "NO_HAND", "OPEN"]
+    assert d.changes == 1 and d.confidence == 1.0
+    assert feed(d, [None, hand(1.8)], start=0.15) == ["OPEN", "OPEN"]
+    assert d.confidence == pytest.approx(4 / 5)
+
+
+def test_single_frame_flicker_is_ignored():
+    d = GestureDebouncer(confirm=3, window=5)
+    feed(d, [hand(1.8)] * 5)
+    out = feed(d, [hand(1.0), hand(1.8), None, hand(1.8), hand(1.0), hand(1.8)], start=0.25)
+    assert set(out) == {"OPEN"}
+    assert d.changes == 1 and d.raw_changes > 4
+
+
+def test_hysteresis_keeps_open_near_the_boundary():
+    # 1.5 进不了 OPEN（需要 > 1.55），但已经是 OPEN 时高于退出阈值 1.45 就保持
+    fresh = GestureDebouncer(confirm=1, window=1)
+    assert fresh.update(hand(1.5), 0.0)[0] == "UNKNOWN"
+    d = GestureDebouncer(confirm=1, window=1)
+    d.update(hand(1.8), 0.0)
+    assert feed(d, [hand(1.5)] * 3, start=1.0) == ["OPEN"] * 3
+    assert d.update(hand(1.4), 2.0)[0] == "UNKNOWN"
+
+
+def test_hysteresis_keeps_fist_near_the_boundary():
+    d = GestureDebouncer(confirm=1, window=1)
+    d.update(hand(1.0), 0.0)
+    assert d.update(hand(1.3), 1.0)[0] == "FIST"
+    assert d.update(hand(1.4), 2.0)[0] == "UNKNOWN"
+    assert GestureDebouncer(confirm=1, window=1).update(hand(1.3), 0.0)[0] == "UNKNOWN"
+
+
+def test_stale_frames_leave_the_window():
+    d = GestureDebouncer(confirm=3, window=5, max_age=1.0)
+    feed(d, [hand(1.0)] * 2)
+    # 隔了很久再来一帧：旧的两帧不能凑数
+    assert d.update(hand(1.0), 5.0)[0] == "NO_HAND"
+
+
+def test_confirm_must_fit_window():
+    with pytest.raises(ValueError):
+        GestureDebouncer(confirm=6, window=5)
+    with pytest.raises(ValueError):
+        GestureDebouncer(confirm=0, window=5)
+
+
+def test_reused_frames_do_not_vote():
+    # 变化门把一次误判沿用好几帧：不投票，凑不够 confirm
+    d = GestureDebouncer(confirm=3, window=5)
+    feed(d, [None] * 3)
+    d.update(hand(1.0), 0.2)
+    out = [d.update(None, 0.25 + i * 0.05, vote=False)[0] for i in range(5)]
+    assert out == ["NO_HAND"] * 5
+    assert d.frames == 4 and d.changes == 0
+
+
+class Point:
+    def __init__(self, x, y, z=0.0):
+        self.x, self.y, self.z = x, y, z
+
+
+def as_landmarks(arr):
+    return [Point(*p) for p in arr[0]]
+
+
+@pytest.mark.parametrize("ratio", [0.8, 1.2, 1.3, 1.5, 1.6, 2.0])
+def test_single_hand_fast_path_matches_vectorized(ratio):
+    from gesture import classify_landmarks, detect_gesture, hand_ratios
+    arr = hand(ratio)
+    lms = as_landmarks(arr)
+    assert hand_ratios(lms) == pytest.approx(finger_ratios(arr)[0].tolist())
+    assert detect_gesture(lms) == classify_landmarks([lms])[0] == classify_hands(arr)[0]
+    two = classify_landmarks([lms, as_landmarks(hand(1.8))])
+    assert two == classify_hands(np.concatenate([arr, hand(1.8)]))
+
+
+def test_debouncer_accepts_landmark_lists():
+    d = GestureDebouncer(confirm=1, window=1)
+    assert d.update(as_landmarks(hand(1.8)), 0.0)[0] == "OPEN"
+    assert d.update(as_landmarks(hand(1.5)), 0.1)[0] == "OPEN"   # 滞回同样生效
@@ -0,0 +1,99 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from inference_pool import InferencePool
+
+
+class SumDetector:
+    """同步检测器：结果是图像像素和；ts 为负时模拟子进程崩溃"""
+
+    def detect(self, image, ts=None, context=None):
+        if ts < 0:
+            os._exit(3)
+        return int(image.sum())
+
+    def close(self):
+        pass
+
+
+class Collector:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.results = []
+        self.freed = []
+
+    def on_result(self, result, context):
+        with self.cond:
+            self.results.append((result, context))
+
+    def on_free(self, key):
+        with self.cond:
+            self.freed.append(key)
+            self.cond.notify_all()
+
+    def wait_freed(self, count, timeout=10):
+        with self.cond:
+            assert self.cond.wait_for(lambda: len(self.freed) >= count, timeout)
+
+
+@pytest.fixture
+def pool():
+    c = Collector()
+    p = InferencePool(2, lambda on_result=None: SumDetector(), c.on_result, c.on_free,
+                      max_shape=(8, 8, 3), check_interval=0.1)
+    p.collector = c
+    yield p
+    p.close()
+
+
+def test_busy_until_result_then_free(pool):
+    c = pool.collector
+    img = np.ones((8, 8, 3), np.uint8)
+    assert pool.submit("a", img, 1.0, "a1")
+    assert pool.busy("a")
+    assert not pool.submit("a", img, 1.0, "a-again")  # 上一帧还没回来
+    c.wait_freed(1)
+    assert not pool.busy("a")
+    assert c.results == [(img.size, "a1")]
+    assert pool.submit("a", img * 2, 2.0, "a2")
+    c.wait_freed(2)
+    assert c.results[-1] == (img.size * 2, "a2")
+
+
+def test_spreads_cars_and_grows_shared_memory(pool):
+    c = pool.collector
+    big = np.ones((16, 16, 3), np.uint8)   # 比 max_shape 大，换一块共享内存
+    for key in "ab":
+        pool.submit(key, big, 1.0, key)
+    c.wait_freed(2)
+    assert sorted(ctx for _, ctx in c.results) == ["a", "b"]
+    assert all(r == big.size for r, _ in c.results)
+    assert pool.stats()["load"] == [1, 1]
+
+
+def test_release_frees_slot(pool):
+    c = pool.collector
+    img = np.ones((8, 8, 3), np.uint8)
+    pool.submit("a", img, 1.0)
+    c.wait_freed(1)
+    pool.release("a")
+    assert pool.keys() == [] and pool.stats()["load"] == [0, 0]
+    pool.release("a")  # 重复释放无害
+    assert pool.submit("a", img, 2.0)
+    c.wait_freed(2)
+
+
+def test_dead_worker_is_restarted(pool):
+    c = pool.collector
+    img = np.ones((8, 8, 3), np.uint8)
+    pool.submit("a", img, -1.0, "crash")
+    c.wait_freed(1)   # 在途帧作废后放行
+    assert not pool.busy("a")
+    assert pool.stats()["restarts"] == 1
+    assert pool.submit("a", img, 1.0, "after")
+    c.wait_freed(2)
+    assert c.results == [(img.size, "after")]
+    assert pool.stats()["alive"] == 2
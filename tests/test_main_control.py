@@ -0,0 +1,55 @@
+import pytest
+
+import config
+import main
+from protocol import Gesture
+
+CRUISE = (config.CRUISE_SPEED, config.CRUISE_SPEED)
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    with main.lock:
+        main.mode = "auto"
+        main.udp_mode = None
+        main.stop_cruise()
+    yield
+    with main.lock:
+        main.stop_cruise()
+
+
+def test_open_and_fist():
+    main.apply_gesture(Gesture.OPEN, 1)
+    assert main.ult_flag and main.motor.speed == CRUISE
+    main.apply_gesture(Gesture.FIST, 2)
+    assert not main.ult_flag and main.motor.speed == (0.0, 0.0)
+
+
+def test_open_after_ecs_reconnect():
+    main.apply_gesture(Gesture.OPEN, 1)
+    # 控制循环发现 ECS 断线时的处理
+    with main.lock:
+        main.stop_cruise()
+    assert not main.ult_flag and main.motor.speed == (0.0, 0.0)
+    main.apply_gesture(Gesture.OPEN, 2)
+    assert main.ult_flag and main.motor.speed == CRUISE
+
+
+def test_open_after_manual_round_trip():
+    main.apply_gesture(Gesture.OPEN, 1)
+    main.handle_phone_line("s")
+    assert not main.ult_flag and main.motor.speed == (0.0, 0.0)
+    main.handle_phone_line("z")
+    main.apply_gesture(Gesture.OPEN, 2)
+    assert main.ult_flag and main.motor.speed == CRUISE
+
+
+def test_udp_mode_change_stops_cruise_only_on_change():
+    main.apply_gesture(Gesture.OPEN, 1)
+    main.handle_joystick(0, 0, "auto")   # 第一个包，模式没变，不打断巡航
+    assert main.ult_flag
+    main.handle_joystick(90, 50, "manual")
+    assert main.mode == "manual" and not main.ult_flag
+    main.handle_phone_line("z")           # TCP 切回自动，UDP 还在发 manual 也不会抢回去
+    main.handle_joystick(90, 50, "manual")
+    assert main.mode == "auto" and (main.angle, main.strength) == (0, 0)
@@ -0,0 +1,61 @@
+import pytest
+
+from motor import CarMotor
+from rate_logger import RateLimitedLogger
+
+
+def make_motor(max_accel=0):
+    return CarMotor(1, 2, 3, 4, 5, 6, max_accel=max_accel, logger=RateLimitedLogger(out=lambda line: None))
+
+
+def test_repeated_speed_is_suppressed():
+    motor = make_motor()
+    motor.set_speed(0.3, 0.3)
+    writes = motor.writes
+    for _ in range(5):
+        motor.set_speed(0.3, 0.3)
+    assert motor.writes == writes and motor.suppressed == 10   # 每拍两个轮子各一次
+    motor.set_speed(0.3, 0.5)
+    assert motor.writes == writes + 1                          # 只有右轮变了
+
+
+def test_direction_and_pwm_cached_separately():
+    motor = make_motor()
+    motor.set_speed(0.5, 0.5)
+    assert motor.left_pwm.value == 0.5 and motor.right_pwm.value == 0.5
+    assert motor._dir == [1, -1]          # 右电机反装，写的是 -right
+    motor.set_speed(-0.5, 0.5)            # 左轮只换方向，PWM 不变
+    assert motor._dir == [-1, -1] and motor.left_pwm.value == 0.5
+    motor.set_speed(1.7, 0.0004)          # 限幅到 ±1，取 3 位小数
+    assert motor.left_pwm.value == 1.0 and motor._dir[1] == 0
+
+
+def test_slew_converges_through_update():
+    motor = make_motor(max_accel=2.0)     # 每秒最多变 2.0，一拍 0.05 s 变 0.1
+    motor.update(now=0.0)
+    motor.speed = (0.6, -0.6)
+    outputs = []
+    for i in range(1, 10):
+        motor.update(now=i * 0.05)
+        outputs.append(motor.output)
+    assert outputs[0] == pytest.approx((0.1, -0.1))
+    assert outputs[5] == pytest.approx((0.6, -0.6))
+    assert outputs[-1] == pytest.approx((0.6, -0.6))
+
+
+def test_slew_clamps_long_gaps():
+    motor = make_motor(max_accel=2.0)
+    motor.update(now=0.0)
+    motor.speed = (1.0, 1.0)
+    motor.update(now=5.0)                 # 隔了很久：最多按 0.1 s 算
+    assert motor.output == pytest.approx((0.2, 0.2))
+
+
+def test_set_speed_is_slew_limited_but_stop_is_not():
+    motor = make_motor(max_accel=2.0)
+    motor.update(now=0.0)
+    motor.set_speed(1.0, 1.0)
+    assert motor.speed == (1.0, 1.0) and motor.output[0] < 1.0
+    motor.stop()
+    assert motor.speed == (0.0, 0.0) and motor.output == (0.0, 0.0)
+    assert motor.left_pwm.value == 0.0 and motor._dir == [0, 0]
@@ -0,0 +1,88 @@
+import socket
+
+import pytest
+
+from ecs_session import CarSession, encode_reply
+from frame_receiver import FrameReceiver
+from protocol import (MSG_HEADER, FRAME_HEADER_V1, FRAME_HEADER_V2, GESTURE_HEADER, GESTURE_HEADER_V2,
+                      Gesture, MessageReader, MsgType, ProtocolError, encode_hello, encode_message,
+                      frame_header, parse_hello)
+
+
+def receiver_with(data):
+    a, b = socket.socketpair()
+    a.sendall(data)
+    rx = FrameReceiver()
+    rx.fill(b)
+    return rx
+
+
+@pytest.mark.parametrize("version", [1, 2, 3])
+def test_hello_round_trip(version):
+    rx = receiver_with(encode_hello("车-1", version) + FRAME_HEADER_V1.pack(0, 0))
+    assert parse_hello(rx) == ("车-1", version)
+    rx.header = frame_header(version)
+    assert rx.header is (FRAME_HEADER_V2 if version >= 2 else FRAME_HEADER_V1)
+
+
+def test_hello_incomplete_and_legacy():
+    hello = encode_hello("car", 2)
+    assert parse_hello(receiver_with(hello[:-1])) is None
+    # 不发握手的旧小车：不消费数据，后面照常按 v1 分帧
+    rx = receiver_with(FRAME_HEADER_V1.pack(1.0, 1) + b"x")
+    assert parse_hello(rx) == (None, 0)
+    assert bytes(rx.next_frame()[2]) == b"x"
+
+
+def session(version):
+    s = CarSession(None, ("127.0.0.1", 1))
+    s.version = version
+    return s
+
+
+def test_encode_reply_legacy():
+    assert encode_reply(session(1), 5, None) is None
+    assert encode_reply(session(1), 5, "FIST") == GESTURE_HEADER.pack(4) + b"FIST"
+    assert encode_reply(session(2), 5, "OPEN") == GESTURE_HEADER_V2.pack(4, 5) + b"OPEN"
+
+
+def test_encode_reply_v3_ack_and_gesture():
+    s = session(3)
+    a, b = socket.socketpair()
+    a.sendall(encode_reply(s, 7, None) + encode_reply(s, 8, "OPEN"))
+    reader = MessageReader(b)
+    assert reader.read()[:3] == (MsgType.ACK, 1, 7)
+    msg_type, seq, frame_id, payload = reader.read()
+    assert (msg_type, seq, frame_id, Gesture(payload[0])) == (MsgType.GESTURE, 2, 8, Gesture.OPEN)
+    assert reader.read()[:3] == (MsgType.ACK, 3, 8)
+
+
+def test_message_reader_rejects_bad_header():
+    a, b = socket.socketpair()
+    a.sendall(b"XX" + encode_message(MsgType.ACK, 1)[2:])
+    with pytest.raises(ProtocolError):
+        MessageReader(b).read()
+
+
+def test_message_reader_partial_reads():
+    a, b = socket.socketpair()
+    b.settimeout(0.05)
+    data = encode_message(MsgType.GESTURE, 9, 4, bytes([Gesture.FIST]))
+    reader = MessageReader(b)
+    a.sendall(data[:MSG_HEADER.size - 3])
+    with pytest.raises(socket.timeout):
+        reader.read()
+    a.sendall(data[MSG_HEADER.size - 3:])
+    assert reader.read()[:3] == (MsgType.GESTURE, 9, 4)
+
+
+def test_outbox_drops_oldest_acks_first():
+    s = session(3)
+    s.send(b"first")
+    for i in range(CarSession.MAX_OUTBOX * 2):
+        s.send(bytes([i]), droppable=True)
+    s.send(b"gesture")
+    items = [bytes(item[0]) for item in s._outbox]
+    assert len(items) == CarSession.MAX_OUTBOX
+    assert items[0] == b"first" and items[-1] == b"gesture"
+    assert s.dropped == 2 * CarSession.MAX_OUTBOX + 2 - len(items)
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from recording import FILE_HEADER, RECORD_HEADER, RecorderThread, RecordingReader, RecordingWriter
+
+FRAMES = [(100.0 + i / 20, i + 1, bytes([i]) * (10 + i)) for i in range(30)]
+
+
+def write_file(path, frames=FRAMES):
+    writer = RecordingWriter(str(path))
+    for ts, frame_id, frame in frames:
+        writer.write(ts, frame_id, memoryview(frame))
+    writer.close()
+    return writer
+
+
+def read_all(path):
+    reader = RecordingReader(str(path))
+    frames = [(ts, frame_id, bytes(frame)) for ts, frame_id, frame in reader]
+    complete = reader.complete
+    reader.close()
+    return frames, complete
+
+
+def test_index_round_trip(tmp_path):
+    path = tmp_path / "a.carrec"
+    writer = write_file(path)
+    assert len(writer) == len(FRAMES)
+    frames, complete = read_all(path)
+    assert complete and frames == FRAMES
+
+    reader = RecordingReader(str(path))
+    assert reader.frame(5)[1] == 6
+    assert reader.duration() == pytest.approx(FRAMES[-1][0] - FRAMES[0][0])
+    reader.close()
+
+
+def test_rebuilds_index_without_footer(tmp_path):
+    path = tmp_path / "b.carrec"
+    write_file(path)
+    # 模拟断电：索引和尾部没写，最后一帧只写了一半
+    size = FILE_HEADER.size + sum(RECORD_HEADER.size + len(f) for _, _, f in FRAMES)
+    with open(path, "r+b") as f:
+        f.truncate(size - 3)
+    frames, complete = read_all(path)
+    assert not complete and frames == FRAMES[:-1]
+
+
+def test_empty_and_not_a_recording(tmp_path):
+    path = tmp_path / "c.carrec"
+    write_file(path, [])
+    assert read_all(path) == ([], True)
+    bad = tmp_path / "d.carrec"
+    bad.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        RecordingReader(str(bad))
+
+
+def test_recorder_thread_writes_per_key(tmp_path):
+    recorder = RecorderThread(str(tmp_path / "rec"))
+    for ts, frame_id, frame in FRAMES:
+        recorder.write("a", "car/a", ts, frame_id, frame)
+        recorder.write("b", "car-b", ts, frame_id, frame[:1])
+    recorder.close("a")
+    recorder.stop()
+    names = sorted(os.listdir(tmp_path / "rec"))
+    assert len(names) == 2
+    assert names[0].startswith("car-b_") and names[1].startswith("car_a_")  # car_id 里的 / 换成 _
+    frames, complete = read_all(tmp_path / "rec" / names[1])
+    assert complete and frames == FRAMES
+    assert recorder.stats()["written"] == 2 * len(FRAMES)
+
+
+def test_recorder_thread_isolates_write_errors(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    recorder = RecorderThread(str(blocker / "rec"))  # 目录建不出来
+    for ts, frame_id, frame in FRAMES[:3]:
+        recorder.write("a", "a", ts, frame_id, frame)
+    recorder.stop()
+    stats = recorder.stats()
+    assert stats["written"] == 0 and stats["errors"] == 1 and stats["recording"] == 0
@@ -0,0 +1,74 @@
+import pytest
+
+from udp_control import CONTROL_PACKET, SEQ_RESET_GAP, STALE_REBASE, ControlChannel, encode_control
+
+PHONE = ("10.0.0.2", 5000)
+
+
+@pytest.fixture
+def channel():
+    applied = []
+    ch = ControlChannel(lambda a, s, m: applied.append((a, s, m)), max_age=0.2)
+    ch.applied_commands = applied
+    return ch
+
+
+def send(ch, seq, ts, now, addr=PHONE, angle=90, strength=50, mode="manual"):
+    return ch.handle(encode_control(seq, angle, strength, mode, ts), addr, now=now)
+
+
+def test_applies_and_clamps(channel):
+    assert send(channel, 1, 100.0, 100.05, strength=200)
+    assert channel.applied_commands == [(90, 100, "manual")]
+
+
+def test_rejects_malformed(channel):
+    assert not channel.handle(b"JC" + b"\0" * 4, PHONE)
+    bad_mode = CONTROL_PACKET.pack(b"JC", 1, 0, 0, 7, 0.0)
+    assert not channel.handle(bad_mode, PHONE)
+    assert channel.stats()["bad"] == 2
+
+
+def test_duplicate_and_out_of_order(channel):
+    assert send(channel, 10, 0.0, 0.0)
+    assert not send(channel, 10, 0.01, 0.01)
+    assert not send(channel, 9, 0.02, 0.02)
+    assert send(channel, 11, 0.03, 0.03)
+    assert channel.stats()["out_of_order"] == 2
+
+
+def test_sequence_wraps(channel):
+    assert send(channel, 0xFFFFFFFE, 0.0, 0.0)
+    assert send(channel, 0xFFFFFFFF, 0.01, 0.01)
+    assert send(channel, 0, 0.02, 0.02)
+    assert send(channel, 1, 0.03, 0.03)
+    assert not send(channel, 0xFFFFFFFF, 0.04, 0.04)   # 跨回绕的旧包
+
+
+def test_sequence_reset_after_phone_restart(channel):
+    assert send(channel, 500000, 0.0, 0.0)
+    assert not send(channel, 500000 - 10, 0.01, 0.01)                # 小幅倒退：乱序
+    assert send(channel, 500000 - SEQ_RESET_GAP - 1, 0.02, 0.02)     # 大幅倒退：重新计
+    assert send(channel, 500000 - SEQ_RESET_GAP, 0.03, 0.03)
+
+
+def test_new_address_resets_state(channel):
+    assert send(channel, 100, 0.0, 0.0)
+    assert send(channel, 1, 50.0, 0.01, addr=("10.0.0.3", 5000))
+
+
+def test_stale_by_offset(channel):
+    assert send(channel, 1, 100.0, 100.05)
+    assert not send(channel, 2, 100.1, 100.5)     # 比基线多 0.35 s
+    assert send(channel, 3, 100.6, 100.65)
+    assert channel.stats()["stale"] == 1
+
+
+def test_rebase_after_clock_steps_back(channel):
+    assert send(channel, 1, 100.0, 100.0)
+    # 手机时钟往回跳 5 s：到达 - 发送 一下子大了 5 s
+    results = [send(channel, 2 + i, 95.0 + i * 0.02, 100.0 + i * 0.02) for i in range(STALE_REBASE + 3)]
+    assert results == [False] * (STALE_REBASE - 1) + [True] * 4
+    assert channel.stats()["rebased"] == 1
+    # 新基线下真过期的包照样丢
+    assert not send(channel, 100, 95.5, 101.0)
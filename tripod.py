@@ -1,23 +1,17 @@
-import time
-from gpiozero import DistanceSensor
+from hardware import DistanceSensor
 
-def turn_left_90(motor):
-        motor.set_speed(-0.3,0.3)
-        time.sleep(0.5)
-        motor.stop()
-        motor.set_speed(0.3,0.3)
-
-        
+# 避障转弯在 avoidance.ObstacleAvoider 里按时间推进，这里只管测距
 
 # HC-SR04 超声波
 # trig -> GPIO20
 # echo -> GPIO21
 # 返回单位：米
+# 滤波交给 distance_sampler（中值 + EMA），这里不再用 gpiozero 的队列平均
 _sensor = DistanceSensor(
     trigger=20,
     echo=21,
     max_distance=4,
-    queue_len=3
+    queue_len=1
 )
 
 def get_distance():
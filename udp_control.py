@@ -0,0 +1,146 @@
+# udp_control.py
+# 手机 -> 小车 UDP 摇杆通道：定长二进制包，丢了就丢了，不会像 TCP 那样一个丢包堵住后面所有更新
+# 模式切换仍然可以走原来的 TCP s/z，UDP 包里的 mode 只是顺带同步
+import socket
+import struct
+import threading
+import time
+
+# magic(2s) + 序号(uint32) + 角度(int16, 0~359) + 力度(uint8, 0~100) + 模式(uint8) + 发送时刻(double, 手机时钟)
+CONTROL_MAGIC = b"JC"
+CONTROL_PACKET = struct.Struct("<2sIhBBd")
+MODES = ["auto", "manual"]
+SEQ_RESET_GAP = 1 << 16  # 序号倒退超过这么多，认为手机端重启了，重新开始计
+STALE_REBASE = 10        # 连续这么多包都算过期，认为手机时钟往回调了，按当前包重建基线
+
+
+def encode_control(seq, angle, strength, mode, ts=None):
+    if ts is None:
+        ts = time.time()
+    return CONTROL_PACKET.pack(CONTROL_MAGIC, seq & 0xFFFFFFFF, angle, strength, MODES.index(mode), ts)
+
+
+class ControlChannel:
+    """
+    解析并过滤摇杆包，合格的交给 on_command(angle, strength, mode)。
+    乱序/重复（序号不比上一个新）直接丢；过期包按单向延迟判断：
+    两边时钟不同步，记录 到达时刻 - 发送时刻 的最小值作为基线，超过基线 max_age 的算过期。
+    基线只会往下走，手机时钟往回跳（NTP 校时、手动改时间）后所有包都会显得过期，
+    所以连续 STALE_REBASE 个过期包后用当前包重建基线。
+    """
+
+    def __init__(self, on_command, max_age=0.2):
+        self.on_command = on_command
+        self.max_age = max_age
+        self.last_seq = None
+        self.last_addr = None
+        self.offset = None
+        self.received = 0
+        self.applied = 0
+        self.out_of_order = 0
+        self.stale = 0
+        self.rebased = 0
+        self.bad = 0
+        self._stale_run = 0   # 连续过期包数
+        self._buf = bytearray(CONTROL_PACKET.size + 1)  # 多一个字节用来识别超长包
+        self._sock = None
+        self._running = False
+
+    def handle(self, data, addr, now=None):
+        """处理一个数据包，应用了返回 True"""
+        if now is None:
+            now = time.time()
+        self.received += 1
+        if len(data) != CONTROL_PACKET.size:
+            self.bad += 1
+            return False
+        magic, seq, angle, strength, mode, ts = CONTROL_PACKET.unpack(data)
+        if magic != CONTROL_MAGIC or mode >= len(MODES):
+            self.bad += 1
+            return False
+
+        if addr != self.last_addr:
+            # 换了手机（或端口），序号和时钟基线都重新来
+            self.last_addr = addr
+            self.last_seq = None
+            self.offset = None
+            self._stale_run = 0
+        if self.last_seq is not None:
+            diff = (seq - self.last_seq) & 0xFFFFFFFF
+            if diff == 0 or (diff >= 0x80000000 and 0x100000000 - diff < SEQ_RESET_GAP):
+                self.out_of_order += 1
+                return False
+
+        offset = now - ts
+        if self.offset is None or offset < self.offset:
+            self.offset = offset
+        self.last_seq = seq
+        if offset - self.offset > self.max_age:
+            self._stale_run += 1
+            if self._stale_run < STALE_REBASE:
+                self.stale += 1
+                return False
+            self.offset = offset
+            self.rebased += 1
+        self._stale_run = 0
+
+        self.applied += 1
+        self.on_command(angle, min(strength, 100), MODES[mode])
+        return True
+
+    def bind(self, port, host=""):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.settimeout(1.0)
+        return self
+
+    def run(self):
+        view = memoryview(self._buf)
+        self._running = True
+        while self._running:
+            try:
+                n, addr = self._sock.recvfrom_into(self._buf)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.handle(view[:n], addr)
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._sock is not None:
+            self._sock.close()
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "applied": self.applied,
+            "out_of_order": self.out_of_order,
+            "stale": self.stale,
+            "rebased": self.rebased,
+            "bad": self.bad,
+        }
+
+
+class ControlProtocol:
+    """asyncio 数据报协议，把包转给 ControlChannel（loop.create_datagram_endpoint 用）"""
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def connection_made(self, transport):
+        pass
+
+    def datagram_received(self, data, addr):
+        self.channel.handle(data, addr)
+
+    def error_received(self, exc):
+        pass
+
+    def connection_lost(self, exc):
+        pass